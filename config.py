@@ -15,4 +15,71 @@ API_CRIAR_FATURA_DEV = os.getenv('API_CRIAR_FATURA_DEV')
 API_CRIAR_FATURA_PROD = os.getenv('API_CRIAR_FATURA_PROD')
 API_ATUALIZAR_FATURA_DEV = os.getenv('API_ATUALIZAR_FATURA_DEV')
 API_ATUALIZAR_FATURA_PROD = os.getenv('API_ATUALIZAR_FATURA_PROD')
-GEUS_APIKEY = os.getenv('GEUS_APIKEY')
\ No newline at end of file
+API_ATUALIZAR_FATURA_LOTE_DEV = os.getenv('API_ATUALIZAR_FATURA_LOTE_DEV', '')
+API_ATUALIZAR_FATURA_LOTE_PROD = os.getenv('API_ATUALIZAR_FATURA_LOTE_PROD', '')
+GEUS_APIKEY = os.getenv('GEUS_APIKEY')
+
+# Escrita adiada no banco (agrupa atualizações de status em lotes)
+DB_WRITE_BEHIND = os.getenv('DB_WRITE_BEHIND', 'False').lower() in ('true', '1', 'yes')
+DB_WRITE_BEHIND_MAX_PENDENTES = int(os.getenv('DB_WRITE_BEHIND_MAX_PENDENTES', '50'))
+DB_WRITE_BEHIND_INTERVALO = float(os.getenv('DB_WRITE_BEHIND_INTERVALO', '5'))
+
+# Leitura incremental da resposta da API GEUS (memória limitada ao tamanho de um bloco)
+API_STREAMING = os.getenv('API_STREAMING', 'True').lower() in ('true', '1', 'yes')
+
+# Snapshots das geradoras (function/snapshots.py): o robô recebe os dados em memória;
+# a cópia em disco serve para retomar uma execução e pode ser comprimida (gzip)
+SNAPSHOT_DISCO = os.getenv('SNAPSHOT_DISCO', 'True').lower() in ('true', '1', 'yes')
+SNAPSHOT_COMPRIMIDO = os.getenv('SNAPSHOT_COMPRIMIDO', 'False').lower() in ('true', '1', 'yes')
+
+# Busca paginada na API GEUS: '' (resposta única), 'pagina' ou 'geradora' (function/busca_paginada.py)
+API_PAGINACAO = os.getenv('API_PAGINACAO', '').lower()
+API_TAMANHO_PAGINA = int(os.getenv('API_TAMANHO_PAGINA', '500'))
+API_PAGINAS_PARALELAS = int(os.getenv('API_PAGINAS_PARALELAS', '4'))
+API_PARAM_PAGINA = os.getenv('API_PARAM_PAGINA', 'page')
+API_PARAM_TAMANHO_PAGINA = os.getenv('API_PARAM_TAMANHO_PAGINA', 'page_size')
+API_PARAM_GERADORA = os.getenv('API_PARAM_GERADORA', 'cnpj_geradora')
+
+# Execuções iniciadas dentro deste prazo (segundos) reutilizam a última busca na API (0 desativa)
+BUSCA_CACHE_TTL = float(os.getenv('BUSCA_CACHE_TTL', '600'))
+
+# Cliente HTTP (function/cliente_http.py): prazos em segundos e número de tentativas
+HTTP_TIMEOUT_CONEXAO = float(os.getenv('HTTP_TIMEOUT_CONEXAO', '5'))
+HTTP_TIMEOUT_LEITURA = float(os.getenv('HTTP_TIMEOUT_LEITURA', '60'))
+HTTP_MAX_TENTATIVAS = int(os.getenv('HTTP_MAX_TENTATIVAS', '3'))
+
+# Envio das faturas à API GEUS em segundo plano (function/fila_envio.py): o robô segue
+# para o próximo card/UC enquanto um pool limitado de threads faz os uploads
+ENVIO_ASSINCRONO = os.getenv('ENVIO_ASSINCRONO', 'True').lower() in ('true', '1', 'yes')
+ENVIO_WORKERS = int(os.getenv('ENVIO_WORKERS', '2'))
+ENVIO_MAX_PENDENTES = int(os.getenv('ENVIO_MAX_PENDENTES', '4'))
+
+# Formato do envio da fatura com PDF: 'json' (PDF em base64 no campo arquivo_fatura) ou
+# 'multipart' (PDF binário, se o endpoint aceitar); nos dois o corpo é gerado em blocos
+ENVIO_FORMATO = os.getenv('ENVIO_FORMATO', 'json').lower()
+
+# Outbox dos envios que falharam (function/outbox.py): reenvio com backoff, sem voltar ao portal
+OUTBOX_INTERVALO = float(os.getenv('OUTBOX_INTERVALO', '15'))
+OUTBOX_ESPERA_BASE = float(os.getenv('OUTBOX_ESPERA_BASE', '10'))
+OUTBOX_ESPERA_MAXIMA = float(os.getenv('OUTBOX_ESPERA_MAXIMA', '3600'))
+OUTBOX_MAX_TENTATIVAS = int(os.getenv('OUTBOX_MAX_TENTATIVAS', '10'))
+
+# Atualizações só da situação de pagamento (function/lote_situacao.py): acumuladas por geradora e
+# enviadas ao endpoint em lote (API_ATUALIZAR_FATURA_LOTE_*, se houver) ou em POSTs paralelos
+SITUACAO_EM_LOTE = os.getenv('SITUACAO_EM_LOTE', 'True').lower() in ('true', '1', 'yes')
+SITUACAO_LOTE_TAMANHO = int(os.getenv('SITUACAO_LOTE_TAMANHO', '50'))
+SITUACAO_LOTE_PARALELAS = int(os.getenv('SITUACAO_LOTE_PARALELAS', '4'))
+
+# Cards de fatura lidos das respostas JSON do portal (function/captura_faturas.py), com a
+# leitura da página (DOM) só para os meses que não vierem nelas
+CAPTURA_FATURAS_XHR = os.getenv('CAPTURA_FATURAS_XHR', 'False').lower() in ('true', '1', 'yes')
+CAPTURA_FATURAS_URL = os.getenv('CAPTURA_FATURAS_URL', 'fatura')
+# Diretório onde gravar cada resposta capturada como fixture ('' não grava)
+CAPTURA_FATURAS_GRAVAR = os.getenv('CAPTURA_FATURAS_GRAVAR', '')
+
+# Download do PDF no portal (function/download_fatura.py): prazo de cada tentativa (segundos),
+# tentativas por fatura e espera entre elas, que dobra a cada falha (BASE até MAXIMA)
+DOWNLOAD_PRAZO = float(os.getenv('DOWNLOAD_PRAZO', '30'))
+DOWNLOAD_MAX_TENTATIVAS = int(os.getenv('DOWNLOAD_MAX_TENTATIVAS', '5'))
+DOWNLOAD_ESPERA_BASE = float(os.getenv('DOWNLOAD_ESPERA_BASE', '1'))
+DOWNLOAD_ESPERA_MAXIMA = float(os.getenv('DOWNLOAD_ESPERA_MAXIMA', '8'))
\ No newline at end of file
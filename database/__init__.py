@@ -4,5 +4,10 @@ Módulo de gerenciamento de banco de dados SQLite para controle de faturas
 
 from .db_manager import DatabaseManager
 from .models import inicializar_banco
+from .conexao import obter_conexao, fechar_conexoes_thread
+from .buffer_escrita import BufferEscrita
+from .assincrono import DatabaseAssincrono
+from .arquivamento import arquivar_faturas_antigas, anexar_arquivo, listar_arquivos
 
-__all__ = ['DatabaseManager', 'inicializar_banco']
+__all__ = ['DatabaseManager', 'inicializar_banco', 'obter_conexao', 'fechar_conexoes_thread', 'BufferEscrita', 'DatabaseAssincrono',
+           'arquivar_faturas_antigas', 'anexar_arquivo', 'listar_arquivos']
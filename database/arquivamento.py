@@ -0,0 +1,275 @@
+"""
+Arquivamento de faturas antigas em bancos mensais
+
+Faturas com sucesso mais antigas que o período de retenção (e seus logs de execução)
+são movidas, em lotes pequenos, para arquivos SQLite por mês de processamento
+(database/arquivo/faturas_AAAA_MM.db). Cada lote são duas transações curtas (cópia no
+arquivo, depois remoção do principal), então o robô não fica bloqueado durante a limpeza.
+Depois da remoção o espaço livre do banco principal é devolvido ao sistema com
+PRAGMA incremental_vacuum.
+
+Os arquivos continuam consultáveis com ATTACH (ver anexar_arquivo).
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from .conexao import obter_conexao
+
+DIRETORIO_ARQUIVO = "database/arquivo"
+TAMANHO_LOTE_ARQUIVAMENTO = 500
+ALIAS_ARQUIVO = "arquivo"
+
+
+def caminho_arquivo_mes(mes: str, diretorio: str = DIRETORIO_ARQUIVO) -> str:
+    """
+    Retorna o caminho do banco de arquivo de um mês
+
+    Args:
+        mes (str): Mês no formato AAAA-MM
+        diretorio (str): Diretório dos arquivos
+
+    Returns:
+        str: Caminho do arquivo (faturas_AAAA_MM.db)
+    """
+    return os.path.join(diretorio, f"faturas_{mes.replace('-', '_')}.db")
+
+
+def listar_arquivos(diretorio: str = DIRETORIO_ARQUIVO) -> List[str]:
+    """
+    Lista os meses que já possuem banco de arquivo
+
+    Args:
+        diretorio (str): Diretório dos arquivos
+
+    Returns:
+        list: Meses no formato AAAA-MM, em ordem crescente
+    """
+    if not os.path.isdir(diretorio):
+        return []
+
+    meses = []
+    for nome in os.listdir(diretorio):
+        if nome.startswith("faturas_") and nome.endswith(".db"):
+            meses.append(nome[len("faturas_"):-len(".db")].replace('_', '-'))
+    return sorted(meses)
+
+
+def anexar_arquivo(conn, mes: str, diretorio: str = DIRETORIO_ARQUIVO) -> str:
+    """
+    Anexa (ATTACH) o banco de arquivo de um mês à conexão
+
+    Exemplo:
+        alias = anexar_arquivo(conn, '2025-01')
+        conn.execute(f"SELECT * FROM {alias}.faturas WHERE nova_uc = ?", (uc,))
+        conn.execute(f"DETACH DATABASE {alias}")
+
+    Args:
+        conn: Conexão com o banco principal (fora de transação)
+        mes (str): Mês no formato AAAA-MM
+        diretorio (str): Diretório dos arquivos
+
+    Returns:
+        str: Nome do esquema anexado (arq_AAAA_MM)
+    """
+    caminho = caminho_arquivo_mes(mes, diretorio)
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(f"Arquivo não encontrado: {caminho}")
+
+    alias = f"arq_{mes.replace('-', '_')}"
+    conn.execute("ATTACH DATABASE ? AS " + alias, (caminho,))
+    return alias
+
+
+def _colunas_faturas(conn) -> List[tuple]:
+    """Colunas armazenadas de faturas (ignora colunas geradas)"""
+    return [
+        (row[1], row[2])
+        for row in conn.execute("PRAGMA main.table_xinfo(faturas)")
+        if row[6] == 0
+    ]
+
+
+def _preparar_arquivo(conn, colunas: List[tuple]):
+    """Cria as tabelas no banco anexado e acrescenta colunas novas do esquema principal"""
+    definicoes = ",\n".join(
+        f"{nome} INTEGER PRIMARY KEY" if nome == 'id' else f"{nome} {tipo}"
+        for nome, tipo in colunas
+    )
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {ALIAS_ARQUIVO}.faturas (\n{definicoes}\n)")
+
+    existentes = {row[1] for row in conn.execute(f"PRAGMA {ALIAS_ARQUIVO}.table_info(faturas)")}
+    for nome, tipo in colunas:
+        if nome not in existentes:
+            conn.execute(f"ALTER TABLE {ALIAS_ARQUIVO}.faturas ADD COLUMN {nome} {tipo}")
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ALIAS_ARQUIVO}.logs_execucao (
+            fatura_id INTEGER NOT NULL,
+            tentativa INTEGER NOT NULL,
+            data_registro DATETIME NOT NULL,
+            log_comprimido BLOB NOT NULL,
+            PRIMARY KEY (fatura_id, tentativa)
+        )
+    """)
+    conn.commit()
+
+
+def _mover_mes(conn, mes: str, filtro: str, parametros: tuple,
+               colunas: List[tuple], tamanho_lote: int) -> int:
+    """
+    Move, em lotes, as faturas de um mês para o banco anexado como 'arquivo'
+
+    Cada lote usa duas transações, porque em modo WAL o SQLite só garante atomicidade
+    por banco, não entre o principal e o anexado: primeiro a cópia é confirmada no
+    arquivo e só depois são removidas do principal as faturas que estão lá.
+    """
+    lista_colunas = ", ".join(nome for nome, _ in colunas)
+    movidas = 0
+
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [
+                row[0] for row in conn.execute(f"""
+                    SELECT id FROM main.faturas
+                    WHERE {filtro} AND substr(data_processamento, 1, 7) = ?
+                    LIMIT ?
+                """, parametros + (mes, tamanho_lote))
+            ]
+
+            if not ids:
+                conn.rollback()
+                return movidas
+
+            marcadores = ",".join("?" * len(ids))
+
+            # INSERT OR REPLACE: um lote copiado e não removido (queda entre as duas
+            # transações) é copiado de novo na próxima execução sem duplicar nada
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {ALIAS_ARQUIVO}.faturas ({lista_colunas})
+                SELECT {lista_colunas} FROM main.faturas WHERE id IN ({marcadores})
+            """, ids)
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {ALIAS_ARQUIVO}.logs_execucao
+                    (fatura_id, tentativa, data_registro, log_comprimido)
+                SELECT fatura_id, tentativa, data_registro, log_comprimido
+                FROM main.logs_execucao WHERE fatura_id IN ({marcadores})
+            """, ids)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        # Remover do principal só o que já está confirmado no arquivo
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"""
+                DELETE FROM main.logs_execucao
+                WHERE (fatura_id, tentativa) IN (
+                    SELECT fatura_id, tentativa FROM {ALIAS_ARQUIVO}.logs_execucao
+                    WHERE fatura_id IN ({marcadores})
+                )
+            """, ids)
+            removidas = conn.execute(f"""
+                DELETE FROM main.faturas
+                WHERE id IN (SELECT id FROM {ALIAS_ARQUIVO}.faturas WHERE id IN ({marcadores}))
+                  AND {filtro}
+            """, ids + list(parametros)).rowcount
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        movidas += removidas
+        print(f"   📦 {mes}: {movidas} faturas arquivadas")
+
+        # Lote curto: acabou o mês; nada removido: as faturas saíram do filtro entre as transações
+        if len(ids) < tamanho_lote or not removidas:
+            return movidas
+
+
+def compactar_banco(conn) -> int:
+    """
+    Devolve ao sistema as páginas livres do banco (requer auto_vacuum=INCREMENTAL)
+
+    Args:
+        conn: Conexão com o banco principal (fora de transação)
+
+    Returns:
+        int: Bytes liberados
+    """
+    tamanho_pagina = conn.execute("PRAGMA page_size").fetchone()[0]
+    paginas_antes = conn.execute("PRAGMA page_count").fetchone()[0]
+
+    conn.execute("PRAGMA incremental_vacuum").fetchall()
+    conn.commit()
+    # Reduz o arquivo -wal depois de reescrever as páginas
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    paginas_depois = conn.execute("PRAGMA page_count").fetchone()[0]
+    return (paginas_antes - paginas_depois) * tamanho_pagina
+
+
+def arquivar_faturas_antigas(db_path: str = "database/faturas.db", dias: int = 90,
+                             diretorio: str = DIRETORIO_ARQUIVO,
+                             tamanho_lote: int = TAMANHO_LOTE_ARQUIVAMENTO) -> Dict:
+    """
+    Move faturas com sucesso processadas há mais de X dias para os bancos de arquivo mensais
+
+    Args:
+        db_path (str): Caminho do banco principal
+        dias (int): Número de dias para manter no banco principal
+        diretorio (str): Diretório dos bancos de arquivo
+        tamanho_lote (int): Faturas movidas por transação
+
+    Returns:
+        dict: {'movidas', 'bytes_recuperados', 'segundos', 'arquivos'}
+    """
+    inicio = time.monotonic()
+    conn = obter_conexao(db_path)
+
+    limite = datetime.now() - timedelta(days=dias)
+    # dia_processamento usa o índice; data_processamento garante o corte exato
+    filtro = "status = 'sucesso' AND dia_processamento <= ? AND data_processamento < ?"
+    parametros = (limite.date().isoformat(), str(limite))
+
+    meses = [
+        row[0] for row in conn.execute(f"""
+            SELECT DISTINCT substr(data_processamento, 1, 7)
+            FROM main.faturas
+            WHERE {filtro}
+            ORDER BY 1
+        """, parametros)
+    ]
+    conn.commit()
+
+    colunas = _colunas_faturas(conn)
+    movidas = 0
+    arquivos = []
+
+    if meses:
+        os.makedirs(diretorio, exist_ok=True)
+
+    for mes in meses:
+        caminho = caminho_arquivo_mes(mes, diretorio)
+        conn.execute("ATTACH DATABASE ? AS " + ALIAS_ARQUIVO, (caminho,))
+        try:
+            _preparar_arquivo(conn, colunas)
+            movidas += _mover_mes(conn, mes, filtro, parametros, colunas, tamanho_lote)
+        finally:
+            conn.execute("DETACH DATABASE " + ALIAS_ARQUIVO)
+        arquivos.append(caminho)
+
+    bytes_recuperados = compactar_banco(conn) if movidas else 0
+
+    return {
+        'movidas': movidas,
+        'bytes_recuperados': bytes_recuperados,
+        'segundos': time.monotonic() - inicio,
+        'arquivos': arquivos
+    }
@@ -0,0 +1,107 @@
+"""
+Fachada assíncrona (asyncio) para as consultas do banco de faturas
+
+As chamadas ao sqlite3 são bloqueantes; aqui elas rodam em um pool de threads
+próprio, cada thread com sua conexão de leitura (query_only + WAL), então a API
+continua atendendo requisições enquanto o robô grava em segundo plano.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .conexao import fechar_conexoes_thread
+from .db_manager import DatabaseManager
+
+
+class DatabaseAssincrono:
+    """Versões async das consultas de status, estatísticas e execuções do DatabaseManager"""
+
+    def __init__(self, db_path="database/faturas.db", max_threads: int = 4):
+        """
+        Inicializa o pool de threads de leitura
+
+        Args:
+            db_path (str): Caminho para o arquivo do banco de dados
+            max_threads (int): Quantidade máxima de consultas simultâneas
+        """
+        self.db = DatabaseManager(db_path, somente_leitura=True)
+        self.max_threads = max_threads
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="db-leitura")
+
+    async def _executar(self, funcao, *args, **kwargs):
+        """Executa uma função bloqueante do DatabaseManager no pool de leitura"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(funcao, *args, **kwargs))
+
+    # ==================== STATUS DE FATURAS ====================
+
+    async def verificar_status_fatura(self, fatura_id: int, force: bool = False) -> Tuple[str, bool]:
+        """Versão async de DatabaseManager.verificar_status_fatura"""
+        return await self._executar(self.db.verificar_status_fatura, fatura_id, force)
+
+    async def verificar_status_faturas(self, fatura_ids: Iterable[int],
+                                       force: bool = False) -> Dict[int, Tuple[str, bool]]:
+        """Versão async de DatabaseManager.verificar_status_faturas"""
+        return await self._executar(self.db.verificar_status_faturas, list(fatura_ids), force)
+
+    async def obter_faturas_para_processar(self, cnpj_geradora: str, force: bool = False) -> List[Dict]:
+        """Versão async de DatabaseManager.obter_faturas_para_processar"""
+        return await self._executar(self.db.obter_faturas_para_processar, cnpj_geradora, force)
+
+    # ==================== ESTATÍSTICAS ====================
+
+    async def obter_estatisticas_geradora(self, cnpj_geradora: str) -> Dict:
+        """Versão async de DatabaseManager.obter_estatisticas_geradora"""
+        return await self._executar(self.db.obter_estatisticas_geradora, cnpj_geradora)
+
+    async def obter_estatisticas_gerais(self) -> Dict:
+        """Versão async de DatabaseManager.obter_estatisticas_gerais"""
+        return await self._executar(self.db.obter_estatisticas_gerais)
+
+    async def obter_estatisticas_dia(self, data_processamento: Optional[date] = None) -> Dict[str, Dict]:
+        """Versão async de DatabaseManager.obter_estatisticas_dia"""
+        return await self._executar(self.db.obter_estatisticas_dia, data_processamento)
+
+    async def obter_totais_por_competencia(self, competencia_inicial: int, competencia_final: int,
+                                           cnpj_geradora: Optional[str] = None) -> List[Dict]:
+        """Versão async de DatabaseManager.obter_totais_por_competencia"""
+        return await self._executar(self.db.obter_totais_por_competencia,
+                                    competencia_inicial, competencia_final, cnpj_geradora)
+
+    # ==================== EXECUÇÕES ====================
+
+    async def obter_execucoes_do_dia(self, data_execucao: Optional[date] = None) -> List[Dict]:
+        """Versão async de DatabaseManager.obter_execucoes_do_dia"""
+        return await self._executar(self.db.obter_execucoes_do_dia, data_execucao)
+
+    async def obter_log_execucao(self, fatura_id: int, tentativa: Optional[int] = None) -> Optional[str]:
+        """Versão async de DatabaseManager.obter_log_execucao"""
+        return await self._executar(self.db.obter_log_execucao, fatura_id, tentativa)
+
+    # ==================== OUTBOX DE ENVIOS ====================
+
+    async def obter_envios_outbox(self, limite: Optional[int] = None) -> List[Dict]:
+        """Versão async de DatabaseManager.obter_envios_outbox"""
+        return await self._executar(self.db.obter_envios_outbox, None, limite)
+
+    # ==================== ENCERRAMENTO ====================
+
+    def fechar(self):
+        """Fecha as conexões de cada thread do pool e encerra o pool"""
+        # Uma tarefa por thread; a barreira garante que cada thread execute exatamente uma
+        barreira = threading.Barrier(self.max_threads)
+
+        def fechar_thread():
+            fechar_conexoes_thread()
+            try:
+                barreira.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+
+        for _ in range(self.max_threads):
+            self._executor.submit(fechar_thread)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,233 @@
+"""
+Buffer de escrita adiada (write-behind) para o banco de faturas
+"""
+
+import atexit
+import threading
+from datetime import datetime, date
+from typing import Optional
+
+from .conexao import fechar_conexoes_thread
+
+# Falhas seguidas do lote antes de gravar os itens um a um (isolando o que não grava)
+TENTATIVAS_LOTE = 3
+
+
+class BufferEscrita:
+    """
+    Enfileira atualizações de status e execuções de UC em memória e grava em lote
+
+    Expõe os mesmos métodos de escrita do DatabaseManager (atualizar_status_fatura e
+    registrar_execucao_uc), então pode ser usado no lugar dele no processamento.
+    As gravações acontecem em uma thread própria, em uma única transação, quando:
+        - a fila atinge max_pendentes itens
+        - intervalo_segundos se passaram desde a última gravação
+        - uma execução de UC é registrada (fim da UC)
+        - o buffer é fechado (fim do processamento, exceção ou saída do processo)
+
+    Em caso de queda do processo, perde-se no máximo o que estava na fila
+    (uma janela de gravação).
+
+    Se o lote falhar tentativas_lote vezes seguidas, os itens são gravados um a um
+    pelo DatabaseManager: os que ainda falham são descartados e listados em
+    'descartados', para um item com problema não travar as gravações seguintes.
+    """
+
+    def __init__(self, db, max_pendentes: int = 50, intervalo_segundos: float = 5.0,
+                 tentativas_lote: int = TENTATIVAS_LOTE):
+        """
+        Inicializa o buffer e a thread de gravação
+
+        Args:
+            db (DatabaseManager): Gerenciador usado para gravar os lotes
+            max_pendentes (int): Quantidade de itens na fila que dispara uma gravação
+            intervalo_segundos (float): Tempo máximo entre gravações
+            tentativas_lote (int): Falhas seguidas do lote antes de gravar item a item
+        """
+        self.db = db
+        self.max_pendentes = max_pendentes
+        self.intervalo_segundos = intervalo_segundos
+        self.tentativas_lote = max(1, tentativas_lote)
+        self.lotes_gravados = 0
+        self.descartados = []
+        self._falhas_seguidas = 0
+
+        self._atualizacoes = []
+        self._execucoes = []
+        self._lock_fila = threading.Lock()
+        self._lock_gravacao = threading.Lock()
+        self._acordar = threading.Event()
+        self._encerrado = False
+
+        self._thread = threading.Thread(target=self._loop_gravacao, name="buffer-escrita", daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    @property
+    def pendentes(self) -> int:
+        """Quantidade de itens ainda não gravados no banco"""
+        with self._lock_fila:
+            return len(self._atualizacoes) + len(self._execucoes)
+
+    def atualizar_status_fatura(self, fatura_id: int, status: str,
+                                mensagem_erro: Optional[str] = None,
+                                valor: Optional[str] = None,
+                                data_vencimento: Optional[str] = None,
+                                situacao_pagamento: Optional[str] = None,
+                                tipo_operacao: Optional[str] = None,
+                                log_execucao: Optional[str] = None,
+                                hash_pdf: Optional[str] = None) -> bool:
+        """
+        Enfileira a atualização de status de uma fatura (mesmos parâmetros do DatabaseManager)
+
+        Returns:
+            bool: True (a gravação efetiva acontece no próximo lote)
+        """
+        with self._lock_fila:
+            self._atualizacoes.append({
+                'fatura_id': fatura_id,
+                'status': status,
+                'data_processamento': datetime.now(),
+                'mensagem_erro': mensagem_erro,
+                'valor': valor,
+                'data_vencimento': data_vencimento,
+                'situacao_pagamento': situacao_pagamento,
+                'tipo_operacao': tipo_operacao,
+                'log_execucao': log_execucao,
+                'hash_pdf': hash_pdf
+            })
+            pendentes = len(self._atualizacoes) + len(self._execucoes)
+
+        print(f"   📝 Status da fatura ID {fatura_id} enfileirado: {status} | Pendentes: {pendentes}")
+
+        if pendentes >= self.max_pendentes:
+            self._acordar.set()
+        return True
+
+    def registrar_execucao_uc(self, cnpj_geradora: str, nova_uc: str,
+                              total_faturas: int, faturas_sucesso: int,
+                              faturas_erro: int, faturas_puladas: int,
+                              data_hora_inicio: datetime) -> bool:
+        """
+        Enfileira a execução da UC e grava imediatamente tudo o que estiver pendente
+
+        Returns:
+            bool: True se o lote foi gravado, False se erro
+        """
+        with self._lock_fila:
+            self._execucoes.append({
+                'data_execucao': date.today(),
+                'cnpj_geradora': cnpj_geradora,
+                'nova_uc': nova_uc,
+                'total_faturas': total_faturas,
+                'faturas_sucesso': faturas_sucesso,
+                'faturas_erro': faturas_erro,
+                'faturas_puladas': faturas_puladas,
+                'data_hora_inicio': data_hora_inicio,
+                'data_hora_fim': datetime.now()
+            })
+
+        # Fim da UC: gravar antes de seguir para a próxima
+        return self.descarregar()
+
+    def descarregar(self) -> bool:
+        """
+        Grava todos os itens pendentes em uma única transação
+
+        Returns:
+            bool: True se gravou (ou não havia nada), False se erro
+                  (os itens voltam para a fila; após tentativas_lote falhas seguidas,
+                  são gravados um a um e os que falharem vão para 'descartados')
+        """
+        with self._lock_gravacao:
+            with self._lock_fila:
+                atualizacoes, self._atualizacoes = self._atualizacoes, []
+                execucoes, self._execucoes = self._execucoes, []
+
+            if not atualizacoes and not execucoes:
+                return True
+
+            if self.db.gravar_em_lote(atualizacoes, execucoes):
+                self._falhas_seguidas = 0
+                self.lotes_gravados += 1
+                print(f"   💾 Lote gravado no banco: {len(atualizacoes)} faturas, {len(execucoes)} execuções de UC")
+                return True
+
+            self._falhas_seguidas += 1
+            if self._falhas_seguidas >= self.tentativas_lote:
+                self._falhas_seguidas = 0
+                return self._gravar_um_a_um(atualizacoes, execucoes)
+
+            # Devolver para o início da fila para a próxima tentativa
+            with self._lock_fila:
+                self._atualizacoes[:0] = atualizacoes
+                self._execucoes[:0] = execucoes
+            return False
+
+    def _gravar_um_a_um(self, atualizacoes, execucoes) -> bool:
+        """
+        Grava cada item em sua própria transação e descarta os que falharem
+
+        Returns:
+            bool: True se todos foram gravados
+        """
+        print(f"   ⚠️ Lote falhou {self.tentativas_lote} vezes seguidas - gravando {len(atualizacoes) + len(execucoes)} itens um a um")
+        descartados = []
+
+        for atualizacao in atualizacoes:
+            campos = {chave: valor for chave, valor in atualizacao.items() if chave != 'data_processamento'}
+            if not self.db.atualizar_status_fatura(**campos):
+                descartados.append(('fatura', atualizacao))
+                print(f"   ❌ Status da fatura ID {atualizacao['fatura_id']} descartado: {atualizacao['status']}")
+
+        for execucao in execucoes:
+            campos = {
+                chave: valor for chave, valor in execucao.items()
+                if chave not in ('data_execucao', 'data_hora_fim')
+            }
+            if not self.db.registrar_execucao_uc(**campos):
+                descartados.append(('execucao_uc', execucao))
+                print(f"   ❌ Execução da UC {execucao['nova_uc']} ({execucao['cnpj_geradora']}) descartada")
+
+        self.descartados.extend(descartados)
+        return not descartados
+
+    def _loop_gravacao(self):
+        """Thread de gravação: acorda por tempo ou por fila cheia"""
+        try:
+            while not self._encerrado:
+                self._acordar.wait(self.intervalo_segundos)
+                self._acordar.clear()
+                if not self._encerrado:
+                    self.descarregar()
+        finally:
+            fechar_conexoes_thread()
+
+    def fechar(self) -> bool:
+        """
+        Para a thread de gravação e grava o que estiver pendente
+
+        Returns:
+            bool: True se não restou nada pendente nem foi descartado
+        """
+        if not self._encerrado:
+            self._encerrado = True
+            self._acordar.set()
+            self._thread.join()
+            atexit.unregister(self.fechar)
+
+        # Repete o lote até gravar ou até os itens serem gravados um a um
+        for _ in range(self.tentativas_lote):
+            if self.descarregar() or not self.pendentes:
+                break
+
+        if self.descartados:
+            print(f"   ❌ {len(self.descartados)} gravações descartadas pelo buffer de escrita")
+        return not self.pendentes and not self.descartados
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.fechar()
+        return False
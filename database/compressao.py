@@ -0,0 +1,15 @@
+"""
+Compressão dos logs de execução armazenados no banco
+"""
+
+import zlib
+
+NIVEL_COMPRESSAO_LOG = 6
+
+def comprimir_log(texto):
+    """Comprime o log de execução (texto) para gravação na tabela logs_execucao"""
+    return zlib.compress(texto.encode('utf-8'), NIVEL_COMPRESSAO_LOG)
+
+def descomprimir_log(dados):
+    """Descomprime um log lido da tabela logs_execucao"""
+    return zlib.decompress(dados).decode('utf-8')
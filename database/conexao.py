@@ -0,0 +1,78 @@
+"""
+Pool de conexões SQLite reutilizáveis (uma conexão por thread)
+"""
+
+import os
+import sqlite3
+import threading
+import atexit
+
+# Ajustes aplicados a toda conexão nova
+BUSY_TIMEOUT_MS = 10000
+CACHE_SIZE_KB = 16384  # 16 MB de cache de páginas por conexão
+MMAP_SIZE_BYTES = 256 * 1024 * 1024  # 256 MB mapeados em memória
+
+_local = threading.local()
+
+
+def _configurar_conexao(conn, somente_leitura):
+    """Aplica os PRAGMAs de desempenho na conexão recém-aberta"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    if somente_leitura:
+        # Conexões de relatório nunca escrevem; com WAL não bloqueiam o robô
+        conn.execute("PRAGMA query_only=ON")
+
+
+def obter_conexao(db_path="database/faturas.db", somente_leitura=False):
+    """
+    Retorna a conexão desta thread para o banco, abrindo-a na primeira chamada
+
+    A conexão é mantida aberta e reutilizada por todas as chamadas seguintes
+    da mesma thread, evitando o custo de abrir/fechar o arquivo a cada operação.
+
+    Args:
+        db_path (str): Caminho para o arquivo do banco de dados
+        somente_leitura (bool): Se True, retorna uma conexão separada que só permite leitura
+
+    Returns:
+        sqlite3.Connection: Conexão com row_factory = sqlite3.Row
+    """
+    conexoes = getattr(_local, "conexoes", None)
+    if conexoes is None:
+        conexoes = _local.conexoes = {}
+
+    chave = (os.path.abspath(db_path), somente_leitura)
+    conn = conexoes.get(chave)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row  # Permite acessar colunas por nome
+        _configurar_conexao(conn, somente_leitura)
+        conexoes[chave] = conn
+    return conn
+
+
+def fechar_conexoes_thread():
+    """Fecha todas as conexões abertas pela thread atual"""
+    conexoes = getattr(_local, "conexoes", None)
+    if not conexoes:
+        return
+
+    for conn in conexoes.values():
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    conexoes.clear()
+
+
+def _fechar_conexoes_ao_sair():
+    """Fecha as conexões restantes da thread principal no encerramento do processo"""
+    fechar_conexoes_thread()
+
+
+atexit.register(_fechar_conexoes_ao_sair)
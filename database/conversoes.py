@@ -0,0 +1,121 @@
+"""
+Conversão dos campos textuais da fatura para as colunas tipadas do banco
+"""
+
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+
+def valor_para_centavos(valor) -> Optional[int]:
+    """
+    Converte um valor monetário em texto para centavos
+
+    Aceita "123.45", "1234,56", "1.234,56" e "R$ 1.234,56".
+
+    Args:
+        valor (str): Valor da fatura
+
+    Returns:
+        int: Valor em centavos ou None se vazio/inválido
+    """
+    if valor is None:
+        return None
+
+    texto = str(valor).replace('R$', '').replace(' ', '').strip()
+    if not texto:
+        return None
+
+    if ',' in texto:
+        # Formato brasileiro: ponto como milhar, vírgula como decimal
+        texto = texto.replace('.', '').replace(',', '.')
+    elif texto.count('.') > 1:
+        # "1.234.56" (vírgula já trocada por ponto): só o último ponto é decimal
+        inteiro, _, decimal = texto.rpartition('.')
+        texto = f"{inteiro.replace('.', '')}.{decimal}"
+
+    try:
+        return int((Decimal(texto) * 100).quantize(Decimal('1')))
+    except InvalidOperation:
+        return None
+
+
+def centavos_para_valor(centavos: Optional[int]) -> Optional[str]:
+    """
+    Converte centavos para o texto usado na API ("1234.56")
+
+    Args:
+        centavos (int): Valor em centavos
+
+    Returns:
+        str: Valor com duas casas decimais ou None
+    """
+    if centavos is None:
+        return None
+    sinal = '-' if centavos < 0 else ''
+    return f"{sinal}{abs(centavos) // 100}.{abs(centavos) % 100:02d}"
+
+
+def mes_referencia_para_competencia(mes_referencia) -> Optional[int]:
+    """
+    Converte o mês de referência para inteiro AAAAMM (ordenável e filtrável por intervalo)
+
+    Exemplo: "03/2026" => 202603
+
+    Args:
+        mes_referencia (str): Mês no formato MM/AAAA (aceita também AAAA-MM)
+
+    Returns:
+        int: Competência AAAAMM ou None se inválido
+    """
+    if not mes_referencia:
+        return None
+
+    texto = str(mes_referencia).strip()
+    try:
+        if '/' in texto:
+            mes, ano = texto.split('/', 1)
+        else:
+            ano, mes = texto.split('-')[:2]
+        mes, ano = int(mes), int(ano)
+    except ValueError:
+        return None
+
+    if not 1 <= mes <= 12:
+        return None
+    return ano * 100 + mes
+
+
+def competencia_para_mes_referencia(competencia: Optional[int]) -> Optional[str]:
+    """
+    Converte competência AAAAMM para o formato MM/AAAA
+
+    Args:
+        competencia (int): Competência AAAAMM
+
+    Returns:
+        str: Mês no formato MM/AAAA ou None
+    """
+    if competencia is None:
+        return None
+    return f"{competencia % 100:02d}/{competencia // 100}"
+
+
+def normalizar_data(data) -> Optional[str]:
+    """
+    Normaliza uma data para o formato ISO (AAAA-MM-DD)
+
+    Args:
+        data (str): Data em AAAA-MM-DD ou DD/MM/AAAA
+
+    Returns:
+        str: Data em AAAA-MM-DD (o texto original se o formato não for reconhecido)
+    """
+    if not data:
+        return None
+
+    texto = str(data).strip()
+    partes = texto.split('/')
+    if len(partes) == 3 and len(partes[2]) == 4 and all(p.isdigit() for p in partes):
+        dia, mes, ano = partes
+        return f"{ano}-{int(mes):02d}-{int(dia):02d}"
+    return texto
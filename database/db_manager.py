@@ -4,25 +4,41 @@ Gerenciador de operações do banco de dados
 
 import sqlite3
 from datetime import datetime, date
-from typing import List, Dict, Optional, Tuple
+from itertools import islice
+from typing import Iterable, List, Dict, Optional, Tuple
+
+from .conexao import obter_conexao
+from .compressao import comprimir_log, descomprimir_log
+from .conversoes import valor_para_centavos, mes_referencia_para_competencia, normalizar_data
+from .arquivamento import arquivar_faturas_antigas, DIRETORIO_ARQUIVO
+
+# Acima deste número de IDs a consulta em lote usa uma tabela temporária
+LIMITE_CONSULTA_IN = 900
 
 class DatabaseManager:
     """Classe para gerenciar operações no banco de dados SQLite"""
     
-    def __init__(self, db_path="database/faturas.db"):
+    def __init__(self, db_path="database/faturas.db", somente_leitura=False):
         """
         Inicializa o gerenciador do banco de dados
         
         Args:
             db_path (str): Caminho para o arquivo do banco de dados
+            somente_leitura (bool): Se True, usa conexões de leitura (relatórios/consultas)
         """
         self.db_path = db_path
+        self.somente_leitura = somente_leitura
     
     def _get_connection(self):
-        """Retorna uma conexão com o banco de dados"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Permite acessar colunas por nome
-        return conn
+        """Retorna a conexão reutilizável desta thread com o banco de dados"""
+        return obter_conexao(self.db_path, somente_leitura=self.somente_leitura)
+    
+    def _desfazer_transacao(self):
+        """Desfaz a transação pendente da conexão desta thread após uma falha"""
+        try:
+            self._get_connection().rollback()
+        except sqlite3.Error:
+            pass
     
     # ==================== OPERAÇÕES COM FATURAS ====================
     
@@ -55,19 +71,19 @@ class DatabaseManager:
             if resultado:
                 # Fatura já existe - não atualiza nada, mantém status atual
                 print(f"   ℹ️ Fatura ID {fatura_data['id']} já existe no banco com status: {resultado['status']}")
-                conn.close()
                 return True
             else:
                 # Fatura nova - inserir com status 'a_verificar'
                 cursor.execute("""
                     INSERT INTO faturas (
-                        id, nova_uc, mes_referencia, cnpj_geradora, 
+                        id, nova_uc, mes_referencia, competencia, cnpj_geradora, 
                         status, data_criacao, tentativas
-                    ) VALUES (?, ?, ?, ?, 'a_verificar', ?, 0)
+                    ) VALUES (?, ?, ?, ?, ?, 'a_verificar', ?, 0)
                 """, (
                     fatura_data['id'],
                     fatura_data['nova_uc'],
                     fatura_data['mes_referencia'],
+                    mes_referencia_para_competencia(fatura_data['mes_referencia']),
                     fatura_data['cnpj_geradora'],
                     datetime.now()
                 ))
@@ -75,13 +91,76 @@ class DatabaseManager:
                 conn.commit()
                 print(f"   ✅ Fatura ID {fatura_data['id']} inserida no banco")
             
-            conn.close()
             return True
             
         except Exception as e:
+            self._desfazer_transacao()
             print(f"   ❌ Erro ao inserir/atualizar fatura: {str(e)}")
             return False
     
+    def inserir_faturas_em_lote(self, faturas: Iterable[Dict], tamanho_lote: int = 1000) -> Dict[str, int]:
+        """
+        Insere várias faturas em uma única transação, ignorando as que já existem
+        Mantém o status das faturas já cadastradas (mesma regra de inserir_ou_atualizar_fatura)
+        
+        As faturas são consumidas em blocos de tamanho_lote, então o iterável pode
+        ser um gerador sem que a lista completa precise ficar em memória.
+        
+        Args:
+            faturas (iterable): Dicionários com id, nova_uc, mes_referencia e cnpj_geradora
+            tamanho_lote (int): Quantidade de faturas enviadas por executemany
+        
+        Returns:
+            dict: {'inseridas': int, 'existentes': int}
+        
+        Raises:
+            Exception: Se algum bloco falhar (a transação é desfeita e nada é gravado;
+                       um zero aqui significaria "nada novo", não falha)
+        """
+        inseridas = 0
+        total = 0
+        
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            data_criacao = datetime.now()
+            
+            linhas = (
+                (
+                    fatura['id'],
+                    fatura['nova_uc'],
+                    fatura['mes_referencia'],
+                    mes_referencia_para_competencia(fatura['mes_referencia']),
+                    fatura['cnpj_geradora'],
+                    data_criacao
+                )
+                for fatura in faturas
+            )
+            
+            while True:
+                lote = list(islice(linhas, tamanho_lote))
+                if not lote:
+                    break
+                
+                cursor.executemany("""
+                    INSERT INTO faturas (
+                        id, nova_uc, mes_referencia, competencia, cnpj_geradora,
+                        status, data_criacao, tentativas
+                    ) VALUES (?, ?, ?, ?, ?, 'a_verificar', ?, 0)
+                    ON CONFLICT(id) DO NOTHING
+                """, lote)
+                # rowcount não inclui as linhas alteradas pelos triggers de estatísticas
+                inseridas += cursor.rowcount
+                total += len(lote)
+            
+            conn.commit()
+            return {'inseridas': inseridas, 'existentes': total - inseridas}
+        
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao inserir faturas em lote: {str(e)}")
+            raise
+    
     def verificar_status_fatura(self, fatura_id: int, force: bool = False) -> Tuple[str, bool]:
         """
         Verifica o status de uma fatura e determina se deve ser processada
@@ -104,32 +183,95 @@ class DatabaseManager:
             """, (fatura_id,))
             
             resultado = cursor.fetchone()
-            conn.close()
             
             if not resultado:
                 return ('nao_encontrada', True)
             
-            status = resultado['status']
-            
-            # Regras de processamento
-            if status == 'sucesso':
-                return (status, False)  # Não reprocessar sucessos
-            elif status == 'erro':
-                return (status, force)  # Só reprocessa com --force
-            else:  # 'a_verificar'
-                return (status, True)  # Sempre processa
+            return self._regra_processamento(resultado['status'], force)
                 
         except Exception as e:
             print(f"   ❌ Erro ao verificar status da fatura: {str(e)}")
             return ('erro', False)
     
+    @staticmethod
+    def _regra_processamento(status: str, force: bool) -> Tuple[str, bool]:
+        """Aplica as regras de reprocessamento a um status já lido do banco"""
+        if status == 'sucesso':
+            return (status, False)  # Não reprocessar sucessos
+        elif status == 'erro':
+            return (status, force)  # Só reprocessa com --force
+        else:  # 'a_verificar'
+            return (status, True)  # Sempre processa
+    
+    def verificar_status_faturas(self, fatura_ids: Iterable[int], force: bool = False) -> Dict[int, Tuple[str, bool]]:
+        """
+        Verifica o status de várias faturas de uma vez (versão em lote de verificar_status_fatura)
+        
+        Conjuntos pequenos são consultados com WHERE id IN (...) em blocos; conjuntos
+        grandes são carregados em uma tabela temporária e resolvidos com um único JOIN.
+        
+        Args:
+            fatura_ids (iterable): IDs das faturas
+            force (bool): Se True, permite reprocessar faturas com erro
+        
+        Returns:
+            dict: {fatura_id: (status, deve_processar)} para todos os IDs informados
+                - IDs ausentes do banco retornam ('nao_encontrada', True)
+                - Em caso de erro, todos retornam ('erro', False)
+        """
+        ids = list(dict.fromkeys(fatura_ids))
+        if not ids:
+            return {}
+        
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            status_por_id = {}
+            
+            if len(ids) > LIMITE_CONSULTA_IN and not self.somente_leitura:
+                # Tabela temporária: um único JOIN, sem limite de parâmetros
+                cursor.execute("CREATE TEMP TABLE IF NOT EXISTS ids_consulta (id INTEGER PRIMARY KEY)")
+                cursor.execute("DELETE FROM temp.ids_consulta")
+                cursor.executemany("INSERT OR IGNORE INTO temp.ids_consulta (id) VALUES (?)", ((i,) for i in ids))
+                cursor.execute("""
+                    SELECT f.id, f.status
+                    FROM temp.ids_consulta c
+                    JOIN faturas f ON f.id = c.id
+                """)
+                status_por_id = {row['id']: row['status'] for row in cursor.fetchall()}
+                cursor.execute("DELETE FROM temp.ids_consulta")
+                conn.commit()
+            else:
+                for inicio in range(0, len(ids), LIMITE_CONSULTA_IN):
+                    bloco = ids[inicio:inicio + LIMITE_CONSULTA_IN]
+                    marcadores = ", ".join("?" * len(bloco))
+                    cursor.execute(f"""
+                        SELECT id, status FROM faturas WHERE id IN ({marcadores})
+                    """, bloco)
+                    status_por_id.update((row['id'], row['status']) for row in cursor.fetchall())
+            
+            return {
+                fatura_id: (
+                    self._regra_processamento(status_por_id[fatura_id], force)
+                    if fatura_id in status_por_id
+                    else ('nao_encontrada', True)
+                )
+                for fatura_id in ids
+            }
+            
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao verificar status das faturas: {str(e)}")
+            return {fatura_id: ('erro', False) for fatura_id in ids}
+    
     def atualizar_status_fatura(self, fatura_id: int, status: str, 
                                 mensagem_erro: Optional[str] = None,
                                 valor: Optional[str] = None,
                                 data_vencimento: Optional[str] = None,
                                 situacao_pagamento: Optional[str] = None,
                                 tipo_operacao: Optional[str] = None,
-                                log_execucao: Optional[str] = None) -> bool:
+                                log_execucao: Optional[str] = None,
+                                hash_pdf: Optional[str] = None) -> bool:
         """
         Atualiza o status de uma fatura após processamento
         
@@ -140,8 +282,9 @@ class DatabaseManager:
             valor (str): Valor da fatura
             data_vencimento (str): Data de vencimento
             situacao_pagamento (str): Situação de pagamento
-            tipo_operacao (str): Tipo de operação realizada (nao_encontrada, criada, atualizada, situacao_alterada, erro)
-            log_execucao (str): Log completo da execução da fatura
+            tipo_operacao (str): Tipo de operação realizada (nao_encontrada, criada, atualizada, situacao_alterada, pdf_inalterado, erro)
+            log_execucao (str): Log completo da execução da fatura (gravado comprimido em logs_execucao)
+            hash_pdf (str): Hash do PDF enviado com sucesso (se None, mantém o anterior)
         
         Returns:
             bool: True se atualizou, False se erro
@@ -150,33 +293,20 @@ class DatabaseManager:
             conn = self._get_connection()
             cursor = conn.cursor()
             
-            # Incrementar tentativas
-            cursor.execute("""
-                UPDATE faturas 
-                SET status = ?,
-                    data_processamento = ?,
-                    tentativas = tentativas + 1,
-                    mensagem_erro = ?,
-                    valor = ?,
-                    data_vencimento = ?,
-                    situacao_pagamento = ?,
-                    tipo_operacao = ?,
-                    log_execucao = ?
-                WHERE id = ?
-            """, (
-                status,
-                datetime.now(),
-                mensagem_erro,
-                valor,
-                data_vencimento,
-                situacao_pagamento,
-                tipo_operacao,
-                log_execucao,
-                fatura_id
-            ))
+            self._gravar_atualizacao_status(cursor, {
+                'fatura_id': fatura_id,
+                'status': status,
+                'data_processamento': datetime.now(),
+                'mensagem_erro': mensagem_erro,
+                'valor': valor,
+                'data_vencimento': data_vencimento,
+                'situacao_pagamento': situacao_pagamento,
+                'tipo_operacao': tipo_operacao,
+                'log_execucao': log_execucao,
+                'hash_pdf': hash_pdf
+            })
             
             conn.commit()
-            conn.close()
             
             if tipo_operacao:
                 print(f"   ✅ Status da fatura ID {fatura_id} atualizado para: {status} | Operação: {tipo_operacao}")
@@ -185,9 +315,111 @@ class DatabaseManager:
             return True
             
         except Exception as e:
+            self._desfazer_transacao()
             print(f"   ❌ Erro ao atualizar status da fatura: {str(e)}")
             return False
     
+    def _gravar_atualizacao_status(self, cursor, atualizacao: Dict):
+        """Executa o UPDATE de status de uma fatura (sem commit)"""
+        # Incrementar tentativas
+        cursor.execute("""
+            UPDATE faturas 
+            SET status = ?,
+                data_processamento = ?,
+                tentativas = tentativas + 1,
+                mensagem_erro = ?,
+                valor = ?,
+                valor_centavos = ?,
+                data_vencimento = ?,
+                situacao_pagamento = ?,
+                tipo_operacao = ?,
+                hash_pdf = COALESCE(?, hash_pdf)
+            WHERE id = ?
+        """, (
+            atualizacao['status'],
+            atualizacao['data_processamento'],
+            atualizacao.get('mensagem_erro'),
+            atualizacao.get('valor'),
+            valor_para_centavos(atualizacao.get('valor')),
+            normalizar_data(atualizacao.get('data_vencimento')),
+            atualizacao.get('situacao_pagamento'),
+            atualizacao.get('tipo_operacao'),
+            atualizacao.get('hash_pdf'),
+            atualizacao['fatura_id']
+        ))
+        
+        # Log comprimido na tabela separada, numerado pela tentativa recém-incrementada
+        if atualizacao.get('log_execucao'):
+            cursor.execute("""
+                INSERT OR REPLACE INTO logs_execucao (fatura_id, tentativa, data_registro, log_comprimido)
+                SELECT id, tentativas, ?, ? FROM faturas WHERE id = ?
+            """, (
+                atualizacao['data_processamento'],
+                comprimir_log(atualizacao['log_execucao']),
+                atualizacao['fatura_id']
+            ))
+    
+    def obter_hash_pdf(self, fatura_id: int) -> Optional[str]:
+        """
+        Obtém o hash do último PDF da fatura enviado com sucesso à API
+        
+        Args:
+            fatura_id (int): ID da fatura
+        
+        Returns:
+            str: Hash SHA-256 (hex) ou None se nenhum PDF foi enviado
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT hash_pdf FROM faturas WHERE id = ?", (fatura_id,))
+            resultado = cursor.fetchone()
+            return resultado['hash_pdf'] if resultado else None
+            
+        except Exception as e:
+            print(f"   ❌ Erro ao obter hash do PDF: {str(e)}")
+            return None
+    
+    def obter_log_execucao(self, fatura_id: int, tentativa: Optional[int] = None) -> Optional[str]:
+        """
+        Obtém o log de execução de uma fatura (lido sob demanda da tabela logs_execucao)
+        
+        Args:
+            fatura_id (int): ID da fatura
+            tentativa (int): Número da tentativa (padrão: a mais recente)
+        
+        Returns:
+            str: Log da execução ou None se não existir
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            if tentativa is None:
+                cursor.execute("""
+                    SELECT log_comprimido FROM logs_execucao
+                    WHERE fatura_id = ?
+                    ORDER BY tentativa DESC
+                    LIMIT 1
+                """, (fatura_id,))
+            else:
+                cursor.execute("""
+                    SELECT log_comprimido FROM logs_execucao
+                    WHERE fatura_id = ? AND tentativa = ?
+                """, (fatura_id, tentativa))
+            
+            resultado = cursor.fetchone()
+            
+            if not resultado:
+                return None
+            
+            return descomprimir_log(resultado['log_comprimido'])
+            
+        except Exception as e:
+            print(f"   ❌ Erro ao obter log de execução: {str(e)}")
+            return None
+    
     def obter_faturas_para_processar(self, cnpj_geradora: str, force: bool = False) -> List[Dict]:
         """
         Obtém lista de faturas que devem ser processadas para uma geradora
@@ -209,7 +441,7 @@ class DatabaseManager:
                     SELECT * FROM faturas 
                     WHERE cnpj_geradora = ? 
                     AND status IN ('a_verificar', 'erro')
-                    ORDER BY nova_uc, mes_referencia
+                    ORDER BY nova_uc, competencia
                 """, (cnpj_geradora,))
             else:
                 # Sem --force, processa apenas 'a_verificar'
@@ -217,11 +449,10 @@ class DatabaseManager:
                     SELECT * FROM faturas 
                     WHERE cnpj_geradora = ? 
                     AND status = 'a_verificar'
-                    ORDER BY nova_uc, mes_referencia
+                    ORDER BY nova_uc, competencia
                 """, (cnpj_geradora,))
             
             faturas = [dict(row) for row in cursor.fetchall()]
-            conn.close()
             
             return faturas
             
@@ -229,6 +460,359 @@ class DatabaseManager:
             print(f"   ❌ Erro ao obter faturas para processar: {str(e)}")
             return []
     
+    # ==================== SNAPSHOTS DA API ====================
+    
+    def obter_estado_busca(self, url: str) -> Dict:
+        """
+        Obtém os validadores HTTP da última resposta da API para a URL
+        
+        Args:
+            url (str): URL consultada
+        
+        Returns:
+            dict: {'etag': str, 'last_modified': str} (valores None se nunca buscada)
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT etag, last_modified FROM estado_busca_api WHERE url = ?
+            """, (url,))
+            
+            row = cursor.fetchone()
+            return dict(row) if row else {'etag': None, 'last_modified': None}
+            
+        except Exception as e:
+            print(f"   ❌ Erro ao obter estado da busca: {str(e)}")
+            return {'etag': None, 'last_modified': None}
+    
+    def salvar_estado_busca(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> bool:
+        """
+        Grava os validadores HTTP (ETag / Last-Modified) da última resposta da API
+        
+        Args:
+            url (str): URL consultada
+            etag (str): Cabeçalho ETag da resposta
+            last_modified (str): Cabeçalho Last-Modified da resposta
+        
+        Returns:
+            bool: True se gravou, False se erro
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO estado_busca_api (url, etag, last_modified, atualizado_em)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    atualizado_em = excluded.atualizado_em
+            """, (url, etag, last_modified, datetime.now()))
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao salvar estado da busca: {str(e)}")
+            return False
+    
+    def obter_hashes_snapshots(self) -> Dict[str, str]:
+        """
+        Obtém o hash do último JSON gravado de cada geradora
+        
+        Returns:
+            dict: {cnpj_geradora: hash_conteudo}
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT cnpj_geradora, hash_conteudo FROM snapshots_geradora")
+            
+            return {row['cnpj_geradora']: row['hash_conteudo'] for row in cursor.fetchall()}
+            
+        except Exception as e:
+            print(f"   ❌ Erro ao obter hashes dos snapshots: {str(e)}")
+            return {}
+    
+    def registrar_snapshot_geradora(self, cnpj_geradora: str, hash_conteudo: str,
+                                    fatura_ids: Iterable[int]) -> Optional[Dict[str, List[int]]]:
+        """
+        Registra o novo snapshot de uma geradora e calcula o diff com o anterior
+        
+        Args:
+            cnpj_geradora (str): CNPJ da geradora
+            hash_conteudo (str): Hash do conteúdo do JSON da geradora
+            fatura_ids (iterable): IDs das faturas presentes no novo JSON
+        
+        Returns:
+            dict: {'adicionadas': [ids], 'removidas': [ids]} em relação ao snapshot anterior
+                  (None em caso de erro)
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS ids_snapshot (id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM temp.ids_snapshot")
+            cursor.executemany("INSERT OR IGNORE INTO temp.ids_snapshot (id) VALUES (?)", ((i,) for i in fatura_ids))
+            
+            cursor.execute("""
+                SELECT n.id FROM temp.ids_snapshot n
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM snapshot_faturas s
+                    WHERE s.cnpj_geradora = ? AND s.fatura_id = n.id
+                )
+                ORDER BY n.id
+            """, (cnpj_geradora,))
+            adicionadas = [row[0] for row in cursor.fetchall()]
+            
+            cursor.execute("""
+                SELECT s.fatura_id FROM snapshot_faturas s
+                WHERE s.cnpj_geradora = ?
+                AND s.fatura_id NOT IN (SELECT id FROM temp.ids_snapshot)
+                ORDER BY s.fatura_id
+            """, (cnpj_geradora,))
+            removidas = [row[0] for row in cursor.fetchall()]
+            
+            cursor.executemany("""
+                DELETE FROM snapshot_faturas WHERE cnpj_geradora = ? AND fatura_id = ?
+            """, ((cnpj_geradora, i) for i in removidas))
+            cursor.executemany("""
+                INSERT INTO snapshot_faturas (cnpj_geradora, fatura_id) VALUES (?, ?)
+            """, ((cnpj_geradora, i) for i in adicionadas))
+            
+            cursor.execute("""
+                INSERT INTO snapshots_geradora (cnpj_geradora, hash_conteudo, total_faturas, atualizado_em)
+                VALUES (?, ?, (SELECT COUNT(*) FROM temp.ids_snapshot), ?)
+                ON CONFLICT(cnpj_geradora) DO UPDATE SET
+                    hash_conteudo = excluded.hash_conteudo,
+                    total_faturas = excluded.total_faturas,
+                    atualizado_em = excluded.atualizado_em
+            """, (cnpj_geradora, hash_conteudo, datetime.now()))
+            
+            cursor.execute("DELETE FROM temp.ids_snapshot")
+            conn.commit()
+            
+            return {'adicionadas': adicionadas, 'removidas': removidas}
+            
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao registrar snapshot da geradora: {str(e)}")
+            return None
+    
+    # ==================== OUTBOX DE ENVIOS ====================
+    
+    def registrar_envio_outbox(self, envio: Dict) -> bool:
+        """
+        Guarda (ou substitui) o envio à API de uma fatura na outbox
+        
+        Args:
+            envio (dict): fatura_id, url, corpo (JSON), opcoes (JSON), caminho_pdf, tipo_operacao,
+                          valor, data_vencimento, situacao_pagamento, proxima_tentativa, ultimo_erro
+        
+        Returns:
+            bool: True se gravou, False se erro
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT OR REPLACE INTO envios_pendentes (
+                    fatura_id, url, corpo, opcoes, caminho_pdf, tipo_operacao,
+                    valor, data_vencimento, situacao_pagamento,
+                    tentativas, proxima_tentativa, ultimo_erro, criado_em
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?)
+            """, (
+                envio['fatura_id'],
+                envio['url'],
+                envio['corpo'],
+                envio.get('opcoes'),
+                envio.get('caminho_pdf'),
+                envio.get('tipo_operacao'),
+                envio.get('valor'),
+                envio.get('data_vencimento'),
+                envio.get('situacao_pagamento'),
+                envio['proxima_tentativa'],
+                envio.get('ultimo_erro'),
+                datetime.now()
+            ))
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao registrar envio na outbox: {str(e)}")
+            return False
+    
+    def obter_envios_outbox(self, vencidos_ate: Optional[datetime] = None,
+                            limite: Optional[int] = None) -> List[Dict]:
+        """
+        Lista os envios guardados na outbox, do próximo a ser tentado ao último
+        
+        Args:
+            vencidos_ate (datetime): Apenas envios com próxima tentativa até este instante
+            limite (int): Quantidade máxima de envios
+        
+        Returns:
+            list: Envios da outbox
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            sql = "SELECT * FROM envios_pendentes"
+            parametros = []
+            if vencidos_ate is not None:
+                sql += " WHERE proxima_tentativa <= ?"
+                parametros.append(vencidos_ate)
+            sql += " ORDER BY proxima_tentativa"
+            if limite:
+                sql += " LIMIT ?"
+                parametros.append(limite)
+            
+            cursor.execute(sql, parametros)
+            return [dict(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            print(f"   ❌ Erro ao obter envios da outbox: {str(e)}")
+            return []
+    
+    def obter_ids_outbox(self) -> set:
+        """
+        IDs das faturas com envio aguardando na outbox
+        
+        Returns:
+            set: IDs das faturas
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT fatura_id FROM envios_pendentes")
+            return {row[0] for row in cursor.fetchall()}
+            
+        except Exception as e:
+            print(f"   ❌ Erro ao obter IDs da outbox: {str(e)}")
+            return set()
+    
+    def reservar_envio_outbox(self, fatura_id: int, proxima_tentativa, reservado_ate: datetime) -> bool:
+        """
+        Reserva um envio da outbox para uma tentativa (evita que outro processo envie o mesmo)
+        
+        A reserva só acontece se a próxima tentativa ainda for a lida da outbox;
+        até reservado_ate o envio não aparece como vencido para os demais.
+        
+        Args:
+            fatura_id (int): ID da fatura
+            proxima_tentativa: Valor de proxima_tentativa lido em obter_envios_outbox
+            reservado_ate (datetime): Até quando a tentativa fica reservada
+        
+        Returns:
+            bool: True se reservou, False se outro processo já reservou (ou erro)
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE envios_pendentes SET proxima_tentativa = ?
+                WHERE fatura_id = ? AND proxima_tentativa = ?
+            """, (reservado_ate, fatura_id, proxima_tentativa))
+            
+            conn.commit()
+            return cursor.rowcount == 1
+            
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao reservar envio da outbox: {str(e)}")
+            return False
+    
+    def reagendar_envio_outbox(self, fatura_id: int, tentativas: int,
+                               proxima_tentativa: datetime, ultimo_erro: Optional[str]) -> bool:
+        """
+        Registra uma tentativa sem sucesso e agenda a próxima
+        
+        Args:
+            fatura_id (int): ID da fatura
+            tentativas (int): Tentativas feitas pela outbox até agora
+            proxima_tentativa (datetime): Quando tentar de novo
+            ultimo_erro (str): Erro da última tentativa
+        
+        Returns:
+            bool: True se gravou, False se erro
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE envios_pendentes
+                SET tentativas = ?, proxima_tentativa = ?, ultimo_erro = ?
+                WHERE fatura_id = ?
+            """, (tentativas, proxima_tentativa, ultimo_erro, fatura_id))
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao reagendar envio da outbox: {str(e)}")
+            return False
+    
+    def concluir_envio_outbox(self, fatura_id: int, status: str,
+                              mensagem_erro: Optional[str] = None,
+                              valor: Optional[str] = None,
+                              data_vencimento: Optional[str] = None,
+                              situacao_pagamento: Optional[str] = None,
+                              tipo_operacao: Optional[str] = None,
+                              log_execucao: Optional[str] = None,
+                              hash_pdf: Optional[str] = None) -> bool:
+        """
+        Remove o envio da outbox e grava o status final da fatura na mesma transação
+        
+        Args:
+            fatura_id (int): ID da fatura
+            status (str): 'sucesso' (API confirmou) ou 'erro' (tentativas esgotadas)
+            (demais parâmetros iguais aos de atualizar_status_fatura)
+        
+        Returns:
+            bool: True se gravou, False se erro
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            self._gravar_atualizacao_status(cursor, {
+                'fatura_id': fatura_id,
+                'status': status,
+                'data_processamento': datetime.now(),
+                'mensagem_erro': mensagem_erro,
+                'valor': valor,
+                'data_vencimento': data_vencimento,
+                'situacao_pagamento': situacao_pagamento,
+                'tipo_operacao': tipo_operacao,
+                'log_execucao': log_execucao,
+                'hash_pdf': hash_pdf
+            })
+            cursor.execute("DELETE FROM envios_pendentes WHERE fatura_id = ?", (fatura_id,))
+            
+            conn.commit()
+            print(f"   ✅ Envio da fatura ID {fatura_id} retirado da outbox | Status: {status}")
+            return True
+            
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao concluir envio da outbox: {str(e)}")
+            return False
+    
     # ==================== OPERAÇÕES COM EXECUÇÕES DIÁRIAS ====================
     
     def registrar_execucao_uc(self, cnpj_geradora: str, nova_uc: str, 
@@ -254,46 +838,92 @@ class DatabaseManager:
             conn = self._get_connection()
             cursor = conn.cursor()
             
-            data_hoje = date.today()
-            
-            # Determinar status da execução
-            if faturas_sucesso == total_faturas:
-                status_execucao = 'completo'
-            elif faturas_sucesso > 0:
-                status_execucao = 'parcial'
-            else:
-                status_execucao = 'falha'
-            
-            # Inserir ou substituir registro do dia
-            cursor.execute("""
-                INSERT OR REPLACE INTO execucoes_diarias (
-                    data_execucao, cnpj_geradora, nova_uc,
-                    total_faturas, faturas_sucesso, faturas_erro, faturas_puladas,
-                    status_execucao, data_hora_inicio, data_hora_fim
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                data_hoje,
-                cnpj_geradora,
-                nova_uc,
-                total_faturas,
-                faturas_sucesso,
-                faturas_erro,
-                faturas_puladas,
-                status_execucao,
-                data_hora_inicio,
-                datetime.now()
-            ))
+            status_execucao = self._gravar_execucao_uc(cursor, {
+                'data_execucao': date.today(),
+                'cnpj_geradora': cnpj_geradora,
+                'nova_uc': nova_uc,
+                'total_faturas': total_faturas,
+                'faturas_sucesso': faturas_sucesso,
+                'faturas_erro': faturas_erro,
+                'faturas_puladas': faturas_puladas,
+                'data_hora_inicio': data_hora_inicio,
+                'data_hora_fim': datetime.now()
+            })
             
             conn.commit()
-            conn.close()
             
             print(f"   📊 Execução da UC {nova_uc} registrada: {status_execucao}")
             return True
             
         except Exception as e:
+            self._desfazer_transacao()
             print(f"   ❌ Erro ao registrar execução: {str(e)}")
             return False
     
+    def _gravar_execucao_uc(self, cursor, execucao: Dict) -> str:
+        """Executa o INSERT OR REPLACE da execução de uma UC (sem commit) e retorna o status_execucao"""
+        # Determinar status da execução
+        if execucao['faturas_sucesso'] == execucao['total_faturas']:
+            status_execucao = 'completo'
+        elif execucao['faturas_sucesso'] > 0:
+            status_execucao = 'parcial'
+        else:
+            status_execucao = 'falha'
+        
+        # Inserir ou substituir registro do dia
+        cursor.execute("""
+            INSERT OR REPLACE INTO execucoes_diarias (
+                data_execucao, cnpj_geradora, nova_uc,
+                total_faturas, faturas_sucesso, faturas_erro, faturas_puladas,
+                status_execucao, data_hora_inicio, data_hora_fim
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            execucao['data_execucao'],
+            execucao['cnpj_geradora'],
+            execucao['nova_uc'],
+            execucao['total_faturas'],
+            execucao['faturas_sucesso'],
+            execucao['faturas_erro'],
+            execucao['faturas_puladas'],
+            status_execucao,
+            execucao['data_hora_inicio'],
+            execucao['data_hora_fim']
+        ))
+        
+        return status_execucao
+    
+    def gravar_em_lote(self, atualizacoes: List[Dict], execucoes: Optional[List[Dict]] = None) -> bool:
+        """
+        Grava atualizações de status e execuções de UC em uma única transação
+        Usado pelo BufferEscrita para agrupar vários commits em um só
+        
+        Args:
+            atualizacoes (list): Dicionários com os campos de atualizar_status_fatura
+                                 mais 'data_processamento'
+            execucoes (list): Dicionários com os campos de registrar_execucao_uc
+                              mais 'data_execucao' e 'data_hora_fim'
+        
+        Returns:
+            bool: True se gravou tudo, False se erro (nada é gravado)
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            for atualizacao in atualizacoes:
+                self._gravar_atualizacao_status(cursor, atualizacao)
+            
+            for execucao in execucoes or []:
+                self._gravar_execucao_uc(cursor, execucao)
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao gravar lote no banco: {str(e)}")
+            return False
+    
     def obter_execucoes_do_dia(self, data_execucao: Optional[date] = None) -> List[Dict]:
         """
         Obtém todas as execuções de um dia específico
@@ -318,7 +948,6 @@ class DatabaseManager:
             """, (data_execucao,))
             
             execucoes = [dict(row) for row in cursor.fetchall()]
-            conn.close()
             
             return execucoes
             
@@ -331,66 +960,172 @@ class DatabaseManager:
     def obter_estatisticas_geradora(self, cnpj_geradora: str) -> Dict:
         """
         Obtém estatísticas de processamento de uma geradora
+        Lê os contadores da tabela estatisticas_status (mantida por triggers)
         
         Args:
             cnpj_geradora (str): CNPJ da geradora
         
         Returns:
-            dict: Estatísticas da geradora
+            dict: Estatísticas da geradora (total, a_verificar, sucesso, erro)
         """
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN status = 'a_verificar' THEN 1 ELSE 0 END) as a_verificar,
-                    SUM(CASE WHEN status = 'sucesso' THEN 1 ELSE 0 END) as sucesso,
-                    SUM(CASE WHEN status = 'erro' THEN 1 ELSE 0 END) as erro
-                FROM faturas
+                SELECT status, total FROM estatisticas_status
                 WHERE cnpj_geradora = ?
             """, (cnpj_geradora,))
             
-            resultado = dict(cursor.fetchone())
-            conn.close()
-            
-            return resultado
+            return self._montar_estatisticas(cursor.fetchall())
             
         except Exception as e:
             print(f"   ❌ Erro ao obter estatísticas: {str(e)}")
             return {}
     
-    def limpar_faturas_antigas(self, dias: int = 90) -> int:
+    def obter_estatisticas_gerais(self) -> Dict:
         """
-        Remove faturas processadas com sucesso há mais de X dias
+        Obtém estatísticas de processamento somando todas as geradoras
+        
+        Returns:
+            dict: Estatísticas gerais (total, a_verificar, sucesso, erro)
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT status, SUM(total) AS total FROM estatisticas_status
+                GROUP BY status
+            """)
+            
+            return self._montar_estatisticas(cursor.fetchall())
+            
+        except Exception as e:
+            print(f"   ❌ Erro ao obter estatísticas gerais: {str(e)}")
+            return {}
+    
+    def obter_estatisticas_dia(self, data_processamento: Optional[date] = None) -> Dict[str, Dict]:
+        """
+        Obtém, por geradora, as faturas processadas em um dia agrupadas pelo status atual
         
         Args:
-            dias (int): Número de dias para manter no histórico
+            data_processamento (date): Dia a consultar (padrão: hoje)
         
         Returns:
-            int: Número de registros removidos
+            dict: {cnpj_geradora: {total, a_verificar, sucesso, erro}}
         """
         try:
+            if data_processamento is None:
+                data_processamento = date.today()
+            
             conn = self._get_connection()
             cursor = conn.cursor()
             
             cursor.execute("""
-                DELETE FROM faturas 
-                WHERE status = 'sucesso' 
-                AND data_processamento < datetime('now', '-' || ? || ' days')
-            """, (dias,))
+                SELECT cnpj_geradora, status, total FROM estatisticas_dia
+                WHERE dia_processamento = ?
+                ORDER BY cnpj_geradora
+            """, (str(data_processamento),))
             
-            removidos = cursor.rowcount
-            conn.commit()
-            conn.close()
+            linhas_por_geradora = {}
+            for row in cursor.fetchall():
+                linhas_por_geradora.setdefault(row['cnpj_geradora'], []).append(row)
             
-            print(f"   🗑️ {removidos} faturas antigas removidas do banco")
-            return removidos
+            return {
+                cnpj: self._montar_estatisticas(linhas)
+                for cnpj, linhas in linhas_por_geradora.items()
+            }
             
         except Exception as e:
-            print(f"   ❌ Erro ao limpar faturas antigas: {str(e)}")
-            return 0
+            print(f"   ❌ Erro ao obter estatísticas do dia: {str(e)}")
+            return {}
+    
+    def obter_totais_por_competencia(self, competencia_inicial: int, competencia_final: int,
+                                     cnpj_geradora: Optional[str] = None) -> List[Dict]:
+        """
+        Soma quantidade e valor das faturas por competência (mês de referência) e geradora
+        
+        Args:
+            competencia_inicial (int): Primeira competência no formato AAAAMM (ex: 202601)
+            competencia_final (int): Última competência no formato AAAAMM
+            cnpj_geradora (str): Restringe a uma geradora (opcional)
+        
+        Returns:
+            list: [{competencia, cnpj_geradora, total, sucesso, erro, valor_centavos}]
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            filtro_geradora = "AND cnpj_geradora = ?" if cnpj_geradora else ""
+            parametros = (competencia_inicial, competencia_final) + ((cnpj_geradora,) if cnpj_geradora else ())
+            
+            cursor.execute(f"""
+                SELECT 
+                    competencia,
+                    cnpj_geradora,
+                    COUNT(*) as total,
+                    SUM(status = 'sucesso') as sucesso,
+                    SUM(status = 'erro') as erro,
+                    COALESCE(SUM(valor_centavos), 0) as valor_centavos
+                FROM faturas
+                WHERE competencia BETWEEN ? AND ?
+                {filtro_geradora}
+                GROUP BY competencia, cnpj_geradora
+                ORDER BY competencia, cnpj_geradora
+            """, parametros)
+            
+            return [dict(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            print(f"   ❌ Erro ao obter totais por competência: {str(e)}")
+            return []
+    
+    @staticmethod
+    def _montar_estatisticas(linhas) -> Dict:
+        """Converte linhas (status, total) dos contadores no dicionário de estatísticas"""
+        estatisticas = {'total': 0, 'a_verificar': 0, 'sucesso': 0, 'erro': 0}
+        for row in linhas:
+            estatisticas[row['status']] = estatisticas.get(row['status'], 0) + row['total']
+            estatisticas['total'] += row['total']
+        return estatisticas
+    
+    def arquivar_faturas_antigas(self, dias: int = 90,
+                                 diretorio: str = DIRETORIO_ARQUIVO) -> Dict:
+        """
+        Move faturas processadas com sucesso há mais de X dias para os bancos de arquivo mensais
+        (ver database/arquivamento.py) e compacta o banco principal
+        
+        Args:
+            dias (int): Número de dias para manter no banco principal
+            diretorio (str): Diretório dos bancos de arquivo
+        
+        Returns:
+            dict: {'movidas', 'bytes_recuperados', 'segundos', 'arquivos'}
+        """
+        try:
+            resultado = arquivar_faturas_antigas(self.db_path, dias, diretorio)
+            print(f"   📦 {resultado['movidas']} faturas antigas movidas para {len(resultado['arquivos'])} arquivo(s)")
+            return resultado
+            
+        except Exception as e:
+            self._desfazer_transacao()
+            print(f"   ❌ Erro ao arquivar faturas antigas: {str(e)}")
+            return {'movidas': 0, 'bytes_recuperados': 0, 'segundos': 0.0, 'arquivos': []}
+    
+    def limpar_faturas_antigas(self, dias: int = 90) -> int:
+        """
+        Remove do banco principal faturas processadas com sucesso há mais de X dias
+        As faturas são movidas para os bancos de arquivo (arquivar_faturas_antigas)
+        
+        Args:
+            dias (int): Número de dias para manter no histórico
+        
+        Returns:
+            int: Número de registros removidos
+        """
+        return self.arquivar_faturas_antigas(dias)['movidas']
     
     def resetar_status_erro(self, fatura_id: Optional[int] = None, 
                            cnpj_geradora: Optional[str] = None) -> int:
@@ -430,11 +1165,11 @@ class DatabaseManager:
             
             resetados = cursor.rowcount
             conn.commit()
-            conn.close()
             
             print(f"   🔄 {resetados} faturas com erro resetadas para reprocessamento")
             return resetados
             
         except Exception as e:
+            self._desfazer_transacao()
             print(f"   ❌ Erro ao resetar status: {str(e)}")
             return 0
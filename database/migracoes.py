@@ -0,0 +1,427 @@
+"""
+Migrações versionadas do esquema do banco de dados
+
+Cada migração é uma tupla (versao, descricao, funcao). As versões aplicadas ficam
+registradas na tabela versao_schema e as pendentes são executadas em ordem por
+inicializar_banco(), cada uma em sua própria transação.
+
+Para alterar o esquema, adicione uma nova função e uma nova entrada no fim de
+MIGRACOES - nunca altere uma migração já publicada. Migrações que não podem
+rodar em transação (ex.: VACUUM) marcam a função com transacional = False.
+"""
+
+import sqlite3
+from datetime import datetime
+
+from .compressao import comprimir_log
+from .conversoes import valor_para_centavos, normalizar_data
+
+# ==================== MIGRAÇÕES ====================
+
+def _m001_logs_execucao(conn):
+    """
+    Move os logs da coluna faturas.log_execucao para a tabela logs_execucao
+    
+    Os logs são comprimidos e gravados como tentativa atual de cada fatura.
+    Depois da cópia a coluna é removida (ou esvaziada em SQLite < 3.35).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs_execucao (
+            fatura_id INTEGER NOT NULL,
+            tentativa INTEGER NOT NULL,
+            data_registro DATETIME NOT NULL,
+            log_comprimido BLOB NOT NULL,
+            PRIMARY KEY (fatura_id, tentativa)
+        )
+    """)
+    
+    colunas = [row[1] for row in conn.execute("PRAGMA table_info(faturas)")]
+    if 'log_execucao' not in colunas:
+        return
+    
+    cursor = conn.execute("""
+        SELECT id, tentativas, data_processamento, data_criacao, log_execucao
+        FROM faturas
+        WHERE log_execucao IS NOT NULL AND log_execucao != ''
+    """)
+    
+    migrados = 0
+    while True:
+        linhas = cursor.fetchmany(500)
+        if not linhas:
+            break
+        conn.executemany("""
+            INSERT OR IGNORE INTO logs_execucao (fatura_id, tentativa, data_registro, log_comprimido)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (
+                row[0],
+                max(row[1] or 0, 1),
+                row[2] or row[3],
+                comprimir_log(row[4])
+            )
+            for row in linhas
+        ])
+        migrados += len(linhas)
+    
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute("ALTER TABLE faturas DROP COLUMN log_execucao")
+    else:
+        conn.execute("UPDATE faturas SET log_execucao = NULL")
+    
+    print(f"   ✅ {migrados} logs migrados para logs_execucao")
+
+def _m002_indices_consulta(conn):
+    """
+    Coluna dia_processamento (gerada a partir de data_processamento) e índices compostos
+    
+    - dia_processamento permite filtrar por dia/intervalo usando índice
+      (em vez de DATE(data_processamento), que não usa índice)
+    - (cnpj_geradora, status, nova_uc, mes_referencia) atende obter_faturas_para_processar
+      sem varredura e já entrega a ordenação
+    - idx_faturas_geradora passa a ser prefixo do índice composto e é removido
+    """
+    conn.execute("""
+        ALTER TABLE faturas
+        ADD COLUMN dia_processamento TEXT
+        GENERATED ALWAYS AS (substr(data_processamento, 1, 10)) VIRTUAL
+    """)
+    
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_faturas_geradora_status
+        ON faturas(cnpj_geradora, status, nova_uc, mes_referencia)
+    """)
+    
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_faturas_dia_processamento
+        ON faturas(dia_processamento, cnpj_geradora, nova_uc, mes_referencia)
+    """)
+    
+    conn.execute("DROP INDEX IF EXISTS idx_faturas_geradora")
+
+def _m003_estatisticas_agregadas(conn):
+    """
+    Tabelas de contadores por (geradora, status) e por (dia, geradora, status)
+    
+    Os contadores são mantidos por triggers em INSERT/UPDATE/DELETE de faturas,
+    então estatísticas e verificação de pendências não precisam varrer a tabela.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS estatisticas_status (
+            cnpj_geradora TEXT NOT NULL,
+            status TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (cnpj_geradora, status)
+        ) WITHOUT ROWID
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS estatisticas_dia (
+            dia_processamento TEXT NOT NULL,
+            cnpj_geradora TEXT NOT NULL,
+            status TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia_processamento, cnpj_geradora, status)
+        ) WITHOUT ROWID
+    """)
+    
+    # Carga inicial a partir dos dados existentes
+    conn.execute("DELETE FROM estatisticas_status")
+    conn.execute("""
+        INSERT INTO estatisticas_status (cnpj_geradora, status, total)
+        SELECT cnpj_geradora, status, COUNT(*)
+        FROM faturas
+        GROUP BY cnpj_geradora, status
+    """)
+    
+    conn.execute("DELETE FROM estatisticas_dia")
+    conn.execute("""
+        INSERT INTO estatisticas_dia (dia_processamento, cnpj_geradora, status, total)
+        SELECT dia_processamento, cnpj_geradora, status, COUNT(*)
+        FROM faturas
+        WHERE dia_processamento IS NOT NULL
+        GROUP BY dia_processamento, cnpj_geradora, status
+    """)
+    
+    # Trechos reutilizados pelos triggers
+    incrementar_status = """
+        INSERT INTO estatisticas_status (cnpj_geradora, status, total)
+        VALUES (NEW.cnpj_geradora, NEW.status, 1)
+        ON CONFLICT(cnpj_geradora, status) DO UPDATE SET total = total + 1;
+    """
+    decrementar_status = """
+        UPDATE estatisticas_status SET total = total - 1
+        WHERE cnpj_geradora = OLD.cnpj_geradora AND status = OLD.status;
+    """
+    incrementar_dia = """
+        INSERT INTO estatisticas_dia (dia_processamento, cnpj_geradora, status, total)
+        SELECT substr(NEW.data_processamento, 1, 10), NEW.cnpj_geradora, NEW.status, 1
+        WHERE NEW.data_processamento IS NOT NULL
+        ON CONFLICT(dia_processamento, cnpj_geradora, status) DO UPDATE SET total = total + 1;
+    """
+    decrementar_dia = """
+        UPDATE estatisticas_dia SET total = total - 1
+        WHERE dia_processamento = substr(OLD.data_processamento, 1, 10)
+        AND cnpj_geradora = OLD.cnpj_geradora AND status = OLD.status;
+    """
+    
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_faturas_estatisticas_insert
+        AFTER INSERT ON faturas
+        BEGIN
+            {incrementar_status}
+            {incrementar_dia}
+        END
+    """)
+    
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_faturas_estatisticas_delete
+        AFTER DELETE ON faturas
+        BEGIN
+            {decrementar_status}
+            {decrementar_dia}
+        END
+    """)
+    
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_faturas_estatisticas_update_status
+        AFTER UPDATE OF status, cnpj_geradora ON faturas
+        WHEN OLD.status IS NOT NEW.status OR OLD.cnpj_geradora IS NOT NEW.cnpj_geradora
+        BEGIN
+            {decrementar_status}
+            {incrementar_status}
+        END
+    """)
+    
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_faturas_estatisticas_update_dia
+        AFTER UPDATE OF status, cnpj_geradora, data_processamento ON faturas
+        WHEN OLD.status IS NOT NEW.status
+          OR OLD.cnpj_geradora IS NOT NEW.cnpj_geradora
+          OR substr(OLD.data_processamento, 1, 10) IS NOT substr(NEW.data_processamento, 1, 10)
+        BEGIN
+            {decrementar_dia}
+            {incrementar_dia}
+        END
+    """)
+
+def _m004_auto_vacuum_incremental(conn):
+    """
+    Ativa auto_vacuum=INCREMENTAL para que o arquivamento possa devolver espaço ao disco
+    
+    A mudança só vale depois de um VACUUM completo, que não pode rodar dentro de
+    transação - por isso esta migração é marcada como não transacional.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return
+    
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+_m004_auto_vacuum_incremental.transacional = False
+
+def _m005_colunas_tipadas(conn):
+    """
+    Colunas tipadas para valor e mês de referência, com carga a partir dos campos texto
+    
+    - valor_centavos (INTEGER): valor da fatura em centavos (somável em SQL)
+    - competencia (INTEGER): mês de referência como AAAAMM (ordena corretamente entre anos)
+    - data_vencimento passa a ser sempre ISO (AAAA-MM-DD)
+    - índices que ordenavam por mes_referencia (texto MM/AAAA) passam a usar competencia
+    """
+    conn.execute("ALTER TABLE faturas ADD COLUMN valor_centavos INTEGER")
+    conn.execute("ALTER TABLE faturas ADD COLUMN competencia INTEGER")
+    
+    # MM/AAAA => AAAAMM
+    conn.execute("""
+        UPDATE faturas
+        SET competencia = CAST(substr(mes_referencia, 4, 4) || substr(mes_referencia, 1, 2) AS INTEGER)
+        WHERE mes_referencia GLOB '[0-9][0-9]/[0-9][0-9][0-9][0-9]'
+    """)
+    
+    linhas = conn.execute("""
+        SELECT id, valor, data_vencimento FROM faturas
+        WHERE valor IS NOT NULL OR data_vencimento IS NOT NULL
+    """).fetchall()
+    conn.executemany("""
+        UPDATE faturas SET valor_centavos = ?, data_vencimento = ? WHERE id = ?
+    """, [
+        (valor_para_centavos(row[1]), normalizar_data(row[2]), row[0])
+        for row in linhas
+    ])
+    
+    conn.execute("DROP INDEX IF EXISTS idx_faturas_geradora_status")
+    conn.execute("""
+        CREATE INDEX idx_faturas_geradora_status
+        ON faturas(cnpj_geradora, status, nova_uc, competencia)
+    """)
+    
+    conn.execute("DROP INDEX IF EXISTS idx_faturas_dia_processamento")
+    conn.execute("""
+        CREATE INDEX idx_faturas_dia_processamento
+        ON faturas(dia_processamento, cnpj_geradora, nova_uc, competencia)
+    """)
+    
+    conn.execute("DROP INDEX IF EXISTS idx_faturas_uc_mes")
+    # Remove o idx_faturas_geradora que ainda exista no banco (o prefixo de idx_faturas_geradora_status o cobre)
+    conn.execute("DROP INDEX IF EXISTS idx_faturas_geradora")
+    conn.execute("""
+        CREATE INDEX idx_faturas_uc_competencia
+        ON faturas(nova_uc, competencia)
+    """)
+    
+    # Consultas por intervalo de competência (totais por mês/geradora)
+    conn.execute("""
+        CREATE INDEX idx_faturas_competencia
+        ON faturas(competencia, cnpj_geradora, status, valor_centavos)
+    """)
+
+def _m006_snapshots_api(conn):
+    """
+    Estado da última busca na API GEUS, usado para buscas condicionais e diffs
+    
+    - estado_busca_api: ETag / Last-Modified da última resposta por URL
+    - snapshots_geradora: hash do conteúdo do JSON de cada geradora
+    - snapshot_faturas: IDs presentes no último JSON de cada geradora
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS estado_busca_api (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            atualizado_em DATETIME NOT NULL
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshots_geradora (
+            cnpj_geradora TEXT PRIMARY KEY,
+            hash_conteudo TEXT NOT NULL,
+            total_faturas INTEGER NOT NULL,
+            atualizado_em DATETIME NOT NULL
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_faturas (
+            cnpj_geradora TEXT NOT NULL,
+            fatura_id INTEGER NOT NULL,
+            PRIMARY KEY (cnpj_geradora, fatura_id)
+        ) WITHOUT ROWID
+    """)
+
+def _m007_outbox_envios(conn):
+    """
+    Outbox dos envios à API GEUS que falharam
+    
+    Cada linha guarda o que é preciso para repetir o envio sem voltar ao portal:
+    URL, corpo JSON (sem o PDF), opções da chamada e o caminho do PDF guardado em
+    disco. O retentor (function/outbox.py) reenvia com backoff até confirmar.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS envios_pendentes (
+            fatura_id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL,
+            corpo TEXT NOT NULL,
+            opcoes TEXT,
+            caminho_pdf TEXT,
+            tipo_operacao TEXT,
+            valor TEXT,
+            data_vencimento TEXT,
+            situacao_pagamento TEXT,
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            proxima_tentativa DATETIME NOT NULL,
+            ultimo_erro TEXT,
+            criado_em DATETIME NOT NULL
+        )
+    """)
+    
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_envios_pendentes_proxima
+        ON envios_pendentes(proxima_tentativa)
+    """)
+
+def _m008_hash_pdf(conn):
+    """
+    Hash (SHA-256) do último PDF enviado com sucesso à API GEUS, por fatura
+    
+    Um PDF baixado de novo e idêntico ao já enviado não precisa ser reenviado:
+    o robô manda só a atualização da situação de pagamento.
+    """
+    conn.execute("ALTER TABLE faturas ADD COLUMN hash_pdf TEXT")
+
+MIGRACOES = [
+    (1, "Logs de execução em tabela separada e comprimidos", _m001_logs_execucao),
+    (2, "Coluna dia_processamento e índices compostos", _m002_indices_consulta),
+    (3, "Contadores de estatísticas mantidos por triggers", _m003_estatisticas_agregadas),
+    (4, "auto_vacuum incremental", _m004_auto_vacuum_incremental),
+    (5, "Colunas tipadas valor_centavos e competencia", _m005_colunas_tipadas),
+    (6, "Estado da busca na API e snapshots por geradora", _m006_snapshots_api),
+    (7, "Outbox dos envios à API GEUS", _m007_outbox_envios),
+    (8, "Hash do último PDF enviado por fatura", _m008_hash_pdf),
+]
+
+# ==================== EXECUÇÃO ====================
+
+def obter_versao_atual(conn):
+    """
+    Retorna a maior versão de migração aplicada no banco
+    
+    Args:
+        conn: Conexão com o banco
+    
+    Returns:
+        int: Versão atual (0 se nenhuma migração foi aplicada)
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS versao_schema (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em DATETIME NOT NULL
+        )
+    """)
+    
+    resultado = conn.execute("SELECT MAX(versao) FROM versao_schema").fetchone()
+    return resultado[0] or 0
+
+def aplicar_migracoes(conn):
+    """
+    Aplica, em ordem, todas as migrações ainda não registradas em versao_schema
+    
+    Cada migração roda em uma transação própria: se falhar, é desfeita e
+    as seguintes não são executadas. Migrações não transacionais rodam
+    fora de transação e só têm a versão registrada depois de concluídas.
+    
+    Args:
+        conn: Conexão com o banco (fora de transação)
+    
+    Returns:
+        int: Quantidade de migrações aplicadas
+    """
+    versao_atual = obter_versao_atual(conn)
+    conn.commit()
+    
+    aplicadas = 0
+    for versao, descricao, funcao in MIGRACOES:
+        if versao <= versao_atual:
+            continue
+        
+        print(f"🔄 Aplicando migração {versao}: {descricao}...")
+        transacional = getattr(funcao, 'transacional', True)
+        try:
+            if transacional:
+                conn.execute("BEGIN")
+            funcao(conn)
+            conn.execute("""
+                INSERT INTO versao_schema (versao, descricao, aplicada_em)
+                VALUES (?, ?, ?)
+            """, (versao, descricao, datetime.now()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            print(f"   ❌ Falha na migração {versao} - alterações desfeitas")
+            raise
+        
+        aplicadas += 1
+    
+    return aplicadas
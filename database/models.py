@@ -2,17 +2,37 @@
 Definição das tabelas e estrutura do banco de dados
 """
 
-import sqlite3
-from datetime import datetime
+from .conexao import obter_conexao
+from .migracoes import aplicar_migracoes, obter_versao_atual
 
 def inicializar_banco(db_path="database/faturas.db"):
     """
-    Cria as tabelas do banco de dados se não existirem
+    Cria as tabelas do banco de dados se não existirem e aplica as migrações pendentes
     
     Args:
         db_path (str): Caminho para o arquivo do banco de dados
     """
-    conn = sqlite3.connect(db_path)
+    conn = obter_conexao(db_path)
+    
+    # Depois da primeira migração o esquema base não é mais recriado
+    # (migrações removem índices que ele criaria de novo)
+    if obter_versao_atual(conn) == 0:
+        _criar_esquema_base(conn)
+    
+    # Migrações versionadas (database/migracoes.py)
+    aplicar_migracoes(conn)
+    
+    print("✅ Banco de dados inicializado com sucesso")
+
+def _criar_esquema_base(conn):
+    """
+    Cria o esquema base (versão 0)
+    
+    Qualquer alteração posterior é feita por uma migração em database/migracoes.py.
+    
+    Args:
+        conn: Conexão com o banco
+    """
     cursor = conn.cursor()
     
     # Tabela de faturas - controle de processamento
@@ -76,6 +96,3 @@ def inicializar_banco(db_path="database/faturas.db"):
     """)
     
     conn.commit()
-    conn.close()
-    
-    print("✅ Banco de dados inicializado com sucesso")
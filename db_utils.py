@@ -7,7 +7,8 @@ Comandos disponíveis:
   stats [cnpj]           - Mostra estatísticas (geral ou por geradora)
   reset-errors [cnpj]    - Reseta faturas com erro para reprocessamento
   execucoes [data]       - Lista execuções do dia (formato: YYYY-MM-DD)
-  clean [dias]           - Remove faturas antigas (padrão: 90 dias)
+  clean [dias]           - Arquiva faturas antigas e compacta o banco (padrão: 90 dias)
+  outbox [drenar]        - Lista os envios à API aguardando nova tentativa (drenar: tenta agora)
 """
 
 import sys
@@ -22,31 +23,14 @@ def comando_init():
 
 def comando_stats(cnpj_geradora=None):
     """Mostra estatísticas de processamento"""
-    db = DatabaseManager()
+    db = DatabaseManager(somente_leitura=True)
     
     if cnpj_geradora:
         print(f"\n📊 Estatísticas da geradora: {cnpj_geradora}")
         stats = db.obter_estatisticas_geradora(cnpj_geradora)
     else:
         print("\n📊 Estatísticas gerais de todas as geradoras")
-        # Buscar estatísticas gerais
-        import sqlite3
-        conn = sqlite3.connect(db.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'a_verificar' THEN 1 ELSE 0 END) as a_verificar,
-                SUM(CASE WHEN status = 'sucesso' THEN 1 ELSE 0 END) as sucesso,
-                SUM(CASE WHEN status = 'erro' THEN 1 ELSE 0 END) as erro
-            FROM faturas
-        """)
-        
-        row = cursor.fetchone()
-        stats = dict(row) if row else {}
-        conn.close()
+        stats = db.obter_estatisticas_gerais()
     
     print(f"  Total de faturas: {stats.get('total', 0)}")
     print(f"  A verificar: {stats.get('a_verificar', 0)}")
@@ -93,12 +77,34 @@ def comando_execucoes(data_str=None):
         print(f"  Início: {exec['data_hora_inicio']} | Fim: {exec['data_hora_fim']}")
 
 def comando_clean(dias=90):
-    """Remove faturas antigas do banco"""
+    """Arquiva faturas antigas e compacta o banco"""
+    db = DatabaseManager()
+    
+    print(f"\n🗑️ Arquivando faturas com sucesso processadas há mais de {dias} dias...")
+    resultado = db.arquivar_faturas_antigas(dias)
+    
+    print(f"✅ {resultado['movidas']} registros movidos para o arquivo")
+    print(f"  Espaço recuperado: {resultado['bytes_recuperados'] / 1024:.1f} KB")
+    print(f"  Tempo: {resultado['segundos']:.2f}s")
+    for caminho in resultado['arquivos']:
+        print(f"  📁 {caminho}")
+
+def comando_outbox(drenar=False):
+    """Lista os envios da outbox e, se pedido, tenta os vencidos agora"""
     db = DatabaseManager()
     
-    print(f"\n🗑️ Removendo faturas com sucesso processadas há mais de {dias} dias...")
-    removidos = db.limpar_faturas_antigas(dias)
-    print(f"✅ {removidos} registros removidos")
+    if drenar:
+        from function.outbox import drenar_outbox
+        print("\n📮 Tentando os envios vencidos da outbox...")
+        resumo = drenar_outbox(db)
+        print(f"✅ {resumo['enviados']} enviados | {resumo['reagendados']} reagendados | {resumo['esgotados']} esgotados")
+    
+    envios = db.obter_envios_outbox()
+    print(f"\n📮 Envios na outbox: {len(envios)}")
+    for envio in envios:
+        print(f"\n  Fatura ID: {envio['fatura_id']} | Operação: {envio['tipo_operacao']}")
+        print(f"  Tentativas: {envio['tentativas']} | Próxima: {envio['proxima_tentativa']}")
+        print(f"  Último erro: {envio['ultimo_erro']}")
 
 def mostrar_ajuda():
     """Mostra ajuda de uso"""
@@ -130,6 +136,10 @@ if __name__ == "__main__":
         dias = int(sys.argv[2]) if len(sys.argv) > 2 else 90
         comando_clean(dias)
     
+    elif comando == "outbox":
+        drenar = len(sys.argv) > 2 and sys.argv[2].lower() == "drenar"
+        comando_outbox(drenar)
+    
     else:
         print(f"❌ Comando desconhecido: {comando}")
         mostrar_ajuda()
@@ -1,15 +1,69 @@
 """
 Script unificado para gerenciamento de faturas
 """
-import sqlite3
 from datetime import datetime, date, timedelta
 import sys
 import os
 
+from database import obter_conexao, inicializar_banco
+from database.conversoes import centavos_para_valor
+
+DB_PATH = 'database/faturas.db'
+
 def limpar_tela():
     """Limpa a tela do terminal"""
     os.system('cls' if os.name == 'nt' else 'clear')
 
+def obter_resumo_faturas(cursor, filtro, parametros):
+    """
+    Calcula no banco os totais da aba de resumo dos relatórios
+    
+    Args:
+        cursor: Cursor de uma conexão de leitura
+        filtro (str): Condição WHERE das faturas do relatório
+        parametros (tuple): Parâmetros do filtro
+    
+    Returns:
+        tuple: (totais, tipos_operacao, geradoras)
+    """
+    cursor.execute(f"""
+        SELECT 
+            COUNT(*) as total,
+            COALESCE(SUM(status = 'sucesso'), 0) as sucesso,
+            COALESCE(SUM(status = 'erro'), 0) as erro,
+            COALESCE(SUM(valor_centavos), 0) as valor_centavos
+        FROM faturas
+        WHERE {filtro}
+    """, parametros)
+    
+    totais = dict(cursor.fetchone())
+    
+    cursor.execute(f"""
+        SELECT COALESCE(NULLIF(tipo_operacao, ''), 'Não registrado') as tipo, COUNT(*) as total
+        FROM faturas
+        WHERE {filtro}
+        GROUP BY tipo
+        ORDER BY tipo
+    """, parametros)
+    
+    tipos_operacao = {row['tipo']: row['total'] for row in cursor.fetchall()}
+    
+    cursor.execute(f"""
+        SELECT 
+            cnpj_geradora,
+            COUNT(*) as total,
+            SUM(status = 'sucesso') as sucesso,
+            SUM(status != 'sucesso') as erro,
+            COALESCE(SUM(valor_centavos), 0) as valor_centavos
+        FROM faturas
+        WHERE {filtro}
+        GROUP BY cnpj_geradora
+    """, parametros)
+    
+    geradoras = {row['cnpj_geradora']: dict(row) for row in cursor.fetchall()}
+    
+    return totais, tipos_operacao, geradoras
+
 def gerar_relatorio_unico(data_execucao):
     """
     Gera relatório XLSX para uma data específica
@@ -34,8 +88,7 @@ def gerar_relatorio_unico(data_execucao):
         from openpyxl.utils import get_column_letter
     
     # Conectar ao banco
-    conn = sqlite3.connect('database/faturas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obter_conexao(DB_PATH, somente_leitura=True)
     cursor = conn.cursor()
     
     # Buscar faturas processadas no dia
@@ -46,8 +99,8 @@ def gerar_relatorio_unico(data_execucao):
             situacao_pagamento, data_processamento, tentativas, 
             mensagem_erro
         FROM faturas
-        WHERE DATE(data_processamento) = ?
-        ORDER BY cnpj_geradora, nova_uc, mes_referencia
+        WHERE dia_processamento = ?
+        ORDER BY cnpj_geradora, nova_uc, competencia
     """, (data_execucao,))
     
     faturas = [dict(row) for row in cursor.fetchall()]
@@ -65,11 +118,11 @@ def gerar_relatorio_unico(data_execucao):
     
     execucoes = [dict(row) for row in cursor.fetchall()]
     
-    conn.close()
-    
     if not faturas and not execucoes:
         return None
     
+    totais, tipos_operacao, geradoras = obter_resumo_faturas(cursor, "dia_processamento = ?", (data_execucao,))
+    
     # Criar workbook
     wb = Workbook()
     
@@ -91,9 +144,9 @@ def gerar_relatorio_unico(data_execucao):
     ws_resumo['A1'].font = Font(bold=True, size=14)
     ws_resumo.merge_cells('A1:F1')
     
-    total_faturas = len(faturas)
-    total_sucesso = sum(1 for f in faturas if f['status'] == 'sucesso')
-    total_erro = sum(1 for f in faturas if f['status'] == 'erro')
+    total_faturas = totais['total']
+    total_sucesso = totais['sucesso']
+    total_erro = totais['erro']
     
     ws_resumo['A3'] = "ESTATÍSTICAS GERAIS"
     ws_resumo['A3'].font = Font(bold=True, size=12)
@@ -106,16 +159,13 @@ def gerar_relatorio_unico(data_execucao):
     ws_resumo['B6'] = total_erro
     ws_resumo['A7'] = "Taxa de Sucesso:"
     ws_resumo['B7'] = f"{(total_sucesso/total_faturas*100):.1f}%" if total_faturas > 0 else "0%"
+    ws_resumo['A8'] = "Valor Total:"
+    ws_resumo['B8'] = f"R$ {centavos_para_valor(totais['valor_centavos'])}"
     
-    ws_resumo['A9'] = "POR TIPO DE OPERAÇÃO"
-    ws_resumo['A9'].font = Font(bold=True, size=12)
+    ws_resumo['A10'] = "POR TIPO DE OPERAÇÃO"
+    ws_resumo['A10'].font = Font(bold=True, size=12)
     
-    tipos_operacao = {}
-    for f in faturas:
-        tipo = f['tipo_operacao'] or 'Não registrado'
-        tipos_operacao[tipo] = tipos_operacao.get(tipo, 0) + 1
-    
-    linha = 10
+    linha = 11
     for tipo, count in sorted(tipos_operacao.items()):
         ws_resumo[f'A{linha}'] = f"{tipo}:"
         ws_resumo[f'B{linha}'] = count
@@ -124,25 +174,15 @@ def gerar_relatorio_unico(data_execucao):
     ws_resumo[f'A{linha+1}'] = "POR GERADORA"
     ws_resumo[f'A{linha+1}'].font = Font(bold=True, size=12)
     
-    geradoras = {}
-    for f in faturas:
-        cnpj = f['cnpj_geradora']
-        if cnpj not in geradoras:
-            geradoras[cnpj] = {'total': 0, 'sucesso': 0, 'erro': 0}
-        geradoras[cnpj]['total'] += 1
-        if f['status'] == 'sucesso':
-            geradoras[cnpj]['sucesso'] += 1
-        else:
-            geradoras[cnpj]['erro'] += 1
-    
     linha += 3
     ws_resumo[f'A{linha}'] = "CNPJ"
     ws_resumo[f'B{linha}'] = "Total"
     ws_resumo[f'C{linha}'] = "Sucesso"
     ws_resumo[f'D{linha}'] = "Erro"
     ws_resumo[f'E{linha}'] = "Taxa"
+    ws_resumo[f'F{linha}'] = "Valor Total"
     
-    for col in ['A', 'B', 'C', 'D', 'E']:
+    for col in ['A', 'B', 'C', 'D', 'E', 'F']:
         ws_resumo[f'{col}{linha}'].fill = header_fill
         ws_resumo[f'{col}{linha}'].font = header_font
         ws_resumo[f'{col}{linha}'].border = border
@@ -154,6 +194,7 @@ def gerar_relatorio_unico(data_execucao):
         ws_resumo[f'C{linha}'] = stats['sucesso']
         ws_resumo[f'D{linha}'] = stats['erro']
         ws_resumo[f'E{linha}'] = f"{(stats['sucesso']/stats['total']*100):.1f}%"
+        ws_resumo[f'F{linha}'] = f"R$ {centavos_para_valor(stats['valor_centavos'])}"
         linha += 1
     
     ws_resumo.column_dimensions['A'].width = 30
@@ -161,6 +202,7 @@ def gerar_relatorio_unico(data_execucao):
     ws_resumo.column_dimensions['C'].width = 15
     ws_resumo.column_dimensions['D'].width = 15
     ws_resumo.column_dimensions['E'].width = 15
+    ws_resumo.column_dimensions['F'].width = 18
     
     # ==================== ABA 2: FATURAS ====================
     ws_faturas = wb.create_sheet("Faturas Processadas")
@@ -353,8 +395,7 @@ def gerar_relatorio_intervalo():
     print(f"\n📊 Buscando dados de {data_inicial_str} até {data_final_str}...")
     
     # Conectar ao banco
-    conn = sqlite3.connect('database/faturas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obter_conexao(DB_PATH, somente_leitura=True)
     cursor = conn.cursor()
     
     # Buscar faturas do período
@@ -365,7 +406,7 @@ def gerar_relatorio_intervalo():
             situacao_pagamento, data_processamento, tentativas, 
             mensagem_erro
         FROM faturas
-        WHERE DATE(data_processamento) BETWEEN ? AND ?
+        WHERE dia_processamento BETWEEN ? AND ?
         ORDER BY data_processamento, cnpj_geradora, nova_uc
     """, (data_inicial.strftime("%Y-%m-%d"), data_final.strftime("%Y-%m-%d")))
     
@@ -384,13 +425,17 @@ def gerar_relatorio_intervalo():
     
     execucoes = [dict(row) for row in cursor.fetchall()]
     
-    conn.close()
-    
     if not faturas and not execucoes:
         print(f"\n⚠️ Nenhum dado encontrado para o período")
         input("\nPressione ENTER para continuar...")
         return
     
+    totais, tipos_operacao, geradoras = obter_resumo_faturas(
+        cursor,
+        "dia_processamento BETWEEN ? AND ?",
+        (data_inicial.strftime("%Y-%m-%d"), data_final.strftime("%Y-%m-%d"))
+    )
+    
     # Criar workbook
     wb = Workbook()
     
@@ -414,9 +459,9 @@ def gerar_relatorio_intervalo():
     ws_resumo.merge_cells('A1:F1')
     
     # Estatísticas gerais
-    total_faturas = len(faturas)
-    total_sucesso = sum(1 for f in faturas if f['status'] == 'sucesso')
-    total_erro = sum(1 for f in faturas if f['status'] == 'erro')
+    total_faturas = totais['total']
+    total_sucesso = totais['sucesso']
+    total_erro = totais['erro']
     
     ws_resumo['A3'] = "ESTATÍSTICAS GERAIS"
     ws_resumo['A3'].font = Font(bold=True, size=12)
@@ -429,17 +474,14 @@ def gerar_relatorio_intervalo():
     ws_resumo['B6'] = total_erro
     ws_resumo['A7'] = "Taxa de Sucesso:"
     ws_resumo['B7'] = f"{(total_sucesso/total_faturas*100):.1f}%" if total_faturas > 0 else "0%"
+    ws_resumo['A8'] = "Valor Total:"
+    ws_resumo['B8'] = f"R$ {centavos_para_valor(totais['valor_centavos'])}"
     
     # Por tipo de operação
-    ws_resumo['A9'] = "POR TIPO DE OPERAÇÃO"
-    ws_resumo['A9'].font = Font(bold=True, size=12)
+    ws_resumo['A10'] = "POR TIPO DE OPERAÇÃO"
+    ws_resumo['A10'].font = Font(bold=True, size=12)
     
-    tipos_operacao = {}
-    for f in faturas:
-        tipo = f['tipo_operacao'] or 'Não registrado'
-        tipos_operacao[tipo] = tipos_operacao.get(tipo, 0) + 1
-    
-    linha = 10
+    linha = 11
     for tipo, count in sorted(tipos_operacao.items()):
         ws_resumo[f'A{linha}'] = f"{tipo}:"
         ws_resumo[f'B{linha}'] = count
@@ -449,25 +491,15 @@ def gerar_relatorio_intervalo():
     ws_resumo[f'A{linha+1}'] = "POR GERADORA"
     ws_resumo[f'A{linha+1}'].font = Font(bold=True, size=12)
     
-    geradoras = {}
-    for f in faturas:
-        cnpj = f['cnpj_geradora']
-        if cnpj not in geradoras:
-            geradoras[cnpj] = {'total': 0, 'sucesso': 0, 'erro': 0}
-        geradoras[cnpj]['total'] += 1
-        if f['status'] == 'sucesso':
-            geradoras[cnpj]['sucesso'] += 1
-        else:
-            geradoras[cnpj]['erro'] += 1
-    
     linha += 3
     ws_resumo[f'A{linha}'] = "CNPJ"
     ws_resumo[f'B{linha}'] = "Total"
     ws_resumo[f'C{linha}'] = "Sucesso"
     ws_resumo[f'D{linha}'] = "Erro"
     ws_resumo[f'E{linha}'] = "Taxa"
+    ws_resumo[f'F{linha}'] = "Valor Total"
     
-    for col in ['A', 'B', 'C', 'D', 'E']:
+    for col in ['A', 'B', 'C', 'D', 'E', 'F']:
         ws_resumo[f'{col}{linha}'].fill = header_fill
         ws_resumo[f'{col}{linha}'].font = header_font
         ws_resumo[f'{col}{linha}'].border = border
@@ -479,6 +511,7 @@ def gerar_relatorio_intervalo():
         ws_resumo[f'C{linha}'] = stats['sucesso']
         ws_resumo[f'D{linha}'] = stats['erro']
         ws_resumo[f'E{linha}'] = f"{(stats['sucesso']/stats['total']*100):.1f}%"
+        ws_resumo[f'F{linha}'] = f"R$ {centavos_para_valor(stats['valor_centavos'])}"
         linha += 1
     
     ws_resumo.column_dimensions['A'].width = 30
@@ -486,6 +519,7 @@ def gerar_relatorio_intervalo():
     ws_resumo.column_dimensions['C'].width = 15
     ws_resumo.column_dimensions['D'].width = 15
     ws_resumo.column_dimensions['E'].width = 15
+    ws_resumo.column_dimensions['F'].width = 18
     
     # ==================== ABA 2: FATURAS ====================
     ws_faturas = wb.create_sheet("Faturas Processadas")
@@ -626,15 +660,15 @@ def verificar_faturas_pendentes():
     print("=" * 80)
     print()
     
-    conn = sqlite3.connect('database/faturas.db')
-    conn.row_factory = sqlite3.Row
+    conn = obter_conexao(DB_PATH, somente_leitura=True)
     cursor = conn.cursor()
     
-    # Contar faturas por status
+    # Contar faturas por status (contadores mantidos por triggers)
     cursor.execute("""
-        SELECT status, COUNT(*) as total
-        FROM faturas
+        SELECT status, SUM(total) as total
+        FROM estatisticas_status
         GROUP BY status
+        HAVING SUM(total) > 0
     """)
     
     print("📊 DISTRIBUIÇÃO POR STATUS:")
@@ -656,10 +690,9 @@ def verificar_faturas_pendentes():
         
         # Mostrar detalhes por geradora
         cursor.execute("""
-            SELECT cnpj_geradora, COUNT(*) as total
-            FROM faturas
-            WHERE status = 'a_verificar'
-            GROUP BY cnpj_geradora
+            SELECT cnpj_geradora, total
+            FROM estatisticas_status
+            WHERE status = 'a_verificar' AND total > 0
             ORDER BY total DESC
         """)
         
@@ -678,7 +711,7 @@ def verificar_faturas_pendentes():
                 SELECT id, nova_uc, mes_referencia, cnpj_geradora, data_criacao
                 FROM faturas
                 WHERE status = 'a_verificar'
-                ORDER BY cnpj_geradora, nova_uc, mes_referencia
+                ORDER BY cnpj_geradora, nova_uc, competencia
                 LIMIT 50
             """)
             
@@ -698,8 +731,6 @@ def verificar_faturas_pendentes():
         print(f"⚠️ Existem {total_erros} faturas com status 'erro'")
         print("💡 Use 'python robo.py --force' para reprocessar faturas com erro")
     
-    conn.close()
-    
     input("\nPressione ENTER para continuar...")
 
 def menu_principal():
@@ -745,9 +776,12 @@ def menu_principal():
 
 if __name__ == "__main__":
     # Verificar se banco existe
-    if not os.path.exists('database/faturas.db'):
+    if not os.path.exists(DB_PATH):
         print("❌ Banco de dados não encontrado!")
         print("Execute o robô primeiro: python robo.py")
         sys.exit(1)
     
+    # Garantir que o esquema está atualizado (migrações pendentes)
+    inicializar_banco(DB_PATH)
+    
     menu_principal()
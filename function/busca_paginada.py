@@ -0,0 +1,202 @@
+"""
+Download paginado e paralelo do feed de faturas da API GEUS
+
+Em vez de uma única resposta com todas as faturas, o feed é baixado:
+- por página (API_PAGINACAO=pagina): parâmetros de página/tamanho; o total de páginas
+  vem dos cabeçalhos X-Total-Pages/X-Total-Count ou do corpo ('count'/'total').
+  Sem total, as páginas são pedidas em janelas até vir uma página incompleta
+  (ou, depois da primeira, 404 / corpo vazio);
+  se o corpo trouxer 'next' (cursor), as páginas seguem o cursor em sequência.
+- por geradora (API_PAGINACAO=geradora): uma requisição por CNPJ de geradoras.py
+
+As requisições rodam em paralelo com limite (API_PAGINAS_PARALELAS) e as faturas
+são devolvidas na ordem das páginas, então o resultado organizado (e o hash de
+cada snapshot) é o mesmo da resposta única.
+"""
+
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count, islice
+
+from config import (
+    API_PAGINACAO, API_TAMANHO_PAGINA, API_PAGINAS_PARALELAS,
+    API_PARAM_PAGINA, API_PARAM_TAMANHO_PAGINA, API_PARAM_GERADORA
+)
+from geradoras import GERADORAS_CNPJS
+from function import cliente_http
+
+MODOS_PAGINACAO = ("pagina", "geradora")
+
+# Chaves aceitas para a lista de faturas quando a página vem como objeto
+CHAVES_LISTA = ("results", "data", "faturas", "items")
+
+
+def _ler_pagina(response, tamanho_pagina):
+    """
+    Extrai faturas, total de páginas e cursor seguinte de uma resposta paginada
+
+    Returns:
+        tuple: (faturas, total_paginas ou None, url_proxima ou None)
+    """
+    corpo = response.json()
+
+    if isinstance(corpo, list):
+        faturas, total_itens, proxima = corpo, None, None
+    else:
+        faturas = next((corpo[chave] for chave in CHAVES_LISTA if isinstance(corpo.get(chave), list)), [])
+        total_itens, proxima = corpo.get("count", corpo.get("total")), corpo.get("next")
+
+    total_paginas = response.headers.get("X-Total-Pages", "")
+    if total_paginas.isdigit():
+        return faturas, int(total_paginas), proxima
+
+    total_itens = response.headers.get("X-Total-Count", total_itens)
+    if total_itens is not None and str(total_itens).isdigit():
+        return faturas, math.ceil(int(total_itens) / tamanho_pagina), proxima
+    return faturas, None, proxima
+
+
+def _baixar(url, auth, headers, params=None, descricao="página", tamanho_pagina=1, fim_sem_pagina=False):
+    """
+    Baixa uma página do feed; levanta exceção se a API não responder 200
+
+    Com fim_sem_pagina, 404 ou corpo vazio indicam que o feed acabou e retornam None
+    (páginas pedidas além da última quando o total é desconhecido)
+    """
+    response = cliente_http.get(url, endpoint="GEUS faturas (paginado)", headers=headers, auth=auth, params=params)
+    try:
+        if fim_sem_pagina:
+            sem_corpo = response.status_code in (200, 204) and not response.content.strip()
+            if response.status_code == 404 or sem_corpo:
+                return None
+        if response.status_code != 200:
+            raise RuntimeError(f"GEUS respondeu {response.status_code} para {descricao}")
+        return _ler_pagina(response, tamanho_pagina)
+    finally:
+        response.close()
+
+
+def _em_ordem(executor, tarefas, janela):
+    """
+    Executa as tarefas no pool mantendo no máximo 'janela' em andamento
+    e gera os resultados na ordem em que as tarefas foram criadas
+
+    Args:
+        executor (ThreadPoolExecutor): Pool das requisições
+        tarefas (iterable): Funções sem argumentos (uma por requisição)
+        janela (int): Requisições pedidas à frente da que está sendo consumida
+    """
+    tarefas = iter(tarefas)
+    pendentes = deque(executor.submit(tarefa) for tarefa in islice(tarefas, janela))
+    try:
+        while pendentes:
+            resultado = pendentes.popleft().result()
+            proxima = next(tarefas, None)
+            if proxima is not None:
+                pendentes.append(executor.submit(proxima))
+            yield resultado
+    finally:
+        for futuro in pendentes:
+            futuro.cancel()
+
+
+def _iterar_por_pagina(executor, url, auth, headers, tamanho_pagina, paralelas):
+    """Gera as listas de faturas de cada página, na ordem das páginas"""
+    def baixar_pagina(numero):
+        params = {API_PARAM_PAGINA: numero, API_PARAM_TAMANHO_PAGINA: tamanho_pagina}
+        return _baixar(url, auth, headers, params, f"página {numero}", tamanho_pagina)[0]
+
+    # A primeira página diz quantas páginas existem (ou se o feed usa cursor)
+    faturas, total_paginas, proxima = _baixar(
+        url, auth, headers, {API_PARAM_PAGINA: 1, API_PARAM_TAMANHO_PAGINA: tamanho_pagina}, "página 1", tamanho_pagina
+    )
+    yield faturas
+
+    if total_paginas is not None:
+        print(f"   📄 {total_paginas} páginas de até {tamanho_pagina} faturas ({paralelas} em paralelo)")
+        yield from _em_ordem(
+            executor,
+            ((lambda numero=numero: baixar_pagina(numero)) for numero in range(2, total_paginas + 1)),
+            paralelas
+        )
+        return
+
+    if proxima:
+        # Cursor: cada página aponta a seguinte, não há como paralelizar
+        print("   📄 Paginação por cursor (páginas em sequência)")
+        while proxima:
+            faturas, _, proxima = _baixar(proxima, auth, headers, descricao=proxima)
+            yield faturas
+        return
+
+    if len(faturas) < tamanho_pagina:
+        return
+
+    # Total desconhecido: pede páginas à frente até vir uma incompleta; se o total for
+    # múltiplo do tamanho da página, a seguinte à última vem com 404 ou corpo vazio
+    def sondar_pagina(numero):
+        params = {API_PARAM_PAGINA: numero, API_PARAM_TAMANHO_PAGINA: tamanho_pagina}
+        pagina = _baixar(url, auth, headers, params, f"página {numero}", tamanho_pagina, fim_sem_pagina=True)
+        return None if pagina is None else pagina[0]
+
+    print(f"   📄 Total de páginas desconhecido - baixando {paralelas} por vez até a última")
+    for faturas in _em_ordem(
+        executor,
+        ((lambda numero=numero: sondar_pagina(numero)) for numero in count(2)),
+        paralelas
+    ):
+        if faturas is None:
+            return
+        yield faturas
+        if len(faturas) < tamanho_pagina:
+            return
+
+
+def _iterar_por_geradora(executor, url, auth, headers, paralelas):
+    """Gera as listas de faturas de cada geradora de geradoras.py"""
+    print(f"   🏭 Uma requisição por geradora ({len(GERADORAS_CNPJS)} geradoras, {paralelas} em paralelo)")
+
+    def baixar_geradora(cnpj):
+        return _baixar(url, auth, headers, {API_PARAM_GERADORA: cnpj}, f"geradora {cnpj}")[0]
+
+    yield from _em_ordem(
+        executor,
+        ((lambda cnpj=cnpj: baixar_geradora(cnpj)) for cnpj in GERADORAS_CNPJS),
+        paralelas
+    )
+
+
+def iterar_faturas_paginadas(url, auth, headers=None, modo=None, tamanho_pagina=None, paralelas=None):
+    """
+    Gera as faturas do feed baixando páginas (ou geradoras) em paralelo
+
+    Args:
+        url (str): URL do feed de faturas
+        auth (tuple): Credenciais (login, senha)
+        headers (dict): Cabeçalhos da requisição
+        modo (str): 'pagina' ou 'geradora' (padrão: API_PAGINACAO do .env)
+        tamanho_pagina (int): Faturas por página (padrão: API_TAMANHO_PAGINA)
+        paralelas (int): Requisições simultâneas (padrão: API_PAGINAS_PARALELAS)
+
+    Yields:
+        dict: Cada fatura, na ordem das páginas
+
+    Raises:
+        RuntimeError: Se alguma página não vier com status 200
+    """
+    modo = modo or API_PAGINACAO
+    if modo not in MODOS_PAGINACAO:
+        raise ValueError(f"Modo de paginação inválido: {modo!r} (use {' ou '.join(MODOS_PAGINACAO)})")
+
+    tamanho_pagina = tamanho_pagina or API_TAMANHO_PAGINA
+    paralelas = max(1, paralelas or API_PAGINAS_PARALELAS)
+
+    with ThreadPoolExecutor(max_workers=paralelas, thread_name_prefix="geus-pagina") as executor:
+        if modo == "pagina":
+            paginas = _iterar_por_pagina(executor, url, auth, headers, tamanho_pagina, paralelas)
+        else:
+            paginas = _iterar_por_geradora(executor, url, auth, headers, paralelas)
+
+        for faturas in paginas:
+            yield from faturas
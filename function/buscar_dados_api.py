@@ -1,15 +1,37 @@
-import os
 import json
-import requests
-from config import API_DOMAIN_FATURAS_PROD, API_DOMAIN_FATURAS_DEV, API_CREDENTIAL_LOGIN, API_CREDENTIAL_PASSWORD, DEBUG_MODE
+import hashlib
+import threading
+import time
+from config import API_DOMAIN_FATURAS_PROD, API_DOMAIN_FATURAS_DEV, API_CREDENTIAL_LOGIN, API_CREDENTIAL_PASSWORD, DEBUG_MODE, API_STREAMING, SNAPSHOT_DISCO, BUSCA_CACHE_TTL, API_PAGINACAO
 from geradoras import (
     USINA_LUNA_CNPJ, USINA_SULINA_CNPJ, USINA_LB_CNPJ, 
     USINA_ENERGIAA_CNPJ, USINA_LUZDIVINA_CNPJ, USINA_G114_CNPJ, USINA_SLLG
 )
 from database import DatabaseManager
+from function.leitor_json import iterar_itens_array_json
+from function.busca_paginada import iterar_faturas_paginadas
+from function.fatura_task import SnapshotGeradora
+from function import cliente_http
+from function.snapshots import (
+    DIRETORIO_SNAPSHOTS, salvar_snapshot, guardar_snapshot, carregar_snapshot,
+    snapshot_disponivel, localizar_snapshot_disco, descartar_snapshots, idade_snapshot, formatar_idade
+)
 
 debug_mode = DEBUG_MODE
 
+# Situações de pagamento que geram tarefas para o robô
+SITUACOES_PROCESSADAS = ["pendente", "a_vencer", "vencida", "agendado"]
+
+# Tamanho dos blocos lidos da resposta da API no modo streaming
+TAMANHO_BLOCO_STREAMING = 64 * 1024
+
+# Última busca na API, reutilizada pelas execuções iniciadas dentro do TTL (BUSCA_CACHE_TTL)
+# O lock só protege este dicionário (nunca fica preso durante a consulta à API):
+# 'em_andamento' é a busca em curso, aguardada pelas execuções simultâneas, e
+# 'geracao' muda a cada invalidação para que uma busca iniciada antes não entre no cache
+_lock_cache_busca = threading.Lock()
+_cache_busca = {'resultado': None, 'instante': 0.0, 'geracao': 0, 'em_andamento': None}
+
 def extrair_numero_fatura(nova_uc):
     """Extrai o número da fatura removendo tudo antes de '/' e depois de '-'
     Exemplo: 10/3622059-8 => 3622059
@@ -37,170 +59,299 @@ def mapear_situacao_para_tarefa(situacao_pagamento):
     }
     return mapeamento.get(situacao_pagamento, f"fatura_{situacao_pagamento}")
 
+def classificar_fatura(fatura):
+    """
+    Verifica se a fatura da API deve virar tarefa e extrai os campos de agrupamento
+    
+    Args:
+        fatura (dict): Fatura como veio da API
+    
+    Returns:
+        tuple: (cnpj_geradora, nova_uc, situacao_pagamento) ou None se a fatura deve ser ignorada
+    """
+    cnpj_geradora = fatura.get("cnpj_geradora")
+    nova_uc_original = fatura.get("nova_uc")
+    situacao_pagamento = fatura.get("situacao_pagamento")
+    
+    # Pular faturas sem dados essenciais
+    if not cnpj_geradora or not nova_uc_original or not nova_uc_original.strip() or not situacao_pagamento:
+        return None
+    
+    # Filtrar apenas as situações que nos interessam
+    if situacao_pagamento not in SITUACOES_PROCESSADAS:
+        return None
+    
+    # Extrair apenas o número da fatura (ex: 10/3622059-8 => 3622059)
+    return cnpj_geradora, extrair_numero_fatura(nova_uc_original), situacao_pagamento
+
 def organizar_faturas_por_geradora(faturas):
-    """Organiza as faturas por geradora e nova_uc conforme estrutura solicitada"""
+    """
+    Organiza as faturas por geradora e nova_uc conforme estrutura solicitada
+    
+    Args:
+        faturas (iterable): Faturas da API (lista ou iterador)
+    
+    Returns:
+        dict: {cnpj_geradora: SnapshotGeradora} com um FaturaTask por fatura
+    """
     geradoras_organizadas = {}
     
     for fatura in faturas:
-        cnpj_geradora = fatura.get("cnpj_geradora")
-        nova_uc_original = fatura.get("nova_uc")
-        situacao_pagamento = fatura.get("situacao_pagamento")
-        
-        # Pular faturas sem dados essenciais
-        if not cnpj_geradora or not nova_uc_original or not situacao_pagamento:
+        classificacao = classificar_fatura(fatura)
+        if classificacao is None:
             continue
-            
-        # Filtrar apenas as situações que nos interessam
-        if situacao_pagamento not in ["pendente", "a_vencer", "vencida", "agendado"]:
-            continue
-        
-        # Extrair apenas o número da fatura (ex: 10/3622059-8 => 3622059)
-        nova_uc = extrair_numero_fatura(nova_uc_original)
-        
-        # Inicializar estrutura da geradora se não existir
-        if cnpj_geradora not in geradoras_organizadas:
-            geradoras_organizadas[cnpj_geradora] = {
-                "geradora": cnpj_geradora,
-                "lista_ucs": {}
-            }
         
-        # Inicializar lista da UC se não existir
-        if nova_uc not in geradoras_organizadas[cnpj_geradora]["lista_ucs"]:
-            geradoras_organizadas[cnpj_geradora]["lista_ucs"][nova_uc] = []
+        cnpj_geradora, nova_uc, situacao_pagamento = classificacao
         
-        # Adicionar tarefa baseada na situação de pagamento
-        fatura_com_tarefa = fatura.copy()
-        fatura_com_tarefa["tarefa"] = mapear_situacao_para_tarefa(situacao_pagamento)
-        # Atualizar o campo nova_uc com o valor processado
-        fatura_com_tarefa["nova_uc"] = nova_uc
+        # Inicializar snapshot da geradora se não existir
+        snapshot = geradoras_organizadas.get(cnpj_geradora)
+        if snapshot is None:
+            snapshot = geradoras_organizadas[cnpj_geradora] = SnapshotGeradora(cnpj_geradora)
         
-        # Adicionar fatura à lista da UC
-        geradoras_organizadas[cnpj_geradora]["lista_ucs"][nova_uc].append(fatura_com_tarefa)
+        # Adicionar tarefa baseada na situação de pagamento e o nova_uc processado
+        # (o payload completo vai para o armazém; em memória fica só o FaturaTask)
+        snapshot.adicionar(nova_uc, dict(fatura, tarefa=mapear_situacao_para_tarefa(situacao_pagamento), nova_uc=nova_uc))
     
     return geradoras_organizadas
 
-def salvar_json_por_geradora(geradoras_organizadas, diretorio="media/json"):
-    """Salva um JSON para cada geradora usando apenas os números do CNPJ"""
+def calcular_hash_snapshot(pares_uc_fatura):
+    """
+    Calcula o hash do conteúdo do JSON de uma geradora
     
-    def extrair_numeros_cnpj(cnpj):
-        """Extrai apenas os números do CNPJ"""
-        return ''.join(filter(str.isdigit, cnpj))
+    Args:
+        pares_uc_fatura (iterable): Pares (nova_uc, fatura) na ordem em que vão para o JSON
     
-    arquivos_salvos = []
-    db = DatabaseManager()
+    Returns:
+        str: Hash SHA-256 em hexadecimal
+    """
+    hash_conteudo = hashlib.sha256()
+    for nova_uc, fatura in pares_uc_fatura:
+        hash_conteudo.update(nova_uc.encode("utf-8") + b"\t")
+        hash_conteudo.update(json.dumps(fatura, sort_keys=True, ensure_ascii=False).encode("utf-8") + b"\n")
+    return hash_conteudo.hexdigest()
+
+def gravar_snapshot_geradora(db, snapshot, hashes_anteriores, diretorio=DIRETORIO_SNAPSHOTS):
+    """
+    Entrega o snapshot da geradora ao robô (em memória) e grava banco e cópia em disco
+    somente se o conteúdo mudou desde a última busca
     
-    for cnpj_geradora, dados_geradora in geradoras_organizadas.items():
-        # Usar apenas os números do CNPJ como nome do arquivo
-        nome_arquivo_numerico = extrair_numeros_cnpj(cnpj_geradora)
-        nome_arquivo = f"{nome_arquivo_numerico}.json"
-        caminho_arquivo = os.path.join(diretorio, nome_arquivo)
-        
-        # Contar total de faturas para esta geradora
-        total_faturas = sum(len(faturas_uc) for faturas_uc in dados_geradora["lista_ucs"].values())
-        
-        # Inserir/atualizar faturas no banco de dados
-        print(f"💾 Salvando faturas da geradora {cnpj_geradora} no banco de dados...")
-        faturas_inseridas = 0
-        
-        for nova_uc, faturas in dados_geradora["lista_ucs"].items():
-            for fatura in faturas:
-                fatura_db = {
-                    'id': fatura.get('id'),
-                    'nova_uc': nova_uc,
-                    'mes_referencia': fatura.get('data_referencia'),
-                    'cnpj_geradora': cnpj_geradora
-                }
-                
-                if db.inserir_ou_atualizar_fatura(fatura_db):
-                    faturas_inseridas += 1
-        
-        print(f"   ✅ {faturas_inseridas} faturas processadas no banco de dados")
-        
-        # Salvar JSON completo (todas as faturas da API)
-        with open(caminho_arquivo, "w", encoding="utf-8") as json_file:
-            json.dump(dados_geradora, json_file, indent=4, ensure_ascii=False)
+    Args:
+        db (DatabaseManager): Gerenciador do banco
+        snapshot (SnapshotGeradora): Faturas da geradora
+        hashes_anteriores (dict): {cnpj_geradora: hash} da última busca
+        diretorio (str): Diretório dos snapshots
+    
+    Returns:
+        dict: {'arquivo', 'alterada', 'adicionadas', 'removidas'}
+    """
+    cnpj_geradora = snapshot.geradora
+    
+    hash_conteudo = calcular_hash_snapshot(snapshot.iterar_faturas())
+    
+    # Sem alteração só se o snapshot anterior ainda está com o robô (e no disco, com SNAPSHOT_DISCO)
+    snapshot_mantido = snapshot_disponivel(cnpj_geradora, diretorio) and (
+        not SNAPSHOT_DISCO or localizar_snapshot_disco(cnpj_geradora, diretorio) is not None
+    )
+    if hashes_anteriores.get(cnpj_geradora) == hash_conteudo and snapshot_mantido:
+        guardar_snapshot(cnpj_geradora, snapshot)
+        print(f"⏭️ Geradora {cnpj_geradora} sem alterações desde a última busca ({snapshot.total_faturas} faturas) - snapshot mantido")
+        return {'arquivo': None, 'alterada': False, 'adicionadas': [], 'removidas': []}
+    
+    # Inserir faturas novas no banco de dados (uma transação por geradora; se falhar,
+    # a exceção interrompe a busca em vez de parecer que não há faturas novas)
+    print(f"💾 Salvando faturas da geradora {cnpj_geradora} no banco de dados...")
+    
+    faturas_db = (
+        {
+            'id': tarefa.id,
+            'nova_uc': tarefa.nova_uc,
+            'mes_referencia': tarefa.mes_referencia,
+            'cnpj_geradora': cnpj_geradora
+        }
+        for tarefa in snapshot.tarefas
+    )
+    resultado_db = db.inserir_faturas_em_lote(faturas_db)
+    
+    print(f"   ✅ {resultado_db['inseridas']} faturas novas inseridas, {resultado_db['existentes']} já existiam no banco de dados")
+    
+    # Entregar ao robô em memória e gravar a cópia em disco (todas as faturas da API)
+    caminho_arquivo = salvar_snapshot(cnpj_geradora, snapshot, diretorio)
+    
+    diff = db.registrar_snapshot_geradora(
+        cnpj_geradora, hash_conteudo, (tarefa.id for tarefa in snapshot.tarefas)
+    ) or {'adicionadas': [], 'removidas': []}
+    
+    print(f"✓ Snapshot da geradora {cnpj_geradora} com {snapshot.total_faturas} faturas em {snapshot.total_ucs} UCs"
+          + (f" salvo em {caminho_arquivo}" if caminho_arquivo else " (somente em memória)"))
+    print(f"   🔀 Desde a última busca: {len(diff['adicionadas'])} faturas novas, {len(diff['removidas'])} removidas")
+    
+    return {'arquivo': caminho_arquivo, 'alterada': True, **diff}
+
+def registrar_geradoras_ausentes(db, geradoras_presentes, hashes_anteriores):
+    """
+    Registra snapshot vazio para geradoras que estavam na busca anterior e não vieram agora
+    
+    Returns:
+        dict: {cnpj_geradora: {'arquivo', 'alterada', 'adicionadas', 'removidas'}}
+    """
+    resultados = {}
+    hash_vazio = calcular_hash_snapshot([])
+    
+    for cnpj_geradora, hash_anterior in hashes_anteriores.items():
+        if cnpj_geradora in geradoras_presentes or hash_anterior == hash_vazio:
+            continue
         
-        print(f"✓ {nome_arquivo} salvo com {total_faturas} faturas em {len(dados_geradora['lista_ucs'])} UCs")
-        arquivos_salvos.append(caminho_arquivo)
+        diff = db.registrar_snapshot_geradora(cnpj_geradora, hash_vazio, []) or {'adicionadas': [], 'removidas': []}
+        print(f"⚠️ Geradora {cnpj_geradora} não veio na API: {len(diff['removidas'])} faturas removidas")
+        resultados[cnpj_geradora] = {'arquivo': None, 'alterada': True, **diff}
+    
+    return resultados
+
+def salvar_json_por_geradora(geradoras_organizadas, diretorio=DIRETORIO_SNAPSHOTS, db=None):
+    """
+    Entrega o snapshot de cada geradora ao robô e grava a cópia em disco (CNPJ numérico)
+    Geradoras cujo conteúdo não mudou desde a última busca não são regravadas
     
-    return arquivos_salvos
+    Args:
+        geradoras_organizadas (dict): {cnpj_geradora: SnapshotGeradora}
+        diretorio (str): Diretório dos snapshots
+        db (DatabaseManager): Gerenciador do banco (opcional)
+    
+    Returns:
+        dict: {cnpj_geradora: {'arquivo', 'alterada', 'adicionadas', 'removidas'}}
+    """
+    db = db or DatabaseManager()
+    hashes_anteriores = db.obter_hashes_snapshots()
+    resultados = {}
+    
+    for cnpj_geradora, snapshot in geradoras_organizadas.items():
+        resultados[cnpj_geradora] = gravar_snapshot_geradora(db, snapshot, hashes_anteriores, diretorio)
+    
+    # Geradoras que não vieram na API deixam de ter snapshot em memória
+    descartar_snapshots(manter=geradoras_organizadas)
+    
+    resultados.update(registrar_geradoras_ausentes(db, geradoras_organizadas, hashes_anteriores))
+    return resultados
 
-def criar_json_filtrado_por_status(cnpj_geradora, force=False, diretorio="media/json"):
+def ingerir_faturas_em_streaming(blocos, diretorio=DIRETORIO_SNAPSHOTS, db=None):
     """
-    Cria um JSON filtrado apenas com faturas que devem ser processadas
+    Lê o feed da API incrementalmente, filtrando e agrupando as faturas conforme chegam
+    Grava no banco e gera um snapshot por geradora sem manter o feed inteiro em memória
+    (os payloads vão para o armazém em disco; em memória ficam só os FaturaTask)
+    
+    Args:
+        blocos (iterable): Blocos da resposta da API (ex: response.iter_content())
+        diretorio (str): Diretório dos snapshots
+        db (DatabaseManager): Gerenciador do banco (opcional)
+    
+    Returns:
+        dict: {cnpj_geradora: {'arquivo', 'alterada', 'adicionadas', 'removidas'}}
+    """
+    return ingerir_faturas(iterar_itens_array_json(blocos), diretorio, db)
+
+def ingerir_faturas(faturas, diretorio=DIRETORIO_SNAPSHOTS, db=None):
+    """
+    Filtra e agrupa as faturas conforme chegam (resposta em streaming ou páginas)
+    e grava banco e snapshots das geradoras
+    
+    Args:
+        faturas (iterable): Faturas da API, na ordem do feed
+        diretorio (str): Diretório dos snapshots
+        db (DatabaseManager): Gerenciador do banco (opcional)
+    
+    Returns:
+        dict: {cnpj_geradora: {'arquivo', 'alterada', 'adicionadas', 'removidas'}}
+    """
+    total_api = 0
+    
+    def contar_faturas(faturas):
+        nonlocal total_api
+        for fatura in faturas:
+            total_api += 1
+            yield fatura
+    
+    geradoras_organizadas = organizar_faturas_por_geradora(contar_faturas(faturas))
+    
+    print(f"\n📊 Total de faturas encontradas na API: {total_api}")
+    print(f"🔍 Total de faturas a processar após filtros: {sum(s.total_faturas for s in geradoras_organizadas.values())}")
+    print(f"🏭 Geradoras encontradas: {len(geradoras_organizadas)}")
+    
+    return salvar_json_por_geradora(geradoras_organizadas, diretorio, db)
+
+def criar_json_filtrado_por_status(cnpj_geradora, force=False, diretorio=DIRETORIO_SNAPSHOTS):
+    """
+    Cria um snapshot filtrado apenas com faturas que devem ser processadas
     BASEADO nas faturas que vieram da API (não todas do banco)
     
     Args:
         cnpj_geradora (str): CNPJ da geradora
         force (bool): Se True, inclui faturas com erro
-        diretorio (str): Diretório dos JSONs
+        diretorio (str): Diretório dos snapshots (usado só ao retomar do disco)
     
     Returns:
-        dict: JSON filtrado ou None se não houver faturas para processar
+        SnapshotGeradora: Snapshot filtrado ou None se não houver faturas para processar
     """
-    def extrair_numeros_cnpj(cnpj):
-        """Extrai apenas os números do CNPJ"""
-        return ''.join(filter(str.isdigit, cnpj))
-    
-    # Carregar JSON completo (faturas que vieram da API)
-    nome_arquivo_numerico = extrair_numeros_cnpj(cnpj_geradora)
-    caminho_arquivo = os.path.join(diretorio, f"{nome_arquivo_numerico}.json")
-    
-    if not os.path.exists(caminho_arquivo):
-        print(f"❌ Arquivo JSON não encontrado: {caminho_arquivo}")
+    # Snapshot completo (faturas que vieram da API): em memória após a busca, ou do disco
+    snapshot = carregar_snapshot(cnpj_geradora, diretorio)
+    if snapshot is None:
         return None
     
-    try:
-        with open(caminho_arquivo, 'r', encoding='utf-8') as file:
-            dados_completos = json.load(file)
-    except Exception as e:
-        print(f"❌ Erro ao carregar JSON: {str(e)}")
-        return None
+    idade = idade_snapshot(cnpj_geradora)
+    if idade is not None:
+        print(f"🕐 Snapshot da geradora {cnpj_geradora} obtido da API há {formatar_idade(idade)}")
     
     # Filtrar faturas por status no banco
-    # IMPORTANTE: Só verifica as faturas que VIERAM DA API (no JSON)
+    # IMPORTANTE: Só verifica as faturas que VIERAM DA API (no snapshot)
     db = DatabaseManager()
-    lista_ucs_filtradas = {}
-    total_faturas_api = 0
-    total_faturas_filtradas = 0
     
     print(f"🔍 Filtrando faturas da geradora {cnpj_geradora}...")
     print(f"   📡 Verificando apenas faturas que vieram da API (não todas do banco)")
     
-    for uc, faturas in dados_completos.get("lista_ucs", {}).items():
-        total_faturas_api += len(faturas)
-        faturas_para_processar = []
-        
-        for fatura in faturas:
-            fatura_id = fatura.get("id")
-            status, deve_processar = db.verificar_status_fatura(fatura_id, force=force)
-            
-            if deve_processar:
-                faturas_para_processar.append(fatura)
-        
-        # Só adiciona a UC se tiver faturas para processar
-        if faturas_para_processar:
-            lista_ucs_filtradas[uc] = faturas_para_processar
-            total_faturas_filtradas += len(faturas_para_processar)
+    # Consultar o status de todas as faturas da geradora em uma única ida ao banco
+    status_faturas = db.verificar_status_faturas((tarefa.id for tarefa in snapshot.tarefas), force=force)
     
-    print(f"   📊 Total de faturas na API: {total_faturas_api}")
-    print(f"   📊 Faturas a processar: {total_faturas_filtradas}")
-    print(f"   📊 Faturas puladas: {total_faturas_api - total_faturas_filtradas}")
-    print(f"   📋 UCs com faturas pendentes: {len(lista_ucs_filtradas)}/{len(dados_completos.get('lista_ucs', {}))}")
+    # Só ficam as UCs com faturas para processar (novo índice, mesmos FaturaTask)
+    filtrado = snapshot.filtrar(lambda tarefa: status_faturas[tarefa.id][1])
     
-    if not lista_ucs_filtradas:
-        return None
+    print(f"   📊 Total de faturas na API: {snapshot.total_faturas}")
+    print(f"   📊 Faturas a processar: {filtrado.total_faturas}")
+    print(f"   📊 Faturas puladas: {snapshot.total_faturas - filtrado.total_faturas}")
+    print(f"   📋 UCs com faturas pendentes: {filtrado.total_ucs}/{snapshot.total_ucs}")
     
-    # Criar JSON filtrado
-    dados_filtrados = {
-        "geradora": cnpj_geradora,
-        "lista_ucs": lista_ucs_filtradas
-    }
+    if not filtrado.total_faturas:
+        return None
     
-    return dados_filtrados
+    return filtrado
+
+def _concluir_busca(diretorio, geradoras):
+    """Resumo e resultado de uma busca com resposta completa da API"""
+    alteradas = sum(1 for resultado in geradoras.values() if resultado['alterada'])
+    print(f"\n✅ Processamento concluído! {alteradas} de {len(geradoras)} geradoras com alterações.")
+    return {'diretorio': diretorio, 'nao_modificado': False, 'geradoras': geradoras}
 
-def buscar_faturas():
-    """Função principal para buscar e organizar faturas"""
+def buscar_faturas_com_diff(streaming=None, diretorio=DIRETORIO_SNAPSHOTS):
+    """
+    Busca as faturas na API e atualiza banco e snapshots apenas das geradoras que mudaram
+    
+    Os snapshots ficam em memória para o robô (criar_json_filtrado_por_status) e
+    a cópia em disco é opcional (SNAPSHOT_DISCO).
+    
+    Usa requisição condicional (If-None-Match / If-Modified-Since) quando a API
+    devolveu ETag ou Last-Modified na busca anterior e os snapshots ainda existem.
+    Com API_PAGINACAO ('pagina' ou 'geradora') o feed é baixado em partes paralelas
+    (sem requisição condicional; geradoras sem alteração continuam sendo puladas pelo hash).
+    
+    Args:
+        streaming (bool): Lê a resposta da API incrementalmente (padrão: API_STREAMING do .env)
+        diretorio (str): Diretório dos snapshots
+    
+    Returns:
+        dict: {'diretorio', 'nao_modificado', 'geradoras': {cnpj: {'arquivo', 'alterada', 'adicionadas', 'removidas'}}}
+              ou None se erro
+    """
+    if streaming is None:
+        streaming = API_STREAMING
+    
     if debug_mode:
         url = API_DOMAIN_FATURAS_DEV
     else:
@@ -211,30 +362,76 @@ def buscar_faturas():
     }
     auth = (API_CREDENTIAL_LOGIN, API_CREDENTIAL_PASSWORD)
     
+    db = DatabaseManager()
+    hashes_anteriores = db.obter_hashes_snapshots()
+    
+    if API_PAGINACAO:
+        try:
+            print(f"📡 Busca paginada na API (modo: {API_PAGINACAO})")
+            geradoras = ingerir_faturas(iterar_faturas_paginadas(url, auth, headers), diretorio, db)
+            return _concluir_busca(diretorio, geradoras)
+        except Exception as e:
+            print(f"❌ Erro durante o processamento: {str(e)}")
+            return None
+    
+    # Só pede resposta condicional se os snapshots da última busca ainda estão disponíveis
+    # (geradoras que deixaram de vir na API ficam com o hash vazio e não têm snapshot)
+    hash_vazio = calcular_hash_snapshot([])
+    snapshots_disponiveis = bool(hashes_anteriores) and all(
+        snapshot_disponivel(cnpj, diretorio)
+        for cnpj, hash_anterior in hashes_anteriores.items() if hash_anterior != hash_vazio
+    )
+    if snapshots_disponiveis:
+        estado = db.obter_estado_busca(url)
+        if estado['etag']:
+            headers["If-None-Match"] = estado['etag']
+        if estado['last_modified']:
+            headers["If-Modified-Since"] = estado['last_modified']
+    
+    response = None
     try:
-        response = requests.get(url, headers=headers, auth=auth)
+        response = cliente_http.get(url, endpoint="GEUS faturas", headers=headers, auth=auth, stream=streaming)
+        
+        if response.status_code == 304:
+            print("\n✅ API sem alterações desde a última busca (304) - snapshots mantidos")
+            return {
+                'diretorio': diretorio,
+                'nao_modificado': True,
+                'geradoras': {
+                    cnpj: {'arquivo': None, 'alterada': False, 'adicionadas': [], 'removidas': []}
+                    for cnpj in hashes_anteriores
+                }
+            }
         
         if response.status_code == 200:
-            faturas = response.json()
-            print(f"\n📊 Total de faturas encontradas na API: {len(faturas)}")
-            
-            # Criar diretório media/json se não existir
-            os.makedirs("media/json", exist_ok=True)
-            print("📁 Arquivos JSON serão salvos em: media/json/")
-            
-            # Filtrar faturas com nova_uc vazia
-            faturas_filtradas = [fatura for fatura in faturas if fatura.get("nova_uc") and fatura.get("nova_uc").strip()]
-            print(f"🔍 Total de faturas após filtrar UCs vazias: {len(faturas_filtradas)}")
+            # Os snapshots da busca anterior continuam em memória até cada geradora ser comparada:
+            # as que mudaram são substituídas e as que não vieram são descartadas no fim
+            print("📁 Snapshots das geradoras: em memória" + (f" + cópia em {diretorio}/" if SNAPSHOT_DISCO else ""))
             
-            # Organizar faturas por geradora
-            geradoras_organizadas = organizar_faturas_por_geradora(faturas_filtradas)
-            print(f"🏭 Geradoras encontradas: {len(geradoras_organizadas)}")
+            if streaming:
+                # Filtra, agrupa e grava conforme os dados chegam (memória limitada)
+                geradoras = ingerir_faturas_em_streaming(
+                    response.iter_content(chunk_size=TAMANHO_BLOCO_STREAMING), diretorio, db
+                )
+            else:
+                faturas = response.json()
+                print(f"\n📊 Total de faturas encontradas na API: {len(faturas)}")
+                
+                # Filtrar faturas com nova_uc vazia
+                faturas_filtradas = [fatura for fatura in faturas if fatura.get("nova_uc") and fatura.get("nova_uc").strip()]
+                print(f"🔍 Total de faturas após filtrar UCs vazias: {len(faturas_filtradas)}")
+                
+                # Organizar faturas por geradora
+                geradoras_organizadas = organizar_faturas_por_geradora(faturas_filtradas)
+                print(f"🏭 Geradoras encontradas: {len(geradoras_organizadas)}")
+                
+                # Entregar snapshots ao robô e salvar cópias em disco
+                geradoras = salvar_json_por_geradora(geradoras_organizadas, diretorio, db)
             
-            # Salvar JSONs organizados
-            arquivos_salvos = salvar_json_por_geradora(geradoras_organizadas)
+            # Validadores para a próxima busca condicional
+            db.salvar_estado_busca(url, response.headers.get("ETag"), response.headers.get("Last-Modified"))
             
-            print(f"\n✅ Processamento concluído! {len(arquivos_salvos)} arquivos salvos.")
-            return "media/json"
+            return _concluir_busca(diretorio, geradoras)
             
         else:
             print(f"❌ Erro ao buscar faturas: {response.status_code}")
@@ -242,4 +439,77 @@ def buscar_faturas():
             
     except Exception as e:
         print(f"❌ Erro durante o processamento: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+    
+    finally:
+        if response is not None:
+            response.close()
+
+def invalidar_cache_busca():
+    """Descarta a última busca: a próxima execução consulta a API mesmo dentro do TTL"""
+    with _lock_cache_busca:
+        _cache_busca['resultado'] = None
+        _cache_busca['geracao'] += 1
+    print("🧹 Cache da busca na API invalidado")
+
+def buscar_faturas(streaming=None, ttl=None):
+    """
+    Função principal para buscar e organizar faturas
+    
+    Execuções iniciadas dentro do TTL reutilizam a última busca (snapshots em memória)
+    em vez de consultar a API de novo. Execuções simultâneas aguardam a busca em
+    andamento e usam o mesmo resultado; se o cache foi invalidado depois que ela
+    começou, aguardam o fim dela e fazem uma busca nova.
+    
+    Args:
+        streaming (bool): Lê a resposta da API incrementalmente (padrão: API_STREAMING do .env)
+        ttl (float): Idade máxima, em segundos, da busca reutilizada (padrão: BUSCA_CACHE_TTL do .env; 0 desativa)
+    
+    Returns:
+        str: Diretório dos snapshots ou None se erro
+    """
+    if ttl is None:
+        ttl = BUSCA_CACHE_TTL
+    
+    while True:
+        with _lock_cache_busca:
+            resultado = _cache_busca['resultado']
+            idade = time.monotonic() - _cache_busca['instante']
+            
+            if resultado is not None and idade < ttl:
+                print(f"♻️ Reutilizando a busca na API de {formatar_idade(idade)} atrás (TTL {formatar_idade(ttl)}) - API não consultada")
+                return resultado['diretorio']
+            
+            busca = _cache_busca['em_andamento']
+            if busca is None:
+                busca = _cache_busca['em_andamento'] = {
+                    'geracao': _cache_busca['geracao'],
+                    'concluida': threading.Event(),
+                    'resultado': None
+                }
+                break
+            atual = busca['geracao'] == _cache_busca['geracao']
+        
+        print("⏳ Aguardando a busca na API já em andamento...")
+        busca['concluida'].wait()
+        if atual:
+            resultado = busca['resultado']
+            return resultado['diretorio'] if resultado is not None else None
+    
+    resultado = None
+    try:
+        resultado = buscar_faturas_com_diff(streaming)
+    finally:
+        with _lock_cache_busca:
+            busca['resultado'] = resultado
+            _cache_busca['em_andamento'] = None
+            if resultado is not None and busca['geracao'] == _cache_busca['geracao']:
+                _cache_busca['resultado'] = resultado
+                _cache_busca['instante'] = time.monotonic()
+        busca['concluida'].set()
+    
+    if resultado is None:
+        return None
+    
+    print("🕐 Snapshot obtido agora da API")
+    return resultado['diretorio']
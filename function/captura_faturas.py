@@ -0,0 +1,335 @@
+"""
+Captura das respostas JSON que o portal da Energisa usa para montar os cards de fatura
+
+A página /faturas desenha os cards a partir de respostas XHR do backend do portal. Com
+CAPTURA_FATURAS_XHR ativo, o robô escuta essas respostas (URL casando com
+CAPTURA_FATURAS_URL) e lê delas mês de referência, valor, vencimento e status, sem
+depender das classes CSS dos cards:
+- o IndiceCards (function/cards_fatura.py) usa primeiro os registros capturados e só lê
+  os cards da página (DOM) para os meses que não vieram nas respostas
+- as respostas são descartadas quando a página navega (cada UC recarrega /faturas)
+- com CAPTURA_FATURAS_GRAVAR, cada resposta lida é gravada como fixture para os testes
+  offline (teste_captura_faturas.py)
+
+O formato do payload não é documentado pela Energisa: os campos são reconhecidos pelo nome
+(NOMES_*) e registros sem mês, valor, vencimento ou status reconhecível são ignorados.
+"""
+
+import json
+import os
+import re
+import unicodedata
+from datetime import date, datetime
+
+from config import CAPTURA_FATURAS_URL, CAPTURA_FATURAS_GRAVAR
+from function.cards_fatura import CardFatura, MESES, SELETOR_DATA_CARD, XPATH_CARD
+
+# Nomes de campo aceitos (minúsculos, sem acentos, '_' ou '-')
+NOMES_REFERENCIA = {
+    "mesreferencia", "mesanoreferencia", "anomesreferencia", "referencia", "mesano", "anomes",
+    "competencia", "datareferencia", "mesref"
+}
+NOMES_MES = {"mes", "mesfatura"}
+NOMES_ANO = {"ano", "anofatura"}
+NOMES_VALOR = {
+    "valor", "valorfatura", "valortotal", "valordocumento", "valorapagar", "valorconta", "total"
+}
+NOMES_VENCIMENTO = {"datavencimento", "vencimento", "dtvencimento", "datavenc", "vencimentofatura"}
+NOMES_STATUS = {
+    "status", "situacao", "situacaopagamento", "statuspagamento", "statusfatura", "situacaofatura"
+}
+
+# Status do portal (maiúsculo, sem acentos) => situação de pagamento
+STATUS_PAGA = {"PAGA", "PAGO", "QUITADA", "QUITADO", "LIQUIDADA", "BAIXADA"}
+STATUS_VENCIDA = {"VENCIDA", "VENCIDO", "ATRASADA", "EM ATRASO", "ATRASO"}
+STATUS_A_VENCER = {"A VENCER", "AVENCER"}
+# Em aberto: 'a_vencer' até o vencimento, 'vencida' depois (como a cor do card)
+STATUS_ABERTA = {"ABERTA", "ABERTO", "EM ABERTO", "PENDENTE", "EMITIDA", "NAO PAGA"}
+
+
+def _sem_acento(texto):
+    return unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+
+
+NOMES_MESES = {numero: nome for nome, numero in MESES.items()}
+ABREVIACOES_MESES = {_sem_acento(nome)[:3].upper(): numero for nome, numero in MESES.items()}
+
+
+def _chave(nome):
+    """Nome de campo normalizado para comparação com NOMES_*"""
+    return re.sub(r"[^a-z0-9]", "", _sem_acento(nome).lower())
+
+
+def _campo(registro, nomes):
+    """Valor do primeiro campo do registro cujo nome normalizado está em nomes"""
+    for nome, valor in registro.items():
+        if _chave(nome) in nomes and valor not in (None, ""):
+            return valor
+    return None
+
+
+def _data(valor):
+    """Data de 'DD/MM/AAAA' ou ISO ('AAAA-MM-DD', com ou sem hora); None se não reconhecer"""
+    texto = str(valor).strip()
+    try:
+        if re.match(r"^\d{2}/\d{2}/\d{4}$", texto):
+            return datetime.strptime(texto, "%d/%m/%Y").date()
+        if re.match(r"^\d{4}-\d{2}-\d{2}", texto):
+            return date.fromisoformat(texto[:10])
+    except ValueError:
+        pass
+    return None
+
+
+def _mes_referencia(registro):
+    """
+    Mês de referência do registro como (MM, AAAA)
+
+    Aceita 'MM/AAAA', 'AAAA-MM', 'AAAAMM', data ISO, 'Setembro/2026', 'SET/2026'
+    ou campos separados de mês e ano.
+    """
+    valor = _campo(registro, NOMES_REFERENCIA)
+    if valor is None:
+        mes, ano = _campo(registro, NOMES_MES), _campo(registro, NOMES_ANO)
+        if mes is None or ano is None:
+            return None
+        valor = f"{mes}/{ano}"
+
+    texto = _sem_acento(valor).strip().upper()
+    formatos = (
+        (r"^(\d{1,2})[/-](\d{4})$", lambda m: (m.group(1), m.group(2))),
+        (r"^(\d{4})[/-](\d{1,2})(?:[/-]\d{1,2}(?:[T ].*)?)?$", lambda m: (m.group(2), m.group(1))),
+        (r"^(\d{4})(\d{2})$", lambda m: (m.group(2), m.group(1))),
+        (r"^([A-Z]{3})[A-Z]*[/ -](\d{4})$", lambda m: (ABREVIACOES_MESES.get(m.group(1)), m.group(2))),
+    )
+    for padrao, extrair in formatos:
+        encontrado = re.match(padrao, texto)
+        if encontrado:
+            mes, ano = extrair(encontrado)
+            if mes is not None and 1 <= int(mes) <= 12:
+                return f"{int(mes):02d}", ano
+    return None
+
+
+def _valor_como_no_card(valor):
+    """Valor no texto que o card mostraria ('R$ 1.234,56'), para o CardFatura tratar igual ao DOM"""
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        inteiro, centavos = f"{valor:,.2f}".split(".")
+        return f"R$ {inteiro.replace(',', '.')},{centavos}"
+
+    texto = str(valor).strip()
+    if re.match(r"^-?\d+\.\d{1,2}$", texto):
+        return _valor_como_no_card(float(texto))
+    return texto if re.search(r"\d", texto) else None
+
+
+def _situacao(registro, vencimento):
+    """Situação de pagamento pelo status do registro; None se o status não for reconhecido"""
+    status = _campo(registro, NOMES_STATUS)
+    if status is None:
+        return None
+
+    status = re.sub(r"[_\s]+", " ", _sem_acento(status).strip().upper())
+    if status in STATUS_PAGA:
+        return "paga"
+    if status in STATUS_VENCIDA:
+        return "vencida"
+    if status in STATUS_A_VENCER:
+        return "a_vencer"
+    if status in STATUS_ABERTA:
+        return "vencida" if vencimento < date.today() else "a_vencer"
+    return None
+
+
+class CardFaturaCapturado(CardFatura):
+    """Card montado a partir de uma resposta JSON do portal (situação vem do status, não do CSS)"""
+
+    __slots__ = ("situacao",)
+
+    def __init__(self, indice, mes, ano, valor_texto, vencimento_texto, situacao):
+        super().__init__(indice, mes, ano, None, valor_texto, vencimento_texto)
+        self.situacao = situacao
+
+    @property
+    def situacao_pagamento(self):
+        return self.situacao
+
+    def botao_download(self, page):
+        """Locator do botão de download do card deste mês (pelo texto da data, resolvido só no clique)"""
+        data_card = page.locator(SELETOR_DATA_CARD).filter(
+            has_text=re.compile(rf"{self.mes}\s*{self.ano}")
+        ).first
+        return data_card.locator(XPATH_CARD).first.locator('button[data-pix="false"]')
+
+
+def extrair_cards_payload(payload):
+    """
+    Cards de fatura de um payload JSON do portal
+
+    Percorre o payload inteiro (listas e objetos aninhados) e aproveita todo objeto com
+    mês de referência, valor, vencimento e status reconhecíveis.
+
+    Args:
+        payload: JSON já decodificado
+
+    Returns:
+        tuple: (cards, ignorados) - lista de CardFaturaCapturado na ordem do payload e
+               quantidade de objetos com mês de referência que não puderam ser lidos
+    """
+    cards = []
+    ignorados = 0
+    pendentes = [payload]
+
+    while pendentes:
+        atual = pendentes.pop()
+        if isinstance(atual, list):
+            pendentes.extend(reversed(atual))
+            continue
+        if not isinstance(atual, dict):
+            continue
+
+        referencia = _mes_referencia(atual)
+        if referencia is None:
+            pendentes.extend(reversed(list(atual.values())))
+            continue
+
+        vencimento = _data(_campo(atual, NOMES_VENCIMENTO) or "")
+        valor = _campo(atual, NOMES_VALOR)
+        valor_texto = _valor_como_no_card(valor) if valor is not None else None
+        situacao = _situacao(atual, vencimento) if vencimento else None
+        if vencimento is None or valor_texto is None or situacao is None:
+            ignorados += 1
+            continue
+
+        mes, ano = referencia
+        cards.append(CardFaturaCapturado(
+            len(cards), NOMES_MESES[mes], ano, valor_texto, vencimento.strftime("%d/%m/%Y"), situacao
+        ))
+
+    return cards, ignorados
+
+
+class CapturaFaturas:
+    """
+    Escuta as respostas do portal e monta os cards de fatura a partir do JSON
+
+    Uso:
+        captura = CapturaFaturas(page)
+        page.goto("https://servicos.energisa.com.br/faturas")
+        card = captura.buscar("09/2025")
+        ...
+        captura.fechar()
+    """
+
+    def __init__(self, page, padrao_url=None, diretorio_gravacao=None):
+        """
+        Args:
+            page: Instância da página do Playwright
+            padrao_url (str): Regex das URLs com os dados das faturas (padrão: CAPTURA_FATURAS_URL)
+            diretorio_gravacao (str): Grava cada resposta lida como fixture (padrão: CAPTURA_FATURAS_GRAVAR)
+        """
+        self.page = page
+        self.padrao_url = re.compile(padrao_url or CAPTURA_FATURAS_URL, re.IGNORECASE)
+        self.diretorio_gravacao = diretorio_gravacao if diretorio_gravacao is not None else CAPTURA_FATURAS_GRAVAR
+        self.respostas_lidas = 0
+        self._respostas = []
+        self._por_mes = {}
+        page.on("response", self._ao_responder)
+        page.on("framenavigated", self._ao_navegar)
+
+    def _ao_responder(self, response):
+        """Guarda as respostas XHR/fetch de faturas (o corpo só é lido quando os cards forem pedidos)"""
+        try:
+            if response.request.resource_type not in ("xhr", "fetch"):
+                return
+            if not self.padrao_url.search(response.url):
+                return
+            if "json" not in response.headers.get("content-type", ""):
+                return
+            self._respostas.append(response)
+        except Exception:
+            pass
+
+    def _ao_navegar(self, frame):
+        if frame == self.page.main_frame:
+            self.limpar()
+
+    def limpar(self):
+        """Descarta as respostas e os cards capturados"""
+        self._respostas = []
+        self._por_mes = {}
+
+    def _gravar(self, response, payload):
+        """Grava a resposta como fixture para teste_captura_faturas.py"""
+        os.makedirs(self.diretorio_gravacao, exist_ok=True)
+        caminho = os.path.join(self.diretorio_gravacao, f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json")
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "url": response.url,
+                "status": response.status,
+                "capturado_em": datetime.now().isoformat(timespec="seconds"),
+                "payload": payload
+            }, arquivo, ensure_ascii=False, indent=2)
+
+    def _ler_respostas(self):
+        """Lê o JSON das respostas que chegaram desde a última consulta"""
+        respostas, self._respostas = self._respostas, []
+        for response in respostas:
+            try:
+                if not response.ok:
+                    continue
+                payload = response.json()
+            except Exception as e:
+                print(f"⚠️ Resposta do portal não lida ({response.url}): {str(e)}")
+                continue
+
+            self.respostas_lidas += 1
+            if self.diretorio_gravacao:
+                try:
+                    self._gravar(response, payload)
+                except Exception as e:
+                    print(f"⚠️ Erro ao gravar resposta capturada: {str(e)}")
+
+            cards, ignorados = extrair_cards_payload(payload)
+            if ignorados:
+                print(f"⚠️ {ignorados} registros de fatura do portal com campos não reconhecidos ({response.url})")
+            # Resposta mais recente prevalece para o mesmo mês
+            for card in cards:
+                self._por_mes[card.mes_referencia] = card
+
+    def cards(self):
+        """
+        Cards capturados até agora, do mês mais recente ao mais antigo
+
+        Returns:
+            list: CardFaturaCapturado
+        """
+        self._ler_respostas()
+        return sorted(
+            self._por_mes.values(),
+            key=lambda card: (card.ano, card.mes_referencia[:2]),
+            reverse=True
+        )
+
+    def buscar(self, mes_referencia):
+        """
+        Card capturado do mês de referência
+
+        Args:
+            mes_referencia (str): Mês no formato MM/AAAA
+
+        Returns:
+            CardFaturaCapturado: Card do mês ou None se não veio nas respostas
+        """
+        self._ler_respostas()
+        return self._por_mes.get(mes_referencia)
+
+    def fechar(self):
+        """Remove os listeners da página"""
+        for evento, funcao in (("response", self._ao_responder), ("framenavigated", self._ao_navegar)):
+            try:
+                self.page.remove_listener(evento, funcao)
+            except Exception:
+                pass
@@ -0,0 +1,206 @@
+"""
+Leitura dos cards de fatura da página da UC em uma única chamada ao navegador
+
+Antes, cada fatura percorria todos os '.card-billing__date' com várias chamadas do
+Playwright por card (text_content, xpath do card, get_attribute, valor, vencimento),
+e a varredura se repetia para cada fatura da mesma UC. Aqui um único page.evaluate
+devolve todos os cards como registros (mês, ano, classe da situação, valor,
+vencimento e posição do card) e o IndiceCards os guarda por MM/AAAA:
+- processar_faturas_do_json cria um índice por UC e o entrega às funções de tarefa
+- o índice é descartado quando a página navega ou recarrega (ex.: retry do download)
+- o botão de download é localizado pela posição do card só quando for clicado
+- com uma CapturaFaturas (function/captura_faturas.py), os cards vêm primeiro das respostas
+  JSON do portal e a página só é lida para os meses que não vieram nelas
+"""
+
+# Mesmo card das funções de tarefa: o ancestral mais externo com "card" na classe
+# (equivalente a locator('xpath=ancestor::*[contains(@class, "card")]').first)
+SCRIPT_CARDS = """
+() => Array.from(document.querySelectorAll('.card-billing__date'), (data, indice) => {
+    const texto = (elemento) => elemento ? elemento.textContent : null;
+    const paragrafos = data.querySelectorAll('p');
+
+    let card = null;
+    for (let elemento = data.parentElement; elemento; elemento = elemento.parentElement) {
+        if ((elemento.getAttribute('class') || '').includes('card')) card = elemento;
+    }
+
+    const topo = card && card.querySelector('.card-billing__top');
+    const negritos = card ? card.querySelectorAll('.font-bold') : [];
+    return {
+        indice: indice,
+        mes: texto(paragrafos[0]),
+        ano: texto(paragrafos[paragrafos.length - 1]),
+        classe_situacao: topo ? topo.getAttribute('class') : null,
+        valor: texto(card && card.querySelector('.card-billing__price div[class*="min-w-"]')),
+        vencimento: negritos.length ? texto(negritos[negritos.length - 1]) : null
+    };
+})
+"""
+
+SELETOR_DATA_CARD = '.card-billing__date'
+XPATH_CARD = 'xpath=ancestor::*[contains(@class, "card-billing") or contains(@class, "card")]'
+
+MESES = {
+    'Janeiro': '01', 'Fevereiro': '02', 'Março': '03', 'Abril': '04',
+    'Maio': '05', 'Junho': '06', 'Julho': '07', 'Agosto': '08',
+    'Setembro': '09', 'Outubro': '10', 'Novembro': '11', 'Dezembro': '12'
+}
+
+# Classe do topo do card => situação de pagamento
+CLASSES_SITUACAO = (
+    ('card-billing__top--green', "paga"),
+    ('card-billing__top--orange', "a_vencer"),
+    ('card-billing__top--red', "vencida"),
+)
+
+
+class CardFatura:
+    """Dados de um card de fatura lidos da página"""
+
+    __slots__ = ("indice", "mes", "ano", "classe_situacao", "valor_texto", "vencimento_texto")
+
+    def __init__(self, indice, mes, ano, classe_situacao, valor_texto, vencimento_texto):
+        self.indice = indice
+        self.mes = mes
+        self.ano = ano
+        self.classe_situacao = classe_situacao
+        self.valor_texto = valor_texto
+        self.vencimento_texto = vencimento_texto
+
+    @classmethod
+    def de_registro(cls, registro):
+        """Cria o card a partir de um registro devolvido pelo SCRIPT_CARDS"""
+        def limpo(chave):
+            valor = registro.get(chave)
+            return valor.strip() if isinstance(valor, str) else valor
+
+        return cls(
+            registro["indice"], limpo("mes"), limpo("ano"), registro.get("classe_situacao"),
+            limpo("valor"), limpo("vencimento")
+        )
+
+    @property
+    def mes_referencia(self):
+        """Mês do card no formato MM/AAAA ('00' se o nome do mês não for reconhecido)"""
+        return f"{MESES.get(self.mes, '00')}/{self.ano}"
+
+    @property
+    def situacao_pagamento(self):
+        """'paga', 'a_vencer', 'vencida' ou 'desconhecida', pela classe CSS do topo do card"""
+        if self.classe_situacao is None:
+            raise ValueError(f"Card {self.mes_referencia} sem '.card-billing__top'")
+        for classe, situacao in CLASSES_SITUACAO:
+            if classe in self.classe_situacao:
+                return situacao
+        return "desconhecida"
+
+    @property
+    def valor(self):
+        """Valor sem 'R$', com ponto decimal (ex.: '123.45')"""
+        if self.valor_texto is None:
+            raise ValueError(f"Card {self.mes_referencia} sem valor")
+        return self.valor_texto.replace('R$', '').replace(' ', '').replace(',', '.')
+
+    @property
+    def data_vencimento(self):
+        """Vencimento no formato AAAA-MM-DD"""
+        if self.vencimento_texto is None:
+            raise ValueError(f"Card {self.mes_referencia} sem vencimento")
+        dia, mes, ano = self.vencimento_texto.split('/')
+        return f"{ano}-{mes}-{dia}"
+
+    def botao_download(self, page):
+        """Locator do botão de download do card (resolvido só quando usado)"""
+        card_completo = page.locator(SELETOR_DATA_CARD).nth(self.indice).locator(XPATH_CARD).first
+        return card_completo.locator('button[data-pix="false"]')
+
+
+class IndiceCards:
+    """
+    Cards da página da UC indexados por MM/AAAA, lidos em uma única chamada
+
+    Uso:
+        indice = IndiceCards(page)
+        card = indice.buscar("09/2025")
+        ...
+        indice.fechar()
+    """
+
+    def __init__(self, page, acompanhar_navegacao=True, captura=None):
+        """
+        Args:
+            page: Instância da página do Playwright
+            acompanhar_navegacao (bool): Descarta o índice quando a página navega ou recarrega
+                                         (chame fechar() ao terminar para remover o listener)
+            captura (CapturaFaturas): Cards das respostas JSON do portal, usados antes dos da página
+        """
+        self.page = page
+        self.captura = captura
+        self.leituras = 0
+        self._cards = None
+        self._por_mes = None
+        self._acompanhando = acompanhar_navegacao
+        if acompanhar_navegacao:
+            page.on("framenavigated", self._ao_navegar)
+
+    def _ao_navegar(self, frame):
+        if frame == self.page.main_frame:
+            self.invalidar()
+
+    def invalidar(self):
+        """Descarta os cards lidos (a próxima consulta lê a página de novo)"""
+        self._cards = None
+        self._por_mes = None
+
+    def cards(self):
+        """
+        Todos os cards: os capturados das respostas do portal ou, sem eles, os da página
+
+        Returns:
+            list: CardFatura
+        """
+        if self.captura is not None:
+            capturados = self.captura.cards()
+            if capturados:
+                return capturados
+        return self._cards_pagina()
+
+    def _cards_pagina(self):
+        """Cards lidos da página (DOM), na ordem da página"""
+        if self._cards is None:
+            registros = self.page.evaluate(SCRIPT_CARDS)
+            self.leituras += 1
+            self._cards = [CardFatura.de_registro(registro) for registro in registros]
+            self._por_mes = {}
+            for card in self._cards:
+                self._por_mes.setdefault(card.mes_referencia, card)
+        return self._cards
+
+    def buscar(self, mes_referencia):
+        """
+        Card do mês de referência (o primeiro da página, se houver mais de um)
+
+        Args:
+            mes_referencia (str): Mês no formato MM/AAAA
+
+        Returns:
+            CardFatura: Card do mês ou None se não estiver na página
+        """
+        if self.captura is not None:
+            card = self.captura.buscar(mes_referencia)
+            if card is not None:
+                return card
+            print(f"ℹ️ Mês {mes_referencia} não veio nas respostas do portal - lendo os cards da página")
+
+        self._cards_pagina()
+        return self._por_mes.get(mes_referencia)
+
+    def fechar(self):
+        """Remove o listener de navegação da página"""
+        if self._acompanhando:
+            self._acompanhando = False
+            try:
+                self.page.remove_listener("framenavigated", self._ao_navegar)
+            except Exception:
+                pass
@@ -0,0 +1,312 @@
+"""
+Cliente HTTP compartilhado para as chamadas à API GEUS
+
+- Sessões requests reutilizadas (uma por thread) com pool de conexões keep-alive:
+  cada chamada reaproveita a conexão TCP/TLS já aberta
+- Prazo de conexão e de leitura em toda chamada (nenhuma requisição fica pendurada)
+- Novas tentativas com backoff exponencial e jitter para falhas transitórias
+  (só repete o envio quando a chamada é idempotente)
+- Contadores de latência por endpoint (obter_metricas / imprimir_metricas)
+- Corpos com arquivo gerados em blocos (corpo_json_com_arquivo / corpo_multipart):
+  o PDF não é copiado para uma string base64 nem para um corpo montado em memória
+"""
+
+import base64
+import json
+import random
+import uuid
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from config import HTTP_TIMEOUT_CONEXAO, HTTP_TIMEOUT_LEITURA, HTTP_MAX_TENTATIVAS
+
+# Status que indicam falha transitória do servidor
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+# Backoff: espera sorteada entre 0 e min(ESPERA_MAXIMA, ESPERA_BASE * 2^tentativa)
+ESPERA_BASE_SEGUNDOS = 0.5
+ESPERA_MAXIMA_SEGUNDOS = 10.0
+
+TAMANHO_POOL = 8
+
+# Bloco do arquivo lido por vez ao gerar o corpo (múltiplo de 3: base64 sem '=' no meio)
+TAMANHO_BLOCO_ARQUIVO = 48 * 1024
+
+_local = threading.local()
+_lock_metricas = threading.Lock()
+_metricas = {}
+
+
+def obter_sessao():
+    """
+    Retorna a sessão HTTP desta thread, criando-a na primeira chamada
+
+    Returns:
+        requests.Session: Sessão com pool de conexões keep-alive
+    """
+    sessao = getattr(_local, "sessao", None)
+    if sessao is None:
+        sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=TAMANHO_POOL, pool_maxsize=TAMANHO_POOL)
+        sessao.mount("https://", adaptador)
+        sessao.mount("http://", adaptador)
+        _local.sessao = sessao
+    return sessao
+
+
+def fechar_sessao():
+    """Fecha a sessão HTTP da thread atual (e suas conexões abertas)"""
+    sessao = getattr(_local, "sessao", None)
+    if sessao is not None:
+        sessao.close()
+        _local.sessao = None
+
+
+def _nome_endpoint(metodo, url):
+    """Nome padrão do endpoint nas métricas: método + caminho da URL (sem query)"""
+    partes = urlsplit(url or "")
+    return f"{metodo.upper()} {partes.netloc}{partes.path}"
+
+
+def _registrar_metrica(endpoint, segundos, erro, repeticao):
+    """Acumula os contadores de uma tentativa"""
+    with _lock_metricas:
+        metrica = _metricas.setdefault(endpoint, {
+            'chamadas': 0,
+            'erros': 0,
+            'repeticoes': 0,
+            'tempo_total': 0.0,
+            'tempo_maximo': 0.0
+        })
+        metrica['chamadas'] += 1
+        metrica['tempo_total'] += segundos
+        metrica['tempo_maximo'] = max(metrica['tempo_maximo'], segundos)
+        if erro:
+            metrica['erros'] += 1
+        if repeticao:
+            metrica['repeticoes'] += 1
+
+
+def _requisicao_nao_enviada(erro):
+    """True se a falha ocorreu ao abrir a conexão (o servidor não recebeu a requisição)"""
+    if isinstance(erro, requests.ConnectTimeout):
+        return True
+    if isinstance(erro, requests.ReadTimeout):
+        return False
+    motivo = getattr(erro.args[0], "reason", None) if erro.args else None
+    return isinstance(motivo, NewConnectionError)
+
+
+def _calcular_espera(tentativa, response=None):
+    """Tempo de espera antes da próxima tentativa (respeita Retry-After quando enviado)"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), ESPERA_MAXIMA_SEGUNDOS)
+    limite = min(ESPERA_MAXIMA_SEGUNDOS, ESPERA_BASE_SEGUNDOS * (2 ** tentativa))
+    return random.uniform(0, limite)
+
+
+def requisitar(metodo, url, endpoint=None, idempotente=None, timeout_conexao=None,
+               timeout_leitura=None, max_tentativas=None, **kwargs):
+    """
+    Executa uma requisição HTTP pela sessão compartilhada, com prazos e novas tentativas
+
+    Falhas de conexão (a requisição não chegou ao servidor) são sempre repetidas.
+    Timeouts de leitura, quedas no meio da resposta e status transitórios (429/5xx)
+    só são repetidos se a chamada for idempotente.
+
+    Args:
+        metodo (str): Método HTTP
+        url (str): URL da requisição
+        endpoint (str): Nome do endpoint nas métricas (padrão: método + caminho)
+        idempotente (bool): Se a chamada pode ser repetida com segurança
+                            (padrão: True para GET/HEAD/OPTIONS/PUT/DELETE)
+        timeout_conexao (float): Prazo para abrir a conexão, em segundos
+        timeout_leitura (float): Prazo entre bytes recebidos, em segundos
+        max_tentativas (int): Número máximo de tentativas
+        **kwargs: Demais parâmetros de requests (headers, json, auth, stream...)
+
+    Returns:
+        requests.Response: Resposta da última tentativa
+
+    Raises:
+        requests.RequestException: Se todas as tentativas falharem sem resposta
+    """
+    metodo = metodo.upper()
+    if idempotente is None:
+        idempotente = metodo in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+    endpoint = endpoint or _nome_endpoint(metodo, url)
+    timeout = (timeout_conexao or HTTP_TIMEOUT_CONEXAO, timeout_leitura or HTTP_TIMEOUT_LEITURA)
+    max_tentativas = max_tentativas or HTTP_MAX_TENTATIVAS
+
+    sessao = obter_sessao()
+    for tentativa in range(1, max_tentativas + 1):
+        ultima_tentativa = tentativa == max_tentativas
+        inicio = time.monotonic()
+
+        try:
+            response = sessao.request(metodo, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _registrar_metrica(endpoint, time.monotonic() - inicio, erro=True, repeticao=tentativa > 1)
+
+            if ultima_tentativa or not (idempotente or _requisicao_nao_enviada(e)):
+                raise
+
+            espera = _calcular_espera(tentativa)
+            print(f"   ⚠️ {endpoint}: {type(e).__name__} - nova tentativa {tentativa + 1}/{max_tentativas} em {espera:.1f}s")
+            time.sleep(espera)
+            continue
+
+        transitorio = response.status_code in STATUS_TRANSITORIOS
+        _registrar_metrica(endpoint, time.monotonic() - inicio, erro=transitorio, repeticao=tentativa > 1)
+
+        if not transitorio or not idempotente or ultima_tentativa:
+            return response
+
+        espera = _calcular_espera(tentativa, response)
+        print(f"   ⚠️ {endpoint}: status {response.status_code} - nova tentativa {tentativa + 1}/{max_tentativas} em {espera:.1f}s")
+        response.close()
+        time.sleep(espera)
+
+
+class CorpoStreaming:
+    """
+    Corpo de requisição gerado em blocos, com tamanho conhecido
+
+    requests envia Content-Length (sem chunked) e percorre o corpo de novo
+    a cada tentativa, então pode ser usado com as novas tentativas de requisitar.
+    """
+
+    def __init__(self, gerar_blocos, tamanho):
+        """
+        Args:
+            gerar_blocos (callable): Função sem argumentos que gera os blocos (bytes/memoryview)
+            tamanho (int): Tamanho total em bytes
+        """
+        self._gerar_blocos = gerar_blocos
+        self.tamanho = tamanho
+
+    def __len__(self):
+        return self.tamanho
+
+    def __iter__(self):
+        return iter(self._gerar_blocos())
+
+
+def _blocos(conteudo):
+    """Fatias do conteúdo sem cópia (memoryview)"""
+    visao = memoryview(conteudo)
+    for inicio in range(0, len(visao), TAMANHO_BLOCO_ARQUIVO):
+        yield visao[inicio:inicio + TAMANHO_BLOCO_ARQUIVO]
+
+
+def corpo_json_com_arquivo(campos, campo_arquivo, conteudo):
+    """
+    Corpo JSON com o arquivo em base64 codificado bloco a bloco durante o envio
+
+    Args:
+        campos (dict): Demais campos do JSON
+        campo_arquivo (str): Nome do campo que recebe o arquivo em base64
+        conteudo (bytes): Conteúdo do arquivo
+
+    Returns:
+        tuple: (CorpoStreaming, content_type)
+    """
+    cabecalho = json.dumps(campos, ensure_ascii=False, separators=(",", ":"))[:-1]
+    prefixo = f'{cabecalho}{"," if campos else ""}{json.dumps(campo_arquivo)}:"'.encode("utf-8")
+    sufixo = b'"}'
+    tamanho_base64 = 4 * ((len(conteudo) + 2) // 3)
+
+    def gerar():
+        yield prefixo
+        for bloco in _blocos(conteudo):
+            yield base64.b64encode(bloco)
+        yield sufixo
+
+    return CorpoStreaming(gerar, len(prefixo) + tamanho_base64 + len(sufixo)), "application/json"
+
+
+def corpo_multipart(campos, campo_arquivo, nome_arquivo, conteudo, tipo_arquivo="application/pdf"):
+    """
+    Corpo multipart/form-data com o arquivo binário (sem base64), enviado em blocos
+
+    Args:
+        campos (dict): Demais campos do formulário (valores None são omitidos)
+        campo_arquivo (str): Nome do campo do arquivo
+        nome_arquivo (str): Nome do arquivo enviado
+        conteudo (bytes): Conteúdo do arquivo
+        tipo_arquivo (str): Content-Type do arquivo
+
+    Returns:
+        tuple: (CorpoStreaming, content_type)
+    """
+    separador = uuid.uuid4().hex
+    partes = [
+        f'--{separador}\r\nContent-Disposition: form-data; name="{nome}"\r\n\r\n{valor}\r\n'
+        for nome, valor in campos.items() if valor is not None
+    ]
+    partes.append(
+        f'--{separador}\r\nContent-Disposition: form-data; name="{campo_arquivo}"; '
+        f'filename="{nome_arquivo.replace(chr(34), "")}"\r\nContent-Type: {tipo_arquivo}\r\n\r\n'
+    )
+    prefixo = "".join(partes).encode("utf-8")
+    sufixo = f"\r\n--{separador}--\r\n".encode("utf-8")
+
+    def gerar():
+        yield prefixo
+        yield from _blocos(conteudo)
+        yield sufixo
+
+    tamanho = len(prefixo) + len(conteudo) + len(sufixo)
+    return CorpoStreaming(gerar, tamanho), f"multipart/form-data; boundary={separador}"
+
+
+def get(url, **kwargs):
+    """Atalho para requisitar('GET', url, ...)"""
+    return requisitar("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    """Atalho para requisitar('POST', url, ...) - por padrão não idempotente"""
+    return requisitar("POST", url, **kwargs)
+
+
+def obter_metricas():
+    """
+    Retorna os contadores de latência acumulados por endpoint
+
+    Returns:
+        dict: {endpoint: {chamadas, erros, repeticoes, tempo_total, tempo_maximo, tempo_medio}}
+    """
+    with _lock_metricas:
+        return {
+            endpoint: dict(metrica, tempo_medio=metrica['tempo_total'] / metrica['chamadas'])
+            for endpoint, metrica in _metricas.items()
+        }
+
+
+def zerar_metricas():
+    """Zera os contadores de latência"""
+    with _lock_metricas:
+        _metricas.clear()
+
+
+def imprimir_metricas():
+    """Imprime um resumo das chamadas HTTP por endpoint"""
+    metricas = obter_metricas()
+    if not metricas:
+        return
+
+    print("\n📈 Chamadas HTTP por endpoint:")
+    for endpoint, metrica in sorted(metricas.items()):
+        print(
+            f"   {endpoint}: {metrica['chamadas']} chamadas | "
+            f"média {metrica['tempo_medio'] * 1000:.0f} ms | máx {metrica['tempo_maximo'] * 1000:.0f} ms | "
+            f"{metrica['erros']} erros | {metrica['repeticoes']} repetições"
+        )
@@ -0,0 +1,242 @@
+"""
+Espera do download da fatura por eventos e latência dos downloads por UC
+
+Antes, o robô clicava no botão e tentava page.expect_download com prazo de 1 segundo até 30
+vezes, conferindo o modal de erro com is_visible() entre as tentativas, e esperava 3 segundos
+fixos depois de cada falha. Aqui a espera é uma corrida única que termina no que vier primeiro:
+- o evento 'download' do Playwright (escutado desde antes do clique)
+- o modal "Houve um erro na sua tentativa de download" (MutationObserver na página, conferindo
+  só a visibilidade do elemento do modal)
+- o prazo DOWNLOAD_PRAZO
+As esperas entre tentativas crescem com o número de falhas (DOWNLOAD_ESPERA_BASE até
+DOWNLOAD_ESPERA_MAXIMA) e o tempo do clique até os bytes do PDF é acumulado por UC
+(obter_metricas_download / imprimir_metricas_download).
+"""
+
+import random
+import threading
+import uuid
+
+from config import DOWNLOAD_ESPERA_BASE, DOWNLOAD_ESPERA_MAXIMA
+
+MENSAGEM_ERRO_DOWNLOAD = "Houve um erro na sua tentativa de download"
+
+# Resolve com 'download', 'modal' ou 'prazo'. window[chave] encerra a espera pelo lado do
+# Python (evento de download); window[chave + '_download'] marca um download que chegou antes.
+# O elemento do modal é procurado pelo texto (sem layout) só quando nós ou textos mudam, e a
+# cada mutação só a visibilidade dele é conferida, no máximo uma vez por quadro
+# (requestAnimationFrame, com setTimeout para quando a aba não desenha)
+SCRIPT_ESPERA = """
+([mensagem, prazoMs, chave]) => new Promise((resolve) => {
+    // Elementos mais internos com a mensagem no texto (como o get_by_text do Playwright)
+    const texto = JSON.stringify(mensagem);
+    const xpath = `//body//*[contains(normalize-space(.), ${texto}) and not(*[contains(normalize-space(.), ${texto})])]`;
+    let candidatos = [];
+    let procurar = true;
+
+    const visivel = (elemento) => elemento.checkVisibility
+        ? elemento.checkVisibility({checkOpacity: true, checkVisibilityCSS: true})
+        : elemento.getClientRects().length > 0;
+
+    const modalVisivel = () => {
+        if (procurar || candidatos.some((elemento) => !elemento.isConnected)) {
+            procurar = false;
+            candidatos = [];
+            if (document.body && document.body.textContent.includes(mensagem)) {
+                const resultado = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                for (let i = 0; i < resultado.snapshotLength; i++) candidatos.push(resultado.snapshotItem(i));
+            }
+        }
+        return candidatos.some(visivel);
+    };
+
+    let encerrado = false;
+    let observador = null;
+    let prazo = null;
+    const terminar = (motivo) => {
+        if (encerrado) return;
+        encerrado = true;
+        if (observador) observador.disconnect();
+        clearTimeout(prazo);
+        delete window[chave];
+        delete window[chave + '_download'];
+        resolve(motivo);
+    };
+
+    let agendado = false;
+    const agendar = () => {
+        if (agendado) return;
+        agendado = true;
+        let temporizador = null;
+        const conferir = () => {
+            if (!agendado || encerrado) return;
+            agendado = false;
+            clearTimeout(temporizador);
+            if (modalVisivel()) terminar('modal');
+        };
+        requestAnimationFrame(conferir);
+        temporizador = setTimeout(conferir, 100);
+    };
+
+    if (window[chave + '_download']) return terminar('download');
+    if (modalVisivel()) return terminar('modal');
+
+    window[chave] = terminar;
+    prazo = setTimeout(() => terminar('prazo'), prazoMs);
+    observador = new MutationObserver((mutacoes) => {
+        // Mudança só de atributo (classe, estilo) não troca o texto: basta conferir a visibilidade
+        if (!procurar) procurar = mutacoes.some((mutacao) => mutacao.type !== 'attributes');
+        agendar();
+    });
+    observador.observe(document.documentElement, {
+        childList: true, subtree: true, characterData: true,
+        attributes: true, attributeFilter: ['class', 'style', 'hidden', 'open', 'aria-hidden']
+    });
+})
+"""
+
+SCRIPT_AVISAR_DOWNLOAD = """
+(chave) => {
+    window[chave + '_download'] = true;
+    if (window[chave]) window[chave]('download');
+}
+"""
+
+_lock_metricas = threading.Lock()
+_metricas = {}
+
+
+def aguardar_download(page, download_button, prazo_segundos):
+    """
+    Clica no botão e espera o download, o modal de erro ou o prazo (o que vier primeiro)
+
+    Args:
+        page: Instância da página do Playwright
+        download_button: Locator do botão de download do card
+        prazo_segundos (float): Prazo máximo de espera após o clique
+
+    Returns:
+        tuple: (motivo, download) - motivo 'download', 'modal' ou 'prazo';
+               download é o Download do Playwright ou None
+    """
+    chave = f"__esperaDownload_{uuid.uuid4().hex}"
+    recebidos = []
+
+    def ao_baixar(download):
+        recebidos.append(download)
+        try:
+            page.evaluate(SCRIPT_AVISAR_DOWNLOAD, chave)
+        except Exception:
+            pass  # A espera termina pelo prazo e o download já está em recebidos
+
+    page.on("download", ao_baixar)
+    try:
+        download_button.click()
+        if recebidos:
+            return "download", recebidos[0]
+
+        try:
+            motivo = page.evaluate(SCRIPT_ESPERA, [MENSAGEM_ERRO_DOWNLOAD, int(prazo_segundos * 1000), chave])
+        except Exception as e:
+            # Página navegou durante a espera: vale o download, se ele chegou
+            if not recebidos:
+                raise Exception(f"Espera do download interrompida: {str(e)}")
+            motivo = "download"
+
+        if recebidos:
+            return "download", recebidos[0]
+        return motivo, None
+    finally:
+        page.remove_listener("download", ao_baixar)
+
+
+def calcular_espera_retry(falhas):
+    """
+    Espera antes da próxima tentativa de download: DOWNLOAD_ESPERA_BASE * 2^(falhas-1)
+    (até DOWNLOAD_ESPERA_MAXIMA), com jitter
+
+    Args:
+        falhas (int): Tentativas que já falharam para esta fatura
+
+    Returns:
+        float: Espera em segundos
+    """
+    limite = min(DOWNLOAD_ESPERA_MAXIMA, DOWNLOAD_ESPERA_BASE * (2 ** max(0, falhas - 1)))
+    return random.uniform(limite / 2, limite)
+
+
+def registrar_download(nova_uc, segundos, tentativas, sucesso):
+    """
+    Acumula a latência de um download (do clique aos bytes do PDF) na UC
+
+    Args:
+        nova_uc (str): UC da fatura
+        segundos (float): Tempo da tentativa que baixou o PDF (ignorado se não houve sucesso)
+        tentativas (int): Tentativas feitas para esta fatura
+        sucesso (bool): Se o PDF foi obtido
+    """
+    with _lock_metricas:
+        metrica = _metricas.setdefault(nova_uc, {
+            'downloads': 0,
+            'falhas': 0,
+            'tentativas': 0,
+            'tempo_total': 0.0,
+            'tempo_maximo': 0.0
+        })
+        metrica['tentativas'] += tentativas
+        if sucesso:
+            metrica['downloads'] += 1
+            metrica['tempo_total'] += segundos
+            metrica['tempo_maximo'] = max(metrica['tempo_maximo'], segundos)
+        else:
+            metrica['falhas'] += 1
+
+
+def obter_metricas_download():
+    """
+    Retorna a latência dos downloads acumulada por UC
+
+    Returns:
+        dict: {nova_uc: {downloads, falhas, tentativas, tempo_total, tempo_maximo, tempo_medio}}
+    """
+    with _lock_metricas:
+        return {
+            nova_uc: dict(
+                metrica,
+                tempo_medio=metrica['tempo_total'] / metrica['downloads'] if metrica['downloads'] else 0.0
+            )
+            for nova_uc, metrica in _metricas.items()
+        }
+
+
+def zerar_metricas_download():
+    """Zera os contadores de download"""
+    with _lock_metricas:
+        _metricas.clear()
+
+
+def imprimir_metricas_download(limite_ucs=10):
+    """
+    Imprime o total dos downloads e as UCs com maior tempo médio
+
+    Args:
+        limite_ucs (int): Quantidade de UCs listadas
+    """
+    metricas = obter_metricas_download()
+    if not metricas:
+        return
+
+    downloads = sum(m['downloads'] for m in metricas.values())
+    tempo_total = sum(m['tempo_total'] for m in metricas.values())
+    print(
+        f"\n📥 Downloads de faturas: {downloads} em {len(metricas)} UCs | "
+        f"média {tempo_total / downloads if downloads else 0:.1f}s | "
+        f"{sum(m['falhas'] for m in metricas.values())} falhas | "
+        f"{sum(m['tentativas'] for m in metricas.values())} tentativas"
+    )
+    mais_lentas = sorted(metricas.items(), key=lambda item: item[1]['tempo_medio'], reverse=True)
+    for nova_uc, metrica in mais_lentas[:limite_ucs]:
+        print(
+            f"   UC {nova_uc}: {metrica['downloads']} downloads | média {metrica['tempo_medio']:.1f}s | "
+            f"máx {metrica['tempo_maximo']:.1f}s | {metrica['falhas']} falhas | {metrica['tentativas']} tentativas"
+        )
@@ -0,0 +1,276 @@
+"""
+Modelo compacto das faturas na fila do robô
+
+Cada fatura vira um FaturaTask (__slots__) só com os campos usados no processamento:
+id, UC, mês de referência, tarefa e os valores anteriores de valor, vencimento e
+situação (detecção de mudanças). O payload completo da API fica em um arquivo
+temporário (ArmazemFaturas) e só é lido quando pedido (FaturaTask.bruto).
+
+As faturas de uma geradora ficam em uma lista única ordenada por UC; o agrupamento
+por UC é um índice de intervalos sobre essa lista (SnapshotGeradora), sem cópias.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+
+# Campos do payload da API mantidos no FaturaTask (nome na API -> atributo)
+CAMPOS_TASK = {
+    "id": "id",
+    "nova_uc": "nova_uc",
+    "data_referencia": "mes_referencia",
+    "tarefa": "tarefa",
+    "valor": "valor",
+    "data_vencimento": "data_vencimento",
+    "situacao_pagamento": "situacao_pagamento",
+}
+
+
+def _internar(valor):
+    """Compartilha a mesma string entre faturas (meses, vencimentos, tarefas e situações se repetem)"""
+    return sys.intern(valor) if isinstance(valor, str) else valor
+
+
+class ArmazemFaturas:
+    """
+    Payloads completos da API em um arquivo temporário (uma linha JSON por fatura)
+
+    Em memória fica só a posição de cada linha, guardada no FaturaTask.
+    O arquivo é removido quando o armazém deixa de ser referenciado.
+    """
+
+    def __init__(self):
+        self.arquivo = tempfile.TemporaryFile(mode="w+b")
+        self._lock = threading.Lock()
+
+    def adicionar(self, fatura):
+        """
+        Grava o payload da fatura
+
+        Args:
+            fatura (dict): Payload da API
+
+        Returns:
+            int: Posição da linha no arquivo
+        """
+        linha = json.dumps(fatura, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            self.arquivo.seek(0, os.SEEK_END)
+            posicao = self.arquivo.tell()
+            self.arquivo.write(linha)
+        return posicao
+
+    def ler(self, posicao):
+        """Lê o payload gravado na posição"""
+        with self._lock:
+            self.arquivo.seek(posicao)
+            linha = self.arquivo.readline()
+        return json.loads(linha)
+
+
+class FaturaTask:
+    """Fatura a processar: campos do robô em memória, payload da API sob demanda"""
+
+    __slots__ = ("id", "nova_uc", "mes_referencia", "tarefa", "valor", "data_vencimento",
+                 "situacao_pagamento", "_armazem", "_posicao")
+
+    def __init__(self, fatura, armazem, posicao):
+        """
+        Args:
+            fatura (dict): Payload da API (já com 'tarefa' e 'nova_uc' processada)
+            armazem (ArmazemFaturas): Onde o payload completo foi gravado
+            posicao (int): Posição do payload no armazém
+        """
+        self.id = fatura.get("id")
+        self.nova_uc = _internar(fatura.get("nova_uc"))
+        self.mes_referencia = _internar(fatura.get("data_referencia"))
+        self.tarefa = _internar(fatura.get("tarefa"))
+        self.valor = fatura.get("valor")
+        self.data_vencimento = _internar(fatura.get("data_vencimento"))
+        self.situacao_pagamento = _internar(fatura.get("situacao_pagamento"))
+        self._armazem = armazem
+        self._posicao = posicao
+
+    @property
+    def bruto(self):
+        """Payload completo da API (lido do armazém a cada acesso)"""
+        return self._armazem.ler(self._posicao)
+
+    def get(self, campo, padrao=None):
+        """
+        Acesso no estilo dict pelos nomes de campo da API (compatível com o payload antigo)
+
+        Campos do robô vêm da memória; os demais são lidos do payload completo.
+        """
+        atributo = CAMPOS_TASK.get(campo)
+        if atributo is not None:
+            valor = getattr(self, atributo)
+            return padrao if valor is None else valor
+        return self.bruto.get(campo, padrao)
+
+    def __repr__(self):
+        return f"FaturaTask(id={self.id!r}, nova_uc={self.nova_uc!r}, mes={self.mes_referencia!r}, tarefa={self.tarefa!r})"
+
+
+class SnapshotGeradora:
+    """
+    Faturas de uma geradora prontas para o robô
+
+    As faturas ficam em uma lista ordenada por UC e indice_ucs guarda, para cada UC,
+    o intervalo (inicio, fim) dela na lista. Filtrar cria um novo índice sobre os
+    mesmos FaturaTask, sem copiar payloads.
+    """
+
+    def __init__(self, geradora, armazem=None):
+        """
+        Args:
+            geradora (str): CNPJ da geradora
+            armazem (ArmazemFaturas): Armazém dos payloads (padrão: um novo)
+        """
+        self.geradora = geradora
+        self.armazem = armazem or ArmazemFaturas()
+        self._tarefas = []
+        self._indice_ucs = {}
+        self._pendentes = {}
+
+    # ==================== MONTAGEM ====================
+
+    def adicionar(self, nova_uc, fatura):
+        """Grava o payload no armazém e enfileira o FaturaTask na UC"""
+        posicao = self.armazem.adicionar(fatura)
+        self._pendentes.setdefault(nova_uc, []).append(FaturaTask(fatura, self.armazem, posicao))
+
+    def _organizar(self):
+        """Junta as faturas adicionadas na lista única e recalcula o índice por UC"""
+        if not self._pendentes:
+            return
+        por_uc = {uc: self._tarefas[inicio:fim] for uc, (inicio, fim) in self._indice_ucs.items()}
+        for nova_uc, tarefas_uc in self._pendentes.items():
+            por_uc.setdefault(nova_uc, []).extend(tarefas_uc)
+        self._pendentes = {}
+        self._indexar(por_uc.items())
+
+    def _indexar(self, itens_ucs):
+        """Monta lista e índice a partir de pares (nova_uc, [FaturaTask])"""
+        self._tarefas = []
+        self._indice_ucs = {}
+        for nova_uc, tarefas_uc in itens_ucs:
+            if tarefas_uc:
+                inicio = len(self._tarefas)
+                self._tarefas.extend(tarefas_uc)
+                self._indice_ucs[nova_uc] = (inicio, len(self._tarefas))
+
+    @classmethod
+    def de_dados(cls, dados):
+        """
+        Cria o snapshot a partir do formato JSON {'geradora', 'lista_ucs'} (ex.: cópia em disco)
+
+        Args:
+            dados (dict): Dados da geradora
+
+        Returns:
+            SnapshotGeradora: Snapshot equivalente
+        """
+        snapshot = cls(dados.get("geradora"))
+        for nova_uc, faturas in dados.get("lista_ucs", {}).items():
+            for fatura in faturas:
+                snapshot.adicionar(nova_uc, fatura)
+        snapshot._organizar()
+        return snapshot
+
+    # ==================== CONSULTA ====================
+
+    @property
+    def tarefas(self):
+        """Todos os FaturaTask, agrupados por UC"""
+        self._organizar()
+        return self._tarefas
+
+    @property
+    def indice_ucs(self):
+        """{nova_uc: (inicio, fim)} - intervalo de cada UC em tarefas"""
+        self._organizar()
+        return self._indice_ucs
+
+    @property
+    def total_faturas(self):
+        return len(self.tarefas)
+
+    @property
+    def total_ucs(self):
+        return len(self.indice_ucs)
+
+    def ucs(self):
+        """Lista das UCs, na ordem de processamento"""
+        return list(self.indice_ucs)
+
+    def faturas_da_uc(self, nova_uc):
+        """Lista dos FaturaTask de uma UC (vazia se a UC não está no snapshot)"""
+        inicio, fim = self.indice_ucs.get(nova_uc, (0, 0))
+        return self.tarefas[inicio:fim]
+
+    def itens_ucs(self, ucs=None):
+        """
+        Gera pares (nova_uc, [FaturaTask]) por UC
+
+        Args:
+            ucs (iterable): Limita às UCs informadas (padrão: todas)
+        """
+        indice_ucs = self.indice_ucs
+        for nova_uc in (list(indice_ucs) if ucs is None else ucs):
+            if nova_uc in indice_ucs:
+                yield nova_uc, self.faturas_da_uc(nova_uc)
+
+    def iterar_faturas(self):
+        """Gera pares (nova_uc, payload completo) na ordem do snapshot, lendo um por vez"""
+        for nova_uc, tarefas_uc in self.itens_ucs():
+            for tarefa in tarefas_uc:
+                yield nova_uc, tarefa.bruto
+
+    def filtrar(self, manter):
+        """
+        Novo snapshot com as faturas para as quais manter(fatura_task) é verdadeiro
+
+        Args:
+            manter (callable): Recebe um FaturaTask e retorna bool
+
+        Returns:
+            SnapshotGeradora: Snapshot filtrado (compartilha armazém e FaturaTask)
+        """
+        filtrado = SnapshotGeradora(self.geradora, self.armazem)
+        filtrado._indexar(
+            (nova_uc, [tarefa for tarefa in tarefas_uc if manter(tarefa)])
+            for nova_uc, tarefas_uc in self.itens_ucs()
+        )
+        return filtrado
+
+    # ==================== EXPORTAÇÃO ====================
+
+    def gravar_json(self, saida):
+        """
+        Grava o snapshot em JSON compacto {'geradora', 'lista_ucs'}, uma fatura por vez
+
+        Args:
+            saida: Arquivo binário aberto para escrita
+        """
+        def codificar(valor):
+            return json.dumps(valor, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        saida.write(b'{"geradora":' + codificar(self.geradora) + b',"lista_ucs":{')
+        for i, (nova_uc, tarefas_uc) in enumerate(self.itens_ucs()):
+            saida.write((b"," if i else b"") + codificar(nova_uc) + b":[")
+            saida.write(b",".join(codificar(tarefa.bruto) for tarefa in tarefas_uc))
+            saida.write(b"]")
+        saida.write(b"}}")
+
+    def para_dados(self):
+        """Formato JSON completo {'geradora', 'lista_ucs'} (carrega todos os payloads)"""
+        return {
+            "geradora": self.geradora,
+            "lista_ucs": {
+                nova_uc: [tarefa.bruto for tarefa in tarefas_uc]
+                for nova_uc, tarefas_uc in self.itens_ucs()
+            }
+        }
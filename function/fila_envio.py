@@ -0,0 +1,375 @@
+"""
+Envio das faturas à API GEUS em segundo plano
+
+O robô extrai os dados e o PDF do card, enfileira a requisição e segue para o
+próximo card/UC enquanto um pool limitado de threads faz os uploads:
+- a fila tem tamanho máximo (ENVIO_MAX_PENDENTES): se a GEUS fica lenta, o robô
+  espera uma vaga antes de enfileirar (backpressure) e a memória fica limitada
+  a poucos PDFs (cada um guardado uma única vez, em bytes)
+- o status final da fatura só é gravado no banco quando a GEUS confirma o envio;
+  se o envio falhar, ele vai para a outbox (function/outbox.py) com o PDF
+- a execução da UC é registrada quando o último envio da UC termina
+- o hash do PDF confirmado é gravado junto com o status, para que um PDF idêntico
+  baixado depois não seja reenviado
+"""
+
+import atexit
+import hashlib
+import queue
+import threading
+import time
+
+from config import ENVIO_WORKERS, ENVIO_MAX_PENDENTES, ENVIO_FORMATO
+from database import DatabaseManager, fechar_conexoes_thread
+from function import cliente_http
+from function.outbox import guardar_na_outbox
+
+
+# Campos do envio da fatura completa
+CAMPO_ARQUIVO = "arquivo_fatura"
+CAMPO_NOME_ARQUIVO = "nome_arquivo_fatura"
+
+
+def calcular_hash_pdf(conteudo):
+    """
+    Hash do conteúdo do PDF, para reconhecer um arquivo idêntico ao já enviado
+
+    Args:
+        conteudo (bytes): PDF da fatura
+
+    Returns:
+        str: SHA-256 em hexadecimal
+    """
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+class RequisicaoGeus:
+    """POST à API GEUS montado pelo robô (criar fatura ou atualizar situação)"""
+
+    def __init__(self, url, headers, body, mensagem_sucesso, pdf=None, **opcoes):
+        """
+        Args:
+            url (str): Endpoint da API
+            headers (dict): Cabeçalhos da requisição
+            body (dict): Corpo JSON (sem o arquivo)
+            mensagem_sucesso (str): Mensagem impressa quando a API responde 200
+            pdf (bytes): PDF da fatura, enviado no campo arquivo_fatura (opcional)
+            **opcoes: Parâmetros de cliente_http.requisitar (endpoint, idempotente, timeout_leitura)
+        """
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.mensagem_sucesso = mensagem_sucesso
+        self.pdf = pdf
+        self.hash_pdf = calcular_hash_pdf(pdf) if pdf is not None else None
+        self.opcoes = opcoes
+        self.ultimo_erro = None
+
+    @property
+    def apenas_situacao(self):
+        """True se é só a atualização da situação de pagamento (corpo {id, situacao_pagamento}, sem PDF)"""
+        return self.pdf is None and set(self.body) == {"id", "situacao_pagamento"}
+
+    def _parametros_corpo(self):
+        """
+        Corpo da requisição para requests
+
+        Sem PDF, o body vai como JSON. Com PDF, o corpo é gerado em blocos durante o envio:
+        JSON com o PDF em base64 ou multipart com o PDF binário (ENVIO_FORMATO do .env).
+        """
+        if self.pdf is None:
+            return {"headers": self.headers, "json": self.body}
+
+        if ENVIO_FORMATO == "multipart":
+            corpo, content_type = cliente_http.corpo_multipart(
+                self.body, CAMPO_ARQUIVO, self.body.get(CAMPO_NOME_ARQUIVO) or "fatura.pdf", self.pdf
+            )
+        else:
+            corpo, content_type = cliente_http.corpo_json_com_arquivo(self.body, CAMPO_ARQUIVO, self.pdf)
+        return {"headers": dict(self.headers, **{"Content-Type": content_type}), "data": corpo}
+
+    def enviar(self):
+        """
+        Envia a requisição pelo cliente HTTP compartilhado
+
+        Returns:
+            bool: True se a API respondeu 200
+        """
+        response = cliente_http.post(self.url, **self._parametros_corpo(), **self.opcoes)
+        try:
+            if response.status_code == 200:
+                print(f"✅ {self.mensagem_sucesso}")
+                return True
+            print(f"❌ Erro ao enviar para API: {response.status_code}")
+            print(f"Resposta: {response.text}")
+            self.ultimo_erro = f"status {response.status_code}: {response.text[:500]}"
+            return False
+        finally:
+            response.close()
+
+
+class _Envio:
+    """Item da fila: requisição e o que é gravado no banco quando ela termina"""
+
+    __slots__ = ("requisicao", "fatura_id", "chave_uc", "tarefa", "tipo_operacao",
+                 "valor", "data_vencimento", "situacao_pagamento", "log_execucao")
+
+    def __init__(self, requisicao, fatura_id, chave_uc, tarefa, tipo_operacao, dados_fatura, log_execucao):
+        self.requisicao = requisicao
+        self.fatura_id = fatura_id
+        self.chave_uc = chave_uc
+        self.tarefa = tarefa
+        self.tipo_operacao = tipo_operacao
+        self.valor = dados_fatura.get("valor")
+        self.data_vencimento = dados_fatura.get("data_vencimento")
+        self.situacao_pagamento = dados_fatura.get("situacao_pagamento")
+        self.log_execucao = log_execucao
+
+
+class FilaEnvio:
+    """
+    Fila limitada de envios à API GEUS atendida por um pool de threads
+
+    Uso:
+        with FilaEnvio() as fila_envio:
+            processar_faturas_do_json(dados, page, fila_envio=fila_envio)
+    """
+
+    def __init__(self, workers=None, max_pendentes=None, db=None):
+        """
+        Inicializa a fila e as threads de envio
+
+        Args:
+            workers (int): Envios simultâneos (padrão: ENVIO_WORKERS do .env)
+            max_pendentes (int): Envios aguardando na fila antes do robô esperar (padrão: ENVIO_MAX_PENDENTES)
+            db (DatabaseManager): Onde o status é gravado após a confirmação (padrão: um novo)
+        """
+        self.db = db or DatabaseManager()
+        self.workers = max(1, workers or ENVIO_WORKERS)
+        self.max_pendentes = max(1, max_pendentes or ENVIO_MAX_PENDENTES)
+
+        self.confirmados = 0
+        self.falhas = 0
+        self.segundos_espera = 0.0
+
+        self._fila = queue.Queue(maxsize=self.max_pendentes)
+        self._lock = threading.Lock()
+        self._em_andamento = set()
+        self._ucs = {}
+        self._encerrado = False
+
+        self._threads = [
+            threading.Thread(target=self._loop_envio, name=f"envio-geus-{i + 1}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.fechar)
+
+    def em_andamento(self, fatura_id):
+        """True se a fatura foi enfileirada e o envio ainda não terminou"""
+        with self._lock:
+            return fatura_id in self._em_andamento
+
+    def enfileirar(self, requisicao, fatura_id, cnpj_geradora, nova_uc, tarefa,
+                   tipo_operacao, dados_fatura, log_execucao):
+        """
+        Enfileira o envio da fatura; espera uma vaga se a fila estiver cheia
+
+        Args:
+            requisicao (RequisicaoGeus): Requisição montada pelo robô
+            fatura_id (int): ID da fatura
+            cnpj_geradora (str): CNPJ da geradora
+            nova_uc (str): UC da fatura
+            tarefa (str): Tarefa da fatura (para a mensagem de erro)
+            tipo_operacao (str): Tipo de operação gravado se o envio for confirmado
+            dados_fatura (dict): Dados extraídos do card (valor, vencimento, situação)
+            log_execucao (str): Log da extração no portal
+        """
+        chave_uc = (cnpj_geradora, nova_uc)
+        envio = _Envio(requisicao, fatura_id, chave_uc, tarefa, tipo_operacao, dados_fatura, log_execucao)
+
+        with self._lock:
+            self._em_andamento.add(fatura_id)
+            contagem = self._ucs.setdefault(chave_uc, {'pendentes': 0, 'sucesso': 0, 'erro': 0, 'registro': None})
+            contagem['pendentes'] += 1
+
+        try:
+            self._fila.put_nowait(envio)
+        except queue.Full:
+            print(f"   ⏳ Fila de envio cheia ({self.max_pendentes}) - aguardando a API GEUS")
+            inicio = time.monotonic()
+            self._fila.put(envio)
+            espera = time.monotonic() - inicio
+            self.segundos_espera += espera
+            print(f"   ▶️ Vaga na fila de envio após {espera:.1f}s")
+
+        print(f"   📤 Envio da fatura ID {fatura_id} enfileirado | Na fila: {self._fila.qsize()}")
+
+    def adiar_execucao_uc(self, cnpj_geradora, nova_uc, total_faturas, faturas_sucesso,
+                          faturas_erro, faturas_puladas, data_hora_inicio):
+        """
+        Registra a execução da UC quando o último envio dela terminar
+
+        Os contadores informados são os das faturas já concluídas; os envios em
+        andamento são somados a eles conforme a API responde.
+
+        Returns:
+            bool: True se ficou adiada, False se a UC não tem envios em andamento
+                  (o chamador registra a execução normalmente)
+        """
+        with self._lock:
+            contagem = self._ucs.get((cnpj_geradora, nova_uc))
+            if contagem is None or contagem['pendentes'] == 0:
+                self._ucs.pop((cnpj_geradora, nova_uc), None)
+                if contagem is None:
+                    return False
+                faturas_sucesso += contagem['sucesso']
+                faturas_erro += contagem['erro']
+            else:
+                contagem['registro'] = {
+                    'cnpj_geradora': cnpj_geradora,
+                    'nova_uc': nova_uc,
+                    'total_faturas': total_faturas,
+                    'faturas_sucesso': faturas_sucesso,
+                    'faturas_erro': faturas_erro,
+                    'faturas_puladas': faturas_puladas,
+                    'data_hora_inicio': data_hora_inicio
+                }
+                return True
+
+        # Todos os envios da UC já terminaram: registrar com os resultados deles
+        self.db.registrar_execucao_uc(
+            cnpj_geradora=cnpj_geradora,
+            nova_uc=nova_uc,
+            total_faturas=total_faturas,
+            faturas_sucesso=faturas_sucesso,
+            faturas_erro=faturas_erro,
+            faturas_puladas=faturas_puladas,
+            data_hora_inicio=data_hora_inicio
+        )
+        return True
+
+    def _loop_envio(self):
+        """Thread de envio: atende a fila até receber o sinal de parada (None)"""
+        try:
+            while True:
+                envio = self._fila.get()
+                try:
+                    if envio is None:
+                        return
+                    self._enviar(envio)
+                finally:
+                    self._fila.task_done()
+        finally:
+            cliente_http.fechar_sessao()
+            fechar_conexoes_thread()
+
+    def _enviar(self, envio):
+        """Envia uma fatura e grava o status conforme a resposta da API"""
+        inicio = time.monotonic()
+        try:
+            sucesso = envio.requisicao.enviar()
+            mensagem_erro = None if sucesso else f"API GEUS recusou o envio ({envio.tarefa}) - {envio.requisicao.ultimo_erro}"
+        except Exception as e:
+            sucesso, mensagem_erro = False, str(e)
+
+        segundos = time.monotonic() - inicio
+        if sucesso:
+            resumo = f"Envio confirmado pela API GEUS em segundo plano ({segundos:.1f}s)"
+            print(f"   ✅ Fatura ID {envio.fatura_id}: {resumo}")
+        else:
+            resumo = f"Falha no envio à API GEUS em segundo plano ({segundos:.1f}s): {mensagem_erro}"
+            print(f"   ❌ Fatura ID {envio.fatura_id}: {resumo}")
+        log_execucao = f"{envio.log_execucao}{resumo}\n"
+
+        try:
+            if sucesso:
+                self.db.atualizar_status_fatura(
+                    fatura_id=envio.fatura_id,
+                    status='sucesso',
+                    valor=envio.valor,
+                    data_vencimento=envio.data_vencimento,
+                    situacao_pagamento=envio.situacao_pagamento,
+                    tipo_operacao=envio.tipo_operacao,
+                    log_execucao=log_execucao,
+                    hash_pdf=envio.requisicao.hash_pdf
+                )
+            else:
+                self.db.atualizar_status_fatura(
+                    fatura_id=envio.fatura_id,
+                    status='erro',
+                    mensagem_erro=mensagem_erro,
+                    tipo_operacao="erro",
+                    log_execucao=log_execucao
+                )
+                # Depois do status 'erro', para a outbox não ser concluída antes dele
+                guardar_na_outbox(envio.requisicao, envio.tipo_operacao, {
+                    "valor": envio.valor,
+                    "data_vencimento": envio.data_vencimento,
+                    "situacao_pagamento": envio.situacao_pagamento
+                }, mensagem_erro, db=self.db)
+        finally:
+            self._concluir(envio, sucesso)
+
+    def _concluir(self, envio, sucesso):
+        """Atualiza os contadores e registra a execução da UC se era o último envio dela"""
+        with self._lock:
+            self._em_andamento.discard(envio.fatura_id)
+            if sucesso:
+                self.confirmados += 1
+            else:
+                self.falhas += 1
+
+            contagem = self._ucs.get(envio.chave_uc)
+            if contagem is None:
+                return
+            contagem['pendentes'] -= 1
+            contagem['sucesso' if sucesso else 'erro'] += 1
+
+            registro = contagem['registro']
+            if contagem['pendentes'] > 0 or registro is None:
+                return
+            del self._ucs[envio.chave_uc]
+
+        registro['faturas_sucesso'] += contagem['sucesso']
+        registro['faturas_erro'] += contagem['erro']
+        self.db.registrar_execucao_uc(**registro)
+
+    def aguardar(self):
+        """Bloqueia até todos os envios enfileirados terminarem"""
+        self._fila.join()
+
+    def fechar(self):
+        """
+        Espera os envios pendentes, para as threads e imprime o resumo
+
+        Returns:
+            dict: {'confirmados', 'falhas', 'segundos_espera'}
+        """
+        if not self._encerrado:
+            self._encerrado = True
+            for _ in self._threads:
+                self._fila.put(None)
+            for thread in self._threads:
+                thread.join()
+            atexit.unregister(self.fechar)
+
+            if self.confirmados or self.falhas:
+                print(
+                    f"📤 Envios à API GEUS: {self.confirmados} confirmados, {self.falhas} falhas | "
+                    f"robô aguardou {self.segundos_espera:.1f}s por fila cheia"
+                )
+
+        return {
+            'confirmados': self.confirmados,
+            'falhas': self.falhas,
+            'segundos_espera': self.segundos_espera
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.fechar()
+        return False
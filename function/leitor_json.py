@@ -0,0 +1,93 @@
+"""
+Leitura incremental de arrays JSON grandes (ex.: resposta da API GEUS)
+
+Em vez de carregar o documento inteiro com response.json(), os itens do array
+são decodificados conforme os blocos chegam; só o item em leitura fica em memória.
+"""
+
+import codecs
+import json
+
+_ESPACOS = ' \t\n\r'
+
+
+def _pular_espacos(texto, pos):
+    """Retorna a primeira posição a partir de pos que não é espaço em branco"""
+    while pos < len(texto) and texto[pos] in _ESPACOS:
+        pos += 1
+    return pos
+
+
+def iterar_itens_array_json(blocos, encoding='utf-8'):
+    """
+    Gera os itens de um array JSON a partir de blocos de bytes (ou texto)
+
+    Exemplo:
+        response = requests.get(url, stream=True)
+        for fatura in iterar_itens_array_json(response.iter_content(65536)):
+            ...
+
+    Args:
+        blocos (iterable): Blocos do documento, na ordem (bytes ou str)
+        encoding (str): Codificação usada quando os blocos são bytes
+
+    Yields:
+        Cada elemento do array já decodificado
+
+    Raises:
+        ValueError: Se o documento não for um array JSON válido
+    """
+    decodificador = json.JSONDecoder()
+    decodificador_texto = codecs.getincrementaldecoder(encoding)()
+    buffer = ''
+    dentro_do_array = False
+    terminou = False
+
+    for bloco in blocos:
+        if terminou:
+            break
+        if isinstance(bloco, bytes):
+            bloco = decodificador_texto.decode(bloco)
+        buffer += bloco
+        pos = 0
+
+        while True:
+            pos = _pular_espacos(buffer, pos)
+            if pos >= len(buffer):
+                break
+
+            if not dentro_do_array:
+                if buffer[pos] != '[':
+                    raise ValueError(f"Esperado início de array JSON, encontrado {buffer[pos]!r}")
+                dentro_do_array = True
+                pos += 1
+                continue
+
+            if buffer[pos] == ',':
+                pos = _pular_espacos(buffer, pos + 1)
+                if pos >= len(buffer):
+                    break
+            if buffer[pos] == ']':
+                terminou = True
+                break
+
+            try:
+                item, fim = decodificador.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Item incompleto: aguardar o próximo bloco
+                break
+
+            # Fora de objetos e arrays, o item só está completo quando vier ',' ou ']':
+            # um número cortado no bloco ('2.' + '5') seria lido pela metade
+            if not isinstance(item, (dict, list)):
+                seguinte = _pular_espacos(buffer, fim)
+                if seguinte >= len(buffer) or buffer[seguinte] not in ',]':
+                    break
+
+            yield item
+            pos = fim
+
+        buffer = buffer[pos:]
+
+    if not terminou:
+        raise ValueError("Array JSON incompleto ou inválido")
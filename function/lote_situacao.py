@@ -0,0 +1,361 @@
+"""
+Atualizações só da situação de pagamento enviadas em lote à API GEUS
+
+As faturas agendadas e as vencidas/a vencer em que só a situação mudou geram um
+POST minúsculo ({id, situacao_pagamento}) cada. Em vez de um POST por fatura no
+meio da navegação, as atualizações são acumuladas (por geradora no robo.py) e
+descarregadas de uma vez:
+- se houver endpoint em lote (API_ATUALIZAR_FATURA_LOTE_*), um POST por bloco de
+  SITUACAO_LOTE_TAMANHO faturas, com o resultado de cada uma na resposta
+- senão (ou se o endpoint responder 404/405/501), os POSTs individuais vão em
+  paralelo (SITUACAO_LOTE_PARALELAS), reaproveitando as conexões de cada thread
+
+O resultado de cada fatura vira o status no banco ('sucesso' ou 'erro'; as que
+falharam vão para a outbox) e a execução da UC é registrada depois do envio.
+"""
+
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    DEBUG_MODE, GEUS_APIKEY, API_ATUALIZAR_FATURA_LOTE_DEV, API_ATUALIZAR_FATURA_LOTE_PROD,
+    SITUACAO_LOTE_TAMANHO, SITUACAO_LOTE_PARALELAS
+)
+from database import DatabaseManager
+from function import cliente_http
+from function.outbox import guardar_na_outbox
+
+# Respostas do endpoint em lote que indicam que o servidor não o oferece
+STATUS_SEM_LOTE = {404, 405, 501}
+
+# Chaves aceitas para a lista de resultados quando a resposta do lote vem como objeto
+CHAVES_RESULTADOS = ("resultados", "results", "faturas", "items")
+
+
+class _Atualizacao:
+    """Atualização pendente e o que é gravado no banco quando ela termina"""
+
+    __slots__ = ("requisicao", "fatura_id", "chave_uc", "tipo_operacao",
+                 "valor", "data_vencimento", "situacao_pagamento", "log_execucao")
+
+    def __init__(self, requisicao, fatura_id, chave_uc, tipo_operacao, dados_fatura, log_execucao):
+        self.requisicao = requisicao
+        self.fatura_id = fatura_id
+        self.chave_uc = chave_uc
+        self.tipo_operacao = tipo_operacao
+        self.valor = dados_fatura.get("valor")
+        self.data_vencimento = dados_fatura.get("data_vencimento")
+        self.situacao_pagamento = dados_fatura.get("situacao_pagamento")
+        self.log_execucao = log_execucao
+
+
+def _ler_resultados_lote(response, ids):
+    """
+    Resultado de cada fatura na resposta do endpoint em lote
+
+    Aceita uma lista (ou objeto com 'resultados'/'results'/...) de itens com 'id' e
+    'sucesso' (bool) ou 'status' (código HTTP). Resposta 200 sem itens = todas aceitas.
+
+    Returns:
+        dict: {fatura_id: (sucesso, erro)} - IDs ausentes ficam de fora (enviados individualmente)
+    """
+    try:
+        corpo = response.json()
+    except ValueError:
+        corpo = None
+
+    if isinstance(corpo, dict):
+        corpo = next((corpo[chave] for chave in CHAVES_RESULTADOS if isinstance(corpo.get(chave), list)), None)
+    if not isinstance(corpo, list):
+        return {fatura_id: (True, None) for fatura_id in ids}
+
+    resultados = {}
+    for item in corpo:
+        if not isinstance(item, dict) or item.get("id") not in ids:
+            continue
+        if "sucesso" in item:
+            sucesso = bool(item["sucesso"])
+        else:
+            sucesso = str(item.get("status", "")) in ("200", "ok", "sucesso")
+        erro = None if sucesso else str(item.get("erro") or item.get("mensagem") or item.get("status"))
+        resultados[item["id"]] = (sucesso, erro)
+    return resultados
+
+
+class LoteSituacao:
+    """
+    Acumula as atualizações de situação e as envia em lote
+
+    Uso:
+        lote = LoteSituacao(fila_envio=fila_envio)
+        processar_faturas_do_json(dados, page, ucs=[uc], fila_envio=fila_envio, lote_situacao=lote)
+        ...
+        lote.descarregar()
+        lote.fechar()
+    """
+
+    def __init__(self, db=None, fila_envio=None, url_lote=None, tamanho=None, paralelas=None):
+        """
+        Args:
+            db (DatabaseManager): Onde os status e as execuções das UCs são gravados (padrão: um novo)
+            fila_envio (FilaEnvio): Fila com os demais envios da geradora; a execução da UC é
+                                    entregue a ela se ainda houver envios da UC em andamento
+            url_lote (str): Endpoint em lote (padrão: API_ATUALIZAR_FATURA_LOTE_* do .env; vazio = sem lote)
+            tamanho (int): Atualizações por POST em lote e limite que dispara o envio (padrão: SITUACAO_LOTE_TAMANHO)
+            paralelas (int): POSTs individuais simultâneos (padrão: SITUACAO_LOTE_PARALELAS)
+        """
+        if url_lote is None:
+            url_lote = API_ATUALIZAR_FATURA_LOTE_DEV if DEBUG_MODE else API_ATUALIZAR_FATURA_LOTE_PROD
+
+        self.db = db or DatabaseManager()
+        self.fila_envio = fila_envio
+        self.url_lote = url_lote or None
+        self.tamanho = max(1, tamanho or SITUACAO_LOTE_TAMANHO)
+        self.paralelas = max(1, paralelas or SITUACAO_LOTE_PARALELAS)
+
+        self.confirmados = 0
+        self.falhas = 0
+
+        self._pendentes = []
+        self._ucs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        atexit.register(self.fechar)
+
+    def em_andamento(self, fatura_id):
+        """True se a atualização da fatura está aguardando o próximo envio"""
+        with self._lock:
+            return any(atualizacao.fatura_id == fatura_id for atualizacao in self._pendentes)
+
+    def adicionar(self, requisicao, fatura_id, cnpj_geradora, nova_uc, tipo_operacao,
+                  dados_fatura, log_execucao):
+        """
+        Acrescenta uma atualização ao lote; envia o lote se chegar a 'tamanho'
+
+        Args:
+            requisicao (RequisicaoGeus): Atualização da situação ({id, situacao_pagamento})
+            fatura_id (int): ID da fatura
+            cnpj_geradora (str): CNPJ da geradora
+            nova_uc (str): UC da fatura
+            tipo_operacao (str): Tipo de operação gravado se a API confirmar
+            dados_fatura (dict): Dados extraídos do card
+            log_execucao (str): Log da extração no portal
+        """
+        chave_uc = (cnpj_geradora, nova_uc)
+        with self._lock:
+            self._pendentes.append(_Atualizacao(
+                requisicao, fatura_id, chave_uc, tipo_operacao, dados_fatura, log_execucao
+            ))
+            contagem = self._ucs.setdefault(chave_uc, {'pendentes': 0, 'sucesso': 0, 'erro': 0, 'registro': None})
+            contagem['pendentes'] += 1
+            cheio = len(self._pendentes) >= self.tamanho
+
+        print(f"   🗂️ Situação da fatura ID {fatura_id} no lote | Pendentes: {len(self._pendentes)}")
+        if cheio:
+            self.descarregar()
+
+    def adiar_execucao_uc(self, cnpj_geradora, nova_uc, total_faturas, faturas_sucesso,
+                          faturas_erro, faturas_puladas, data_hora_inicio):
+        """
+        Registra a execução da UC depois que as atualizações dela forem enviadas
+
+        Os contadores informados são os das faturas já concluídas; as atualizações
+        da UC são somadas a eles conforme a API responde.
+
+        Returns:
+            bool: True se ficou com o lote, False se a UC não tem atualizações no lote
+                  (o chamador registra a execução normalmente)
+        """
+        registro = {
+            'cnpj_geradora': cnpj_geradora,
+            'nova_uc': nova_uc,
+            'total_faturas': total_faturas,
+            'faturas_sucesso': faturas_sucesso,
+            'faturas_erro': faturas_erro,
+            'faturas_puladas': faturas_puladas,
+            'data_hora_inicio': data_hora_inicio
+        }
+        with self._lock:
+            contagem = self._ucs.get((cnpj_geradora, nova_uc))
+            if contagem is None:
+                return False
+            if contagem['pendentes'] > 0:
+                contagem['registro'] = registro
+                return True
+            del self._ucs[(cnpj_geradora, nova_uc)]
+
+        # Atualizações da UC já enviadas (lote cheio no meio da UC): registrar com os resultados delas
+        self._registrar_execucao(registro, contagem)
+        return True
+
+    def _registrar_execucao(self, registro, contagem):
+        """Soma os resultados do lote à execução da UC e a registra (ou entrega à fila de envio)"""
+        registro['faturas_sucesso'] += contagem['sucesso']
+        registro['faturas_erro'] += contagem['erro']
+        if self.fila_envio is None or not self.fila_envio.adiar_execucao_uc(**registro):
+            self.db.registrar_execucao_uc(**registro)
+
+    def _enviar_lote(self, atualizacoes):
+        """
+        Um POST ao endpoint em lote
+
+        Returns:
+            dict: {fatura_id: (sucesso, erro)} ou None se o lote não pôde ser usado
+        """
+        ids = {atualizacao.fatura_id for atualizacao in atualizacoes}
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {GEUS_APIKEY}"
+        }
+        body = {"faturas": [atualizacao.requisicao.body for atualizacao in atualizacoes]}
+
+        try:
+            response = cliente_http.post(
+                self.url_lote, endpoint="GEUS atualizar situação (lote)", idempotente=True,
+                headers=headers, json=body
+            )
+        except Exception as e:
+            print(f"❌ Erro no envio em lote: {str(e)} - enviando individualmente")
+            return None
+
+        try:
+            if response.status_code in STATUS_SEM_LOTE:
+                print(f"⚠️ Endpoint em lote indisponível ({response.status_code}) - enviando individualmente")
+                self.url_lote = None
+                return None
+            if response.status_code != 200:
+                print(f"❌ Erro no envio em lote: {response.status_code} - enviando individualmente")
+                return None
+            return _ler_resultados_lote(response, ids)
+        finally:
+            response.close()
+
+    def _enviar_individual(self, atualizacao):
+        """POST individual (thread do pool)"""
+        try:
+            sucesso = atualizacao.requisicao.enviar()
+            return sucesso, None if sucesso else atualizacao.requisicao.ultimo_erro
+        except Exception as e:
+            print(f"❌ Erro ao enviar para API: {str(e)}")
+            return False, str(e)
+
+    def _enviar(self, atualizacoes):
+        """Envia as atualizações (em lote ou em paralelo) e retorna {fatura_id: (sucesso, erro)}"""
+        resultados = {}
+        if self.url_lote:
+            for inicio in range(0, len(atualizacoes), self.tamanho):
+                bloco = atualizacoes[inicio:inicio + self.tamanho]
+                resultados.update(self._enviar_lote(bloco) or {})
+                if not self.url_lote:
+                    break
+
+        restantes = [atualizacao for atualizacao in atualizacoes if atualizacao.fatura_id not in resultados]
+        if restantes:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.paralelas, thread_name_prefix="situacao-geus")
+            for atualizacao, resultado in zip(restantes, self._executor.map(self._enviar_individual, restantes)):
+                resultados[atualizacao.fatura_id] = resultado
+        return resultados
+
+    def _gravar(self, atualizacao, sucesso, erro):
+        """Grava o status da fatura; a que falhou vai para a outbox"""
+        if sucesso:
+            self.db.atualizar_status_fatura(
+                fatura_id=atualizacao.fatura_id,
+                status='sucesso',
+                valor=atualizacao.valor,
+                data_vencimento=atualizacao.data_vencimento,
+                situacao_pagamento=atualizacao.situacao_pagamento,
+                tipo_operacao=atualizacao.tipo_operacao,
+                log_execucao=atualizacao.log_execucao + "Situação confirmada pela API (envio em lote)\n"
+            )
+            return
+
+        mensagem_erro = f"API GEUS recusou a atualização de situação - {erro}"
+        self.db.atualizar_status_fatura(
+            fatura_id=atualizacao.fatura_id,
+            status='erro',
+            mensagem_erro=mensagem_erro,
+            tipo_operacao="erro",
+            log_execucao=atualizacao.log_execucao + mensagem_erro + "\n"
+        )
+        guardar_na_outbox(atualizacao.requisicao, atualizacao.tipo_operacao, {
+            "valor": atualizacao.valor,
+            "data_vencimento": atualizacao.data_vencimento,
+            "situacao_pagamento": atualizacao.situacao_pagamento
+        }, mensagem_erro, db=self.db)
+
+    def descarregar(self):
+        """
+        Envia as atualizações pendentes, grava os status e registra as execuções das UCs
+
+        Returns:
+            dict: {fatura_id: sucesso} das atualizações enviadas
+        """
+        with self._lock:
+            atualizacoes, self._pendentes = self._pendentes, []
+        if not atualizacoes:
+            return {}
+
+        modo = "em lote" if self.url_lote else f"{self.paralelas} em paralelo"
+        print(f"🗂️ Enviando {len(atualizacoes)} atualizações de situação à API GEUS ({modo})")
+        resultados = self._enviar(atualizacoes)
+
+        concluidas = []
+        for atualizacao in atualizacoes:
+            sucesso, erro = resultados[atualizacao.fatura_id]
+            self._gravar(atualizacao, sucesso, erro)
+            with self._lock:
+                if sucesso:
+                    self.confirmados += 1
+                else:
+                    self.falhas += 1
+                contagem = self._ucs[atualizacao.chave_uc]
+                contagem['pendentes'] -= 1
+                contagem['sucesso' if sucesso else 'erro'] += 1
+                if contagem['pendentes'] == 0 and contagem['registro'] is not None:
+                    del self._ucs[atualizacao.chave_uc]
+                    concluidas.append(contagem)
+
+        # Execuções das UCs que só esperavam por este envio
+        for contagem in concluidas:
+            self._registrar_execucao(contagem['registro'], contagem)
+
+        return {fatura_id: resultado[0] for fatura_id, resultado in resultados.items()}
+
+    def fechar(self):
+        """
+        Envia o que estiver pendente, encerra o pool e imprime o resumo
+
+        Returns:
+            dict: {'confirmados', 'falhas'}
+        """
+        atexit.unregister(self.fechar)
+        self.descarregar()
+        if self._executor is not None:
+            # Uma tarefa por thread do pool (a barreira garante isso) fecha a sessão HTTP dela
+            barreira = threading.Barrier(self.paralelas)
+
+            def fechar_sessao_thread():
+                cliente_http.fechar_sessao()
+                try:
+                    barreira.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    pass
+
+            for _ in range(self.paralelas):
+                self._executor.submit(fechar_sessao_thread)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        if self.confirmados or self.falhas:
+            print(f"🗂️ Atualizações de situação: {self.confirmados} confirmadas, {self.falhas} falhas")
+        return {'confirmados': self.confirmados, 'falhas': self.falhas}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.fechar()
+        return False
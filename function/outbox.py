@@ -0,0 +1,265 @@
+"""
+Outbox dos envios à API GEUS que falharam
+
+Quando o envio de uma fatura falha, a requisição não é descartada: o corpo (sem o
+PDF), as opções da chamada e o PDF (em media/outbox) ficam na tabela
+envios_pendentes. O retentor reenvia com backoff exponencial, sem voltar ao portal
+da Energisa (login, SMS e novo download):
+- enquanto aguarda, a fatura fica com status 'erro' e o robô não a reprocessa
+  (nem com --force)
+- confirmado o envio, a fatura passa a 'sucesso' e sai da outbox
+- esgotadas OUTBOX_MAX_TENTATIVAS, sai da outbox com 'erro' (--force baixa de novo)
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from config import (
+    GEUS_APIKEY, OUTBOX_INTERVALO, OUTBOX_ESPERA_BASE, OUTBOX_ESPERA_MAXIMA, OUTBOX_MAX_TENTATIVAS
+)
+from database import DatabaseManager, fechar_conexoes_thread
+from function import cliente_http
+
+DIRETORIO_OUTBOX = "media/outbox"
+
+# Tempo em que um envio reservado para uma tentativa não é pego por outro processo
+RESERVA_SEGUNDOS = 600
+
+
+def calcular_espera(tentativas):
+    """
+    Espera antes da próxima tentativa: OUTBOX_ESPERA_BASE * 2^tentativas (até OUTBOX_ESPERA_MAXIMA), com jitter
+
+    Args:
+        tentativas (int): Tentativas já feitas pela outbox
+
+    Returns:
+        float: Espera em segundos
+    """
+    limite = min(OUTBOX_ESPERA_MAXIMA, OUTBOX_ESPERA_BASE * (2 ** tentativas))
+    return random.uniform(limite / 2, limite)
+
+
+def _gravar_pdf(fatura_id, conteudo):
+    """Grava o PDF em media/outbox de forma atômica e retorna o caminho"""
+    os.makedirs(DIRETORIO_OUTBOX, exist_ok=True)
+    caminho = os.path.join(DIRETORIO_OUTBOX, f"{fatura_id}.pdf")
+
+    descritor, caminho_temporario = tempfile.mkstemp(dir=DIRETORIO_OUTBOX, prefix=".tmp_", suffix=".pdf")
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            arquivo.write(conteudo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(caminho_temporario, caminho)
+    except BaseException:
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+        raise
+    return caminho
+
+
+def _remover_pdf(caminho):
+    """Remove o PDF guardado de um envio que saiu da outbox"""
+    if caminho and os.path.exists(caminho):
+        os.remove(caminho)
+
+
+def guardar_na_outbox(requisicao, tipo_operacao, dados_fatura, erro, db=None):
+    """
+    Guarda um envio que falhou para ser repetido pelo retentor
+
+    Args:
+        requisicao (RequisicaoGeus): Requisição que falhou (o ID da fatura vem do corpo)
+        tipo_operacao (str): Tipo de operação gravado quando o envio for confirmado
+        dados_fatura (dict): Dados extraídos do card (valor, vencimento, situação)
+        erro (str): Motivo da falha
+        db (DatabaseManager): Gerenciador do banco (padrão: um novo)
+
+    Returns:
+        bool: True se o envio foi guardado
+    """
+    db = db or DatabaseManager()
+    fatura_id = requisicao.body.get("id")
+
+    try:
+        caminho_pdf = _gravar_pdf(fatura_id, requisicao.pdf) if requisicao.pdf is not None else None
+        espera = calcular_espera(0)
+        guardado = db.registrar_envio_outbox({
+            'fatura_id': fatura_id,
+            'url': requisicao.url,
+            'corpo': json.dumps(requisicao.body, ensure_ascii=False),
+            'opcoes': json.dumps(requisicao.opcoes),
+            'caminho_pdf': caminho_pdf,
+            'tipo_operacao': tipo_operacao,
+            'valor': dados_fatura.get("valor"),
+            'data_vencimento': dados_fatura.get("data_vencimento"),
+            'situacao_pagamento': dados_fatura.get("situacao_pagamento"),
+            'proxima_tentativa': datetime.now() + timedelta(seconds=espera),
+            'ultimo_erro': erro
+        })
+    except Exception as e:
+        print(f"   ❌ Erro ao guardar envio da fatura ID {fatura_id} na outbox: {str(e)}")
+        return False
+
+    if guardado:
+        print(f"   📮 Envio da fatura ID {fatura_id} guardado na outbox - nova tentativa em {espera:.0f}s")
+    return guardado
+
+
+def _requisicao_da_outbox(envio):
+    """Monta a RequisicaoGeus de um envio da outbox (cabeçalhos atuais do .env)"""
+    from function.fila_envio import RequisicaoGeus
+
+    pdf = None
+    if envio['caminho_pdf']:
+        with open(envio['caminho_pdf'], 'rb') as arquivo:
+            pdf = arquivo.read()
+
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {GEUS_APIKEY}"
+    }
+    return RequisicaoGeus(
+        envio['url'], headers, json.loads(envio['corpo']),
+        f"Envio da fatura ID {envio['fatura_id']} pela outbox confirmado pela API",
+        pdf=pdf, **json.loads(envio['opcoes'] or "{}")
+    )
+
+
+def _tentar_envio(db, envio):
+    """
+    Faz uma tentativa de um envio da outbox e grava o resultado
+
+    Returns:
+        str: 'enviados', 'reagendados', 'esgotados' ou None se outro processo reservou o envio
+    """
+    fatura_id = envio['fatura_id']
+    reservado_ate = datetime.now() + timedelta(seconds=RESERVA_SEGUNDOS)
+    if not db.reservar_envio_outbox(fatura_id, envio['proxima_tentativa'], reservado_ate):
+        return None
+
+    tentativas = envio['tentativas'] + 1
+    try:
+        requisicao = _requisicao_da_outbox(envio)
+        sucesso = requisicao.enviar()
+        erro = None if sucesso else requisicao.ultimo_erro
+    except Exception as e:
+        sucesso, erro = False, str(e)
+
+    if sucesso:
+        log = f"Envio confirmado pela API na tentativa {tentativas} da outbox\n"
+        if db.concluir_envio_outbox(
+            fatura_id, 'sucesso',
+            valor=envio['valor'],
+            data_vencimento=envio['data_vencimento'],
+            situacao_pagamento=envio['situacao_pagamento'],
+            tipo_operacao=envio['tipo_operacao'],
+            log_execucao=log,
+            hash_pdf=requisicao.hash_pdf
+        ):
+            _remover_pdf(envio['caminho_pdf'])
+        return 'enviados'
+
+    if tentativas >= OUTBOX_MAX_TENTATIVAS:
+        mensagem = f"Envio à API falhou após {tentativas} tentativas da outbox: {erro}"
+        print(f"   ❌ Fatura ID {fatura_id}: {mensagem}")
+        if db.concluir_envio_outbox(
+            fatura_id, 'erro',
+            mensagem_erro=mensagem,
+            tipo_operacao='erro',
+            log_execucao=mensagem + "\n"
+        ):
+            _remover_pdf(envio['caminho_pdf'])
+        return 'esgotados'
+
+    espera = calcular_espera(tentativas)
+    db.reagendar_envio_outbox(fatura_id, tentativas, datetime.now() + timedelta(seconds=espera), erro)
+    print(f"   📮 Fatura ID {fatura_id}: tentativa {tentativas}/{OUTBOX_MAX_TENTATIVAS} da outbox falhou - próxima em {espera:.0f}s")
+    return 'reagendados'
+
+
+def drenar_outbox(db=None, limite=None):
+    """
+    Tenta uma vez cada envio da outbox cuja próxima tentativa já venceu
+
+    Args:
+        db (DatabaseManager): Gerenciador do banco (padrão: um novo)
+        limite (int): Quantidade máxima de envios nesta passada
+
+    Returns:
+        dict: {'enviados', 'reagendados', 'esgotados'}
+    """
+    db = db or DatabaseManager()
+    resumo = {'enviados': 0, 'reagendados': 0, 'esgotados': 0}
+
+    for envio in db.obter_envios_outbox(vencidos_ate=datetime.now(), limite=limite):
+        resultado = _tentar_envio(db, envio)
+        if resultado:
+            resumo[resultado] += 1
+
+    if any(resumo.values()):
+        print(
+            f"📮 Outbox: {resumo['enviados']} enviados, {resumo['reagendados']} reagendados, "
+            f"{resumo['esgotados']} esgotados"
+        )
+    return resumo
+
+
+class RetentorOutbox:
+    """
+    Thread que drena a outbox a cada OUTBOX_INTERVALO segundos
+
+    Uso:
+        with RetentorOutbox():
+            processar_todas_geradoras()
+    """
+
+    def __init__(self, intervalo_segundos=None, db=None):
+        """
+        Args:
+            intervalo_segundos (float): Tempo entre passadas (padrão: OUTBOX_INTERVALO do .env)
+            db (DatabaseManager): Gerenciador do banco (padrão: um novo)
+        """
+        self.intervalo_segundos = intervalo_segundos or OUTBOX_INTERVALO
+        self.db = db or DatabaseManager()
+        self._acordar = threading.Event()
+        self._encerrado = False
+        self._thread = threading.Thread(target=self._loop, name="retentor-outbox", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        """Drena a outbox, espera o intervalo (ou um pedido de acordar) e repete"""
+        try:
+            while not self._encerrado:
+                try:
+                    drenar_outbox(self.db)
+                except Exception as e:
+                    print(f"❌ Erro ao drenar outbox: {str(e)}")
+                self._acordar.wait(self.intervalo_segundos)
+                self._acordar.clear()
+        finally:
+            cliente_http.fechar_sessao()
+            fechar_conexoes_thread()
+
+    def acordar(self):
+        """Antecipa a próxima passada"""
+        self._acordar.set()
+
+    def parar(self):
+        """Encerra a thread (a passada em andamento termina antes)"""
+        if not self._encerrado:
+            self._encerrado = True
+            self._acordar.set()
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.parar()
+        return False
@@ -0,0 +1,241 @@
+"""
+Snapshots das faturas organizadas por geradora (saída da busca, entrada do robô)
+
+Quando a busca e o processamento rodam no mesmo processo, os dados organizados
+(SnapshotGeradora) ficam em memória e são entregues direto ao robô, sem regravar
+e reler JSON.
+
+A cópia em disco (media/json) é opcional e serve para retomar uma execução:
+- gravada de forma atômica (arquivo temporário + os.replace), nunca fica pela metade
+- JSON compacto, sem indentação
+- comprimida com gzip (.json.gz) se SNAPSHOT_COMPRIMIDO estiver ativo
+- só é lida quando o snapshot da geradora não está em memória
+"""
+
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+
+from config import SNAPSHOT_DISCO, SNAPSHOT_COMPRIMIDO
+from function.fatura_task import SnapshotGeradora
+
+DIRETORIO_SNAPSHOTS = "media/json"
+
+EXTENSAO_JSON = ".json"
+EXTENSAO_COMPRIMIDA = ".json.gz"
+
+_lock = threading.Lock()
+_em_memoria = {}
+_instantes = {}
+
+
+def _nome_base(cnpj_geradora):
+    """Apenas os números do CNPJ (nome do arquivo e chave em memória)"""
+    return ''.join(filter(str.isdigit, cnpj_geradora))
+
+
+def caminho_snapshot(cnpj_geradora, diretorio=DIRETORIO_SNAPSHOTS, comprimido=None):
+    """
+    Retorna o caminho do snapshot de uma geradora no disco
+
+    Args:
+        cnpj_geradora (str): CNPJ da geradora
+        diretorio (str): Diretório dos snapshots
+        comprimido (bool): Caminho da versão gzip (padrão: SNAPSHOT_COMPRIMIDO do .env)
+
+    Returns:
+        str: Caminho do arquivo (CNPJ numérico + .json ou .json.gz)
+    """
+    if comprimido is None:
+        comprimido = SNAPSHOT_COMPRIMIDO
+    extensao = EXTENSAO_COMPRIMIDA if comprimido else EXTENSAO_JSON
+    return os.path.join(diretorio, _nome_base(cnpj_geradora) + extensao)
+
+
+def localizar_snapshot_disco(cnpj_geradora, diretorio=DIRETORIO_SNAPSHOTS):
+    """
+    Localiza o snapshot de uma geradora no disco (no formato configurado ou no outro)
+
+    Returns:
+        str: Caminho do arquivo ou None se não existir
+    """
+    for comprimido in (SNAPSHOT_COMPRIMIDO, not SNAPSHOT_COMPRIMIDO):
+        caminho = caminho_snapshot(cnpj_geradora, diretorio, comprimido)
+        if os.path.exists(caminho):
+            return caminho
+    return None
+
+
+def snapshot_disponivel(cnpj_geradora, diretorio=DIRETORIO_SNAPSHOTS):
+    """
+    True se o snapshot da geradora está em memória ou no disco
+
+    Com SNAPSHOT_DISCO desativado a cópia em disco não conta: é de uma execução
+    anterior e não acompanha mais as buscas na API.
+    """
+    with _lock:
+        if _nome_base(cnpj_geradora) in _em_memoria:
+            return True
+    return SNAPSHOT_DISCO and localizar_snapshot_disco(cnpj_geradora, diretorio) is not None
+
+
+def ler_arquivo_snapshot(caminho):
+    """
+    Lê um snapshot do disco (JSON puro ou gzip, pela extensão)
+
+    Args:
+        caminho (str): Caminho do arquivo
+
+    Returns:
+        dict: Dados da geradora {'geradora', 'lista_ucs'}
+    """
+    abrir = gzip.open if caminho.endswith(".gz") else open
+    with abrir(caminho, "rt", encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def gravar_arquivo_snapshot(caminho, snapshot):
+    """
+    Grava um snapshot de forma atômica: arquivo temporário no mesmo diretório + os.replace
+
+    Args:
+        caminho (str): Caminho final do arquivo (.json ou .json.gz)
+        snapshot (SnapshotGeradora): Faturas da geradora
+    """
+    diretorio = os.path.dirname(caminho) or "."
+    os.makedirs(diretorio, exist_ok=True)
+
+    descritor, caminho_temporario = tempfile.mkstemp(
+        dir=diretorio, prefix=".tmp_", suffix=os.path.basename(caminho)
+    )
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            if caminho.endswith(".gz"):
+                with gzip.GzipFile(fileobj=arquivo, mode="wb", compresslevel=6) as comprimido:
+                    snapshot.gravar_json(comprimido)
+            else:
+                snapshot.gravar_json(arquivo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(caminho_temporario, caminho)
+    except BaseException:
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+        raise
+
+
+def guardar_snapshot(cnpj_geradora, snapshot, instante=None):
+    """
+    Mantém o snapshot da geradora em memória para o robô (sem tocar no disco)
+
+    Args:
+        cnpj_geradora (str): CNPJ da geradora
+        snapshot (SnapshotGeradora): Faturas da geradora
+        instante (float): Quando os dados vieram da API, em time.time() (padrão: agora)
+    """
+    with _lock:
+        _em_memoria[_nome_base(cnpj_geradora)] = snapshot
+        _instantes[_nome_base(cnpj_geradora)] = instante or time.time()
+
+
+def salvar_snapshot(cnpj_geradora, snapshot, diretorio=DIRETORIO_SNAPSHOTS, gravar_disco=None):
+    """
+    Guarda o snapshot em memória e, se configurado, grava a cópia durável no disco
+
+    Args:
+        cnpj_geradora (str): CNPJ da geradora
+        snapshot (SnapshotGeradora): Faturas da geradora
+        diretorio (str): Diretório dos snapshots
+        gravar_disco (bool): Grava a cópia em disco (padrão: SNAPSHOT_DISCO do .env)
+
+    Returns:
+        str: Caminho do arquivo gravado ou None se só ficou em memória
+    """
+    guardar_snapshot(cnpj_geradora, snapshot)
+
+    if gravar_disco is None:
+        gravar_disco = SNAPSHOT_DISCO
+    if not gravar_disco:
+        return None
+
+    caminho = caminho_snapshot(cnpj_geradora, diretorio)
+    gravar_arquivo_snapshot(caminho, snapshot)
+
+    # Remover a cópia no outro formato para não ser lida por engano depois
+    outro_formato = caminho_snapshot(cnpj_geradora, diretorio, not SNAPSHOT_COMPRIMIDO)
+    if os.path.exists(outro_formato):
+        os.remove(outro_formato)
+
+    return caminho
+
+
+def carregar_snapshot(cnpj_geradora, diretorio=DIRETORIO_SNAPSHOTS):
+    """
+    Retorna o snapshot da geradora: da memória ou, ao retomar uma execução, do disco
+
+    Args:
+        cnpj_geradora (str): CNPJ da geradora
+        diretorio (str): Diretório dos snapshots
+
+    Returns:
+        SnapshotGeradora: Faturas da geradora ou None se não encontrado
+    """
+    chave = _nome_base(cnpj_geradora)
+    with _lock:
+        snapshot = _em_memoria.get(chave)
+    if snapshot is not None:
+        return snapshot
+
+    caminho = localizar_snapshot_disco(cnpj_geradora, diretorio)
+    if caminho is None:
+        print(f"❌ Snapshot não encontrado em memória nem no disco: {caminho_snapshot(cnpj_geradora, diretorio)}")
+        return None
+
+    try:
+        snapshot = SnapshotGeradora.de_dados(ler_arquivo_snapshot(caminho))
+    except Exception as e:
+        print(f"❌ Erro ao carregar snapshot {caminho}: {str(e)}")
+        return None
+
+    print(f"📂 Snapshot carregado do disco: {caminho}")
+    guardar_snapshot(cnpj_geradora, snapshot, instante=os.path.getmtime(caminho))
+    return snapshot
+
+
+def idade_snapshot(cnpj_geradora):
+    """
+    Tempo desde que o snapshot em memória da geradora veio da API
+
+    Returns:
+        float: Idade em segundos ou None se não está em memória
+    """
+    with _lock:
+        instante = _instantes.get(_nome_base(cnpj_geradora))
+    return None if instante is None else max(0.0, time.time() - instante)
+
+
+def formatar_idade(segundos):
+    """Idade legível para os logs: '45s', '12 min', '3.5 h'"""
+    if segundos < 60:
+        return f"{segundos:.0f}s"
+    if segundos < 3600:
+        return f"{segundos / 60:.0f} min"
+    return f"{segundos / 3600:.1f} h"
+
+
+def descartar_snapshots(manter=()):
+    """
+    Esvazia os snapshots em memória (a próxima leitura vem do disco)
+
+    Args:
+        manter (iterable): CNPJs das geradoras cujo snapshot continua em memória
+    """
+    chaves_mantidas = {_nome_base(cnpj_geradora) for cnpj_geradora in manter}
+    with _lock:
+        for chave in list(_em_memoria):
+            if chave not in chaves_mantidas:
+                del _em_memoria[chave]
+                _instantes.pop(chave, None)
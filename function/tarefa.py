@@ -1,16 +1,54 @@
-﻿import requests
-import base64
+﻿import time
 from datetime import datetime
 from playwright.sync_api import sync_playwright
 from config import DEBUG_MODE, API_CRIAR_FATURA_DEV, API_CRIAR_FATURA_PROD, API_ATUALIZAR_FATURA_DEV , API_ATUALIZAR_FATURA_PROD, GEUS_APIKEY
-from database import DatabaseManager
+from config import DB_WRITE_BEHIND, DB_WRITE_BEHIND_MAX_PENDENTES, DB_WRITE_BEHIND_INTERVALO, ENVIO_ASSINCRONO, SITUACAO_EM_LOTE
+from config import DOWNLOAD_PRAZO, DOWNLOAD_MAX_TENTATIVAS
+from database import DatabaseManager, BufferEscrita
+from function.fatura_task import SnapshotGeradora
+from function.fila_envio import FilaEnvio, RequisicaoGeus
+from function.lote_situacao import LoteSituacao
+from function.cards_fatura import IndiceCards
+from function.download_fatura import (
+    MENSAGEM_ERRO_DOWNLOAD, aguardar_download, calcular_espera_retry, registrar_download
+)
+from function.outbox import guardar_na_outbox
 
 debug_mode = DEBUG_MODE
 
+# Prazo de leitura maior para o envio da fatura completa (PDF no corpo)
+TIMEOUT_ENVIO_FATURA = 120
+
+def ler_download(download):
+    """
+    Lê o PDF baixado pelo Playwright direto para a memória
+    
+    O arquivo que o próprio Playwright gravou é lido uma única vez (sem salvar
+    outra cópia em disco nem converter para base64) e removido em seguida.
+    
+    Args:
+        download: Download do Playwright
+    
+    Returns:
+        bytes: Conteúdo do PDF
+    """
+    with open(download.path(), 'rb') as arquivo:
+        conteudo = arquivo.read()
+    
+    try:
+        download.delete()
+    except:
+        pass
+    
+    return conteudo
+
 def fazer_download_com_retry(page, download_button, nova_uc, mes_referencia, primeira_fatura=False):
     """
     Função auxiliar para fazer download da fatura com retry em caso de erro de modal
     
+    Cada tentativa espera o que vier primeiro: o download, o modal de erro ou DOWNLOAD_PRAZO
+    (function/download_fatura.py). O tempo do clique até os bytes do PDF é acumulado por UC.
+    
     Args:
         page: Instância da página do Playwright
         download_button: Elemento do botão de download
@@ -19,59 +57,36 @@ def fazer_download_com_retry(page, download_button, nova_uc, mes_referencia, pri
         primeira_fatura (bool): Parâmetro mantido para compatibilidade (não usado)
     
     Returns:
-        str: Arquivo em base64 se sucesso, None se falha
+        bytes: Conteúdo do PDF se sucesso, None se falha
     """
     from function.notificar_gestor import fatura_nao_baixada
     
-    max_tentativas = 5
+    max_tentativas = DOWNLOAD_MAX_TENTATIVAS
     tentativa_atual = 0
     download_sucesso = False
-    arquivo_base64 = None
+    conteudo_pdf = None
+    segundos_download = 0.0
     
     while tentativa_atual < max_tentativas and not download_sucesso:
         tentativa_atual += 1
         print(f"Tentativa {tentativa_atual} de {max_tentativas} para download da fatura")
         
         try:
-            # Clicar no botão de download
-            download_button.click()
-            
-            # Aguardar o download ou modal de erro com verificação periódica
-            download = None
-            modal_detectado = False
-            tempo_espera = 0
-            max_tempo_espera = 30000  # 30 segundos
-            intervalo_verificacao = 1000  # 1 segundo
+            # Clicar e esperar o download, o modal de erro ou o prazo (o que vier primeiro)
+            inicio = time.monotonic()
+            motivo, download = aguardar_download(page, download_button, DOWNLOAD_PRAZO)
             
-            while tempo_espera < max_tempo_espera and not download and not modal_detectado:
-                try:
-                    # Tentar capturar download com timeout curto
-                    with page.expect_download(timeout=intervalo_verificacao) as download_info:
-                        pass
-                    download = download_info.value
-                    break
-                except:
-                    # Verificar se modal de erro apareceu
-                    try:
-                        modal_erro = page.locator('text="Houve um erro na sua tentativa de download"')
-                        if modal_erro.is_visible():
-                            modal_detectado = True
-                            print("🔍 Modal de erro detectado durante o download!")
-                            break
-                    except:
-                        pass  # Continuar verificando
-                    
-                    tempo_espera += intervalo_verificacao
-            
-            if modal_detectado:
+            if motivo == "modal":
+                print("🔍 Modal de erro detectado durante o download!")
+                
                 # Fechar modal de erro
                 print("🔍 Tentando fechar modal de erro...")
+                modal_erro = page.locator(f'text="{MENSAGEM_ERRO_DOWNLOAD}"')
                 botao_ok = page.locator('button:has-text("OK")')
                 
                 if botao_ok.is_visible():
                     botao_ok.click()
                     print("✅ Modal fechado com sucesso")
-                    page.wait_for_timeout(1000)
                 else:
                     # Tentar outros seletores comuns para botão OK
                     botoes_alternativos = [
@@ -87,70 +102,91 @@ def fazer_download_com_retry(page, download_button, nova_uc, mes_referencia, pri
                             if botao_alt.is_visible():
                                 botao_alt.click()
                                 print(f"✅ Modal fechado usando seletor alternativo: {seletor}")
-                                page.wait_for_timeout(1000)
                                 break
                         except:
                             continue
                     else:
                         print("⚠️ Não foi possível encontrar botão OK para fechar modal")
                 
+                # Aguardar o modal sumir (em vez de um tempo fixo)
+                try:
+                    modal_erro.first.wait_for(state="hidden", timeout=5000)
+                except:
+                    pass
+                
                 # Continuar para próxima tentativa
                 raise Exception("Modal de erro detectado durante download")
             
             if not download:
-                print(f"⚠️ Download não detectado após {max_tempo_espera/1000} segundos")
+                print(f"⚠️ Download não detectado após {DOWNLOAD_PRAZO:.0f} segundos")
                 print("🔄 Fazendo refresh da página para tentar novamente...")
-                page.reload()
-                page.wait_for_timeout(3000)  # Aguardar página carregar
-                raise Exception(f"Timeout de {max_tempo_espera/1000} segundos excedido - página recarregada")
-            
-            # Salvar arquivo temporariamente e converter para base64
-            temp_path = f"temp_fatura_{nova_uc.replace('/', '_')}_{mes_referencia.replace('/', '_')}.pdf"
-            download.save_as(temp_path)
-            
-            # Converter para base64
-            with open(temp_path, 'rb') as file:
-                arquivo_base64 = base64.b64encode(file.read()).decode('utf-8')
+                page.reload(wait_until="load")
+                
+                # Aguardar os cards voltarem (em vez de um tempo fixo)
+                try:
+                    page.locator('.card-billing__date').first.wait_for(state="visible", timeout=15000)
+                except:
+                    pass
+                raise Exception(f"Timeout de {DOWNLOAD_PRAZO:.0f} segundos excedido - página recarregada")
             
-            # Remover arquivo temporário
-            import os
-            os.remove(temp_path)
+            # Ler o PDF para a memória (o base64 é gerado em blocos durante o envio)
+            conteudo_pdf = ler_download(download)
+            segundos_download = time.monotonic() - inicio
             
             download_sucesso = True
-            print(f"✅ Download realizado com sucesso na tentativa {tentativa_atual}")
+            print(f"✅ Download realizado com sucesso na tentativa {tentativa_atual} ({segundos_download:.1f}s do clique ao PDF)")
             
         except Exception as download_error:
             print(f"❌ Erro no download (tentativa {tentativa_atual}): {str(download_error)}")
             
-            # Se não é a última tentativa, aguardar antes da próxima
+            # Se não é a última tentativa, aguardar antes da próxima (espera cresce a cada falha)
             if tentativa_atual < max_tentativas:
-                print(f"⏳ Aguardando antes da próxima tentativa...")
-                page.wait_for_timeout(3000)
+                espera = calcular_espera_retry(tentativa_atual)
+                print(f"⏳ Aguardando {espera:.1f}s antes da próxima tentativa...")
+                page.wait_for_timeout(espera * 1000)
+    
+    registrar_download(nova_uc, segundos_download, tentativa_atual, download_sucesso)
     
     # Verificar se o download foi bem-sucedido
-    if not download_sucesso or arquivo_base64 is None:
+    if not download_sucesso or conteudo_pdf is None:
         print(f"❌ Falha no download após {max_tentativas} tentativas")
         print("📞 Chamando função de notificação do gestor...")
         fatura_nao_baixada()
         return None
     
-    return arquivo_base64
+    return conteudo_pdf
 
-def processar_faturas_do_json(json_data, page, force=False):
+def processar_faturas_do_json(json_data, page, force=False, ucs=None, fila_envio=None, lote_situacao=None, captura_faturas=None):
     """
-    Processa as faturas do JSON e chama as funções apropriadas
+    Processa as faturas do snapshot e chama as funções apropriadas
     
     Args:
-        json_data (dict): Dados do JSON com as faturas organizadas
+        json_data (SnapshotGeradora): Faturas organizadas (aceita também o dict {'geradora', 'lista_ucs'})
         page: Instância da página do Playwright
         force (bool): Se True, reprocessa faturas com erro
+        ucs (list): Processa apenas estas UCs (padrão: todas)
+        fila_envio (FilaEnvio): Fila de envio à API compartilhada entre chamadas (padrão: uma
+                                própria se ENVIO_ASSINCRONO, encerrada ao final; senão envio direto)
+        lote_situacao (LoteSituacao): Lote das atualizações só de situação compartilhado entre
+                                      chamadas (padrão: um próprio se SITUACAO_EM_LOTE, enviado ao final)
+        captura_faturas (CapturaFaturas): Respostas JSON do portal escutadas desde antes de abrir
+                                          /faturas (padrão: cards lidos só da página)
     """
     import io
     import sys
+    import threading
+    
+    escritor = None
+    fila_propria = None
+    lote_proprio = None
+    indice_cards = None
     
     try:
-        geradora = json_data.get("geradora")
-        lista_ucs = json_data.get("lista_ucs", {})
+        if isinstance(json_data, dict):
+            json_data = SnapshotGeradora.de_dados(json_data)
+        
+        geradora = json_data.geradora
+        lista_ucs = list(json_data.itens_ucs(ucs))
         
         print(f"Processando geradora: {geradora}")
         print(f"Total de UCs: {len(lista_ucs)}")
@@ -159,8 +195,36 @@ def processar_faturas_do_json(json_data, page, force=False):
         resultados = []
         primeira_fatura_processada = False
         
-        for nova_uc, faturas in lista_ucs.items():
+        # Status de todas as faturas do JSON em uma única consulta
+        status_faturas = db.verificar_status_faturas(
+            (fatura.id for _, faturas in lista_ucs for fatura in faturas),
+            force=force
+        )
+        
+        # Faturas com envio aguardando na outbox: o retentor reenvia, não precisa voltar ao portal
+        ids_outbox = db.obter_ids_outbox()
+        
+        # Gravações de status: direto no banco ou em lotes (DB_WRITE_BEHIND)
+        if DB_WRITE_BEHIND:
+            escritor = BufferEscrita(db, max_pendentes=DB_WRITE_BEHIND_MAX_PENDENTES, intervalo_segundos=DB_WRITE_BEHIND_INTERVALO)
+        else:
+            escritor = db
+        
+        # Envios à API em segundo plano: o status só é gravado quando a API confirmar
+        if fila_envio is None and ENVIO_ASSINCRONO:
+            fila_propria = fila_envio = FilaEnvio(db=db)
+        
+        # Atualizações só de situação acumuladas e enviadas juntas (endpoint em lote ou em paralelo)
+        if lote_situacao is None and SITUACAO_EM_LOTE:
+            lote_proprio = lote_situacao = LoteSituacao(db=db, fila_envio=fila_envio)
+        
+        # Cards da página lidos uma vez por UC e reaproveitados pelas faturas dela
+        # (descartados também se a página navegar ou recarregar)
+        indice_cards = IndiceCards(page, captura=captura_faturas)
+        
+        for nova_uc, faturas in lista_ucs:
             print(f"\n--- Processando UC: {nova_uc} ---")
+            indice_cards.invalidar()
             
             # Estatísticas da UC
             uc_inicio = datetime.now()
@@ -168,33 +232,50 @@ def processar_faturas_do_json(json_data, page, force=False):
             faturas_sucesso_uc = 0
             faturas_erro_uc = 0
             faturas_puladas_uc = 0
+            faturas_enviando_uc = 0
             
             for fatura in faturas:
-                fatura_id = fatura.get("id")
-                mes_referencia = fatura.get("data_referencia")
-                tarefa = fatura.get("tarefa")
+                fatura_id = fatura.id
+                mes_referencia = fatura.mes_referencia
+                tarefa = fatura.tarefa
                 
                 # Capturar log da execução desta fatura
                 log_buffer = io.StringIO()
                 old_stdout = sys.stdout
                 
                 # Criar um escritor que duplica para console e buffer
+                # (só o que esta thread imprime vai para o log da fatura; as threads de envio vão só para o console)
                 class DualWriter:
-                    def __init__(self, *writers):
-                        self.writers = writers
+                    def __init__(self, console, buffer):
+                        self.console = console
+                        self.buffer = buffer
+                        self.thread = threading.current_thread()
                     def write(self, text):
-                        for writer in self.writers:
-                            writer.write(text)
+                        self.console.write(text)
+                        if threading.current_thread() is self.thread:
+                            self.buffer.write(text)
                     def flush(self):
-                        for writer in self.writers:
-                            writer.flush()
+                        self.console.flush()
+                        self.buffer.flush()
                 
                 sys.stdout = DualWriter(old_stdout, log_buffer)
                 
                 print(f"Processando fatura ID: {fatura_id}, Mês: {mes_referencia}, Tarefa: {tarefa}")
                 
                 # Verificar status no banco de dados
-                status_db, deve_processar = db.verificar_status_fatura(fatura_id, force=force)
+                status_db, deve_processar = status_faturas[fatura_id]
+                
+                # Envio ainda em andamento (ex.: UC repetida após erro): não baixar e enviar de novo
+                if deve_processar and (
+                    (fila_envio is not None and fila_envio.em_andamento(fatura_id))
+                    or (lote_situacao is not None and lote_situacao.em_andamento(fatura_id))
+                ):
+                    status_db, deve_processar = 'enviando', False
+                    print(f"   ⏭️ Fatura ID {fatura_id} com envio à API em andamento - pulando")
+                
+                if deve_processar and fatura_id in ids_outbox:
+                    status_db, deve_processar = 'outbox', False
+                    print(f"   ⏭️ Fatura ID {fatura_id} com envio aguardando na outbox - pulando")
                 
                 if not deve_processar:
                     if status_db == 'sucesso':
@@ -225,26 +306,45 @@ def processar_faturas_do_json(json_data, page, force=False):
                 tipo_operacao = None
                 dados_fatura = {}
                 
+                # As funções devolvem a requisição em vez de enviá-la (lote, fila de envio ou envio direto abaixo)
+                envios_adiados = []
+                envio_falho = None
+                
                 try:
                     if tarefa == "fatura_pendente":
-                        resultado, tipo_operacao, dados_fatura = executar_fatura_pendente(nova_uc, mes_referencia, page, fatura_id, eh_primeira_fatura)
+                        hash_pdf_enviado = db.obter_hash_pdf(fatura_id)
+                        resultado, tipo_operacao, dados_fatura = executar_fatura_pendente(nova_uc, mes_referencia, page, fatura_id, eh_primeira_fatura, envios_adiados, hash_pdf_enviado, indice_cards)
                         
                     elif tarefa == "fatura_vencida":
-                        resultado, tipo_operacao, dados_fatura = executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura, eh_primeira_fatura)
+                        hash_pdf_enviado = db.obter_hash_pdf(fatura_id)
+                        resultado, tipo_operacao, dados_fatura = executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura, eh_primeira_fatura, envios_adiados, hash_pdf_enviado, indice_cards)
                         
                     elif tarefa == "fatura_a_vencer":
                         # Usar a função de fatura vencida para faturas a vencer (com verificação de mudanças)
-                        resultado, tipo_operacao, dados_fatura = executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura, eh_primeira_fatura)
+                        hash_pdf_enviado = db.obter_hash_pdf(fatura_id)
+                        resultado, tipo_operacao, dados_fatura = executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura, eh_primeira_fatura, envios_adiados, hash_pdf_enviado, indice_cards)
                     
                     elif tarefa == "fatura_agendado":
                         # Processar fatura agendada - verificar se foi paga
-                        resultado, tipo_operacao, dados_fatura = executar_fatura_agendada(nova_uc, mes_referencia, page, fatura_id, fatura, eh_primeira_fatura)
+                        resultado, tipo_operacao, dados_fatura = executar_fatura_agendada(nova_uc, mes_referencia, page, fatura_id, fatura, eh_primeira_fatura, envios_adiados, indice_cards)
                     
                     else:
                         print(f"⚠️ Tarefa desconhecida: {tarefa}")
                         resultado = False
                         tipo_operacao = "erro"
                     
+                    # Atualização só de situação vai para o lote; as demais requisições vão para
+                    # a fila de envio ou, sem fila, são enviadas agora
+                    requisicao = envios_adiados[0] if resultado and envios_adiados else None
+                    em_lote = requisicao is not None and lote_situacao is not None and requisicao.apenas_situacao
+                    if requisicao is not None and not em_lote and fila_envio is None:
+                        erro_envio = enviar_requisicao(requisicao)
+                        if erro_envio is not None:
+                            # Vai para a outbox só depois do status 'erro' gravado (abaixo)
+                            envio_falho = (requisicao, tipo_operacao, dados_fatura, erro_envio)
+                            resultado, tipo_operacao = False, "erro"
+                        requisicao = None
+                    
                     # Capturar log antes de restaurar stdout
                     log_execucao = log_buffer.getvalue()
                     
@@ -252,19 +352,45 @@ def processar_faturas_do_json(json_data, page, force=False):
                     sys.stdout = old_stdout
                     
                     # Atualizar status no banco de dados com todos os dados
-                    if resultado:
-                        db.atualizar_status_fatura(
+                    if em_lote:
+                        # Status gravado quando o lote for enviado
+                        lote_situacao.adicionar(
+                            requisicao,
+                            fatura_id=fatura_id,
+                            cnpj_geradora=geradora,
+                            nova_uc=nova_uc,
+                            tipo_operacao=tipo_operacao,
+                            dados_fatura=dados_fatura,
+                            log_execucao=log_execucao
+                        )
+                        faturas_enviando_uc += 1
+                    elif requisicao is not None:
+                        # Status gravado pela fila de envio quando a API confirmar
+                        fila_envio.enfileirar(
+                            requisicao,
+                            fatura_id=fatura_id,
+                            cnpj_geradora=geradora,
+                            nova_uc=nova_uc,
+                            tarefa=tarefa,
+                            tipo_operacao=tipo_operacao,
+                            dados_fatura=dados_fatura,
+                            log_execucao=log_execucao
+                        )
+                        faturas_enviando_uc += 1
+                    elif resultado:
+                        escritor.atualizar_status_fatura(
                             fatura_id=fatura_id,
                             status='sucesso',
                             valor=dados_fatura.get('valor'),
                             data_vencimento=dados_fatura.get('data_vencimento'),
                             situacao_pagamento=dados_fatura.get('situacao_pagamento'),
                             tipo_operacao=tipo_operacao,
-                            log_execucao=log_execucao
+                            log_execucao=log_execucao,
+                            hash_pdf=dados_fatura.get('hash_pdf')
                         )
                         faturas_sucesso_uc += 1
                     else:
-                        db.atualizar_status_fatura(
+                        escritor.atualizar_status_fatura(
                             fatura_id=fatura_id,
                             status='erro',
                             mensagem_erro=f"Falha ao processar {tarefa}",
@@ -272,6 +398,13 @@ def processar_faturas_do_json(json_data, page, force=False):
                             log_execucao=log_execucao
                         )
                         faturas_erro_uc += 1
+                        
+                        if envio_falho is not None:
+                            # Depois do status 'erro' no banco, para a outbox não ser concluída antes dele
+                            # (com DB_WRITE_BEHIND, o 'erro' gravado depois sobrescreveria o 'sucesso' do retentor)
+                            if isinstance(escritor, BufferEscrita):
+                                escritor.descarregar()
+                            guardar_na_outbox(*envio_falho, db=db)
                     
                     resultados.append({
                         "id": fatura_id,
@@ -279,7 +412,8 @@ def processar_faturas_do_json(json_data, page, force=False):
                         "mes": mes_referencia,
                         "tarefa": tarefa,
                         "sucesso": resultado,
-                        "pulada": False
+                        "pulada": False,
+                        "enviando": requisicao is not None
                     })
                     
                 except Exception as e_fatura:
@@ -291,7 +425,7 @@ def processar_faturas_do_json(json_data, page, force=False):
                     # Restaurar stdout
                     sys.stdout = old_stdout
                     
-                    db.atualizar_status_fatura(
+                    escritor.atualizar_status_fatura(
                         fatura_id=fatura_id,
                         status='erro',
                         mensagem_erro=str(e_fatura),
@@ -314,34 +448,155 @@ def processar_faturas_do_json(json_data, page, force=False):
                 if not primeira_fatura_processada:
                     primeira_fatura_processada = True
             
-            # Registrar execução da UC no banco
-            db.registrar_execucao_uc(
-                cnpj_geradora=geradora,
-                nova_uc=nova_uc,
-                total_faturas=total_faturas_uc,
-                faturas_sucesso=faturas_sucesso_uc,
-                faturas_erro=faturas_erro_uc,
-                faturas_puladas=faturas_puladas_uc,
-                data_hora_inicio=uc_inicio
-            )
+            # Registrar execução da UC no banco (com envios em andamento, quando o último terminar)
+            execucao_uc = {
+                'cnpj_geradora': geradora,
+                'nova_uc': nova_uc,
+                'total_faturas': total_faturas_uc,
+                'faturas_sucesso': faturas_sucesso_uc,
+                'faturas_erro': faturas_erro_uc,
+                'faturas_puladas': faturas_puladas_uc,
+                'data_hora_inicio': uc_inicio
+            }
+            adiada = lote_situacao is not None and lote_situacao.adiar_execucao_uc(**execucao_uc)
+            if not adiada:
+                adiada = fila_envio is not None and fila_envio.adiar_execucao_uc(**execucao_uc)
+            if not adiada:
+                escritor.registrar_execucao_uc(**execucao_uc)
+            elif faturas_enviando_uc:
+                print(f"📤 UC {nova_uc}: {faturas_enviando_uc} envios à API em segundo plano")
         
         # Resumo dos resultados
-        sucessos = sum(1 for r in resultados if r.get("sucesso"))
+        enviando = sum(1 for r in resultados if r.get("enviando"))
+        sucessos = sum(1 for r in resultados if r.get("sucesso")) - enviando
         puladas = sum(1 for r in resultados if r.get("pulada"))
         total = len(resultados)
         print(f"\n📊 Resumo do processamento:")
         print(f"Total de faturas: {total}")
         print(f"Processadas com sucesso: {sucessos}")
+        if enviando:
+            print(f"Extraídas e enviando à API: {enviando}")
         print(f"Puladas: {puladas}")
-        print(f"Falhas: {total - sucessos - puladas}")
+        print(f"Falhas: {total - sucessos - enviando - puladas}")
         
         return resultados
         
     except Exception as e:
         print(f"❌ Erro durante processamento do JSON: {str(e)}")
         return []
+    
+    finally:
+        if indice_cards is not None:
+            indice_cards.fechar()
+        
+        # Enviar o lote próprio antes de fechar a fila (a execução da UC pode ser entregue a ela)
+        if lote_proprio is not None:
+            lote_proprio.fechar()
+        
+        # Esperar os envios da fila própria (inclusive após exceção)
+        if fila_propria is not None:
+            fila_propria.fechar()
+        
+        # Gravar no banco o que ainda estiver no buffer (inclusive após exceção)
+        if isinstance(escritor, BufferEscrita):
+            escritor.fechar()
+
+def enviar_ou_adiar(requisicao, tipo_operacao, dados_fatura, envios_adiados=None):
+    """
+    Envia a requisição à API agora ou a deixa para a fila de envio em segundo plano
+    
+    Se o envio direto falhar, a requisição (com o PDF) vai para a outbox e é
+    repetida pelo retentor, sem baixar a fatura de novo.
+    
+    Args:
+        requisicao (RequisicaoGeus): Requisição montada a partir do card
+        tipo_operacao (str): Tipo de operação em caso de sucesso
+        dados_fatura (dict): Dados extraídos do card
+        envios_adiados (list): Se informado, a requisição é acrescentada à lista em vez de enviada
+    
+    Returns:
+        tuple: (sucesso, tipo_operacao, dados_fatura)
+    """
+    if envios_adiados is not None:
+        envios_adiados.append(requisicao)
+        return True, tipo_operacao, dados_fatura
+    
+    erro = enviar_requisicao(requisicao)
+    if erro is None:
+        return True, tipo_operacao, dados_fatura
+    
+    guardar_na_outbox(requisicao, tipo_operacao, dados_fatura, erro)
+    return False, "erro", dados_fatura
+
+def enviar_requisicao(requisicao):
+    """
+    Envia a requisição à API agora
+    
+    Args:
+        requisicao (RequisicaoGeus): Requisição montada a partir do card
+    
+    Returns:
+        str: Motivo da falha ou None se a API confirmou
+    """
+    try:
+        if requisicao.enviar():
+            return None
+        return requisicao.ultimo_erro
+    except Exception as e:
+        print(f"❌ Erro ao enviar para API: {str(e)}")
+        return str(e)
+
+def requisicao_atualizar_situacao(fatura_id, situacao_pagamento, headers):
+    """
+    Monta o POST que atualiza apenas a situação de pagamento (sem PDF)
+    
+    Args:
+        fatura_id (int): ID da fatura
+        situacao_pagamento (str): Situação extraída do card
+        headers (dict): Cabeçalhos da requisição
+    
+    Returns:
+        RequisicaoGeus: Requisição idempotente (pode ser repetida em falha transitória)
+    """
+    if debug_mode:
+        url = API_ATUALIZAR_FATURA_DEV
+    else:
+        url = API_ATUALIZAR_FATURA_PROD
+    
+    body = {
+        "id": fatura_id,
+        "situacao_pagamento": situacao_pagamento
+    }
+    
+    return RequisicaoGeus(
+        url, headers, body, "Situação de pagamento atualizada com sucesso",
+        endpoint="GEUS atualizar situação", idempotente=True
+    )
 
-def executar_fatura_pendente(nova_uc, mes_referencia, page, fatura_id, primeira_fatura=False):
+def dispensar_pdf_ja_enviado(requisicao, tipo_operacao, dados_fatura, fatura_id, headers, hash_pdf_enviado):
+    """
+    Troca o envio completo pela atualização da situação se o PDF é idêntico ao já enviado
+    
+    Args:
+        requisicao (RequisicaoGeus): Requisição de criação com o PDF baixado
+        tipo_operacao (str): Tipo de operação do envio completo
+        dados_fatura (dict): Dados extraídos do card (recebe o hash do PDF)
+        fatura_id (int): ID da fatura
+        headers (dict): Cabeçalhos da requisição
+        hash_pdf_enviado (str): Hash do último PDF confirmado pela API (None se nunca enviado)
+    
+    Returns:
+        tuple: (requisicao, tipo_operacao) a enviar
+    """
+    dados_fatura["hash_pdf"] = requisicao.hash_pdf
+    
+    if not hash_pdf_enviado or requisicao.hash_pdf != hash_pdf_enviado:
+        return requisicao, tipo_operacao
+    
+    print("♻️ PDF idêntico ao já enviado à API - enviando apenas a situação de pagamento")
+    return requisicao_atualizar_situacao(fatura_id, dados_fatura["situacao_pagamento"], headers), "pdf_inalterado"
+
+def executar_fatura_pendente(nova_uc, mes_referencia, page, fatura_id, primeira_fatura=False, envios_adiados=None, hash_pdf_enviado=None, indice_cards=None):
     """
     Executa o processamento de fatura pendente
     
@@ -351,6 +606,10 @@ def executar_fatura_pendente(nova_uc, mes_referencia, page, fatura_id, primeira_
         page: Instância da página do Playwright
         fatura_id (int): ID da fatura do JSON
         primeira_fatura (bool): Se é a primeira fatura da geradora
+        envios_adiados (list): Se informado, o envio à API fica para a fila de envio
+                               (a RequisicaoGeus é acrescentada à lista)
+        hash_pdf_enviado (str): Hash do último PDF confirmado pela API para esta fatura
+        indice_cards (IndiceCards): Cards da página da UC já lidos (padrão: lê a página agora)
     
     Returns:
         tuple: (sucesso, tipo_operacao, dados_fatura)
@@ -362,96 +621,47 @@ def executar_fatura_pendente(nova_uc, mes_referencia, page, fatura_id, primeira_
         mes_busca = mes_referencia
         print(f"Buscando fatura para o mês: {mes_busca}")
         
-        # 2. Listar todos os cards da página usando o seletor preciso "card-billing__date"
-        cards_date = page.locator('.card-billing__date')
-        cards_count = cards_date.count()
-        print(f"Encontrados {cards_count} cards de fatura na página")
+        # 2. Cards da página lidos em uma única chamada (índice compartilhado pelas faturas da UC)
+        if indice_cards is None:
+            indice_cards = IndiceCards(page, acompanhar_navegacao=False)
+        cards = indice_cards.cards()
+        print(f"Encontrados {len(cards)} cards de fatura na página: {', '.join(c.mes_referencia for c in cards)}")
         
-        fatura_encontrada = False
+        # 3. Verificar se existe o card referente ao mês buscado
+        card = indice_cards.buscar(mes_busca)
+        fatura_encontrada = card is not None
         dados_fatura = {}
         
-        # 3. Verificar se existe o card referente ao mês buscado
-        for i in range(cards_count):
-            card_date = cards_date.nth(i)
-            
-            # Extrair mês e ano do card
-            mes_element = card_date.locator('p').first
-            ano_element = card_date.locator('p').last
+        if fatura_encontrada:
+            print(f"✓ Fatura encontrada para {card.mes} {card.ano} (card {card.indice + 1})")
             
-            mes_texto = mes_element.text_content().strip()
-            ano_texto = ano_element.text_content().strip()
+            # Situação de pagamento pela classe CSS do card-billing__top
+            situacao_pagamento = card.situacao_pagamento
+            print(f"Situação de pagamento detectada: {situacao_pagamento}")
             
-            # Converter mês para número
-            meses = {
-                'Janeiro': '01', 'Fevereiro': '02', 'Março': '03', 'Abril': '04',
-                'Maio': '05', 'Junho': '06', 'Julho': '07', 'Agosto': '08',
-                'Setembro': '09', 'Outubro': '10', 'Novembro': '11', 'Dezembro': '12'
-            }
+            # Valor (sem R$) e vencimento no formato AAAA-MM-DD
+            valor = card.valor
+            data_vencimento = card.data_vencimento
             
-            mes_numero = meses.get(mes_texto, '00')
-            mes_card = f"{mes_numero}/{ano_texto}"
+            print(f"Valor: R$ {valor}")
+            print(f"Vencimento: {card.vencimento_texto} -> {data_vencimento}")
             
-            print(f"Card {i+1}: {mes_texto} {ano_texto} ({mes_card})")
+            # Fazer download da fatura com retry
+            download_button = card.botao_download(page)
+            conteudo_pdf = fazer_download_com_retry(page, download_button, nova_uc, mes_referencia, primeira_fatura)
             
-            # Verificar se é o mês que estamos buscando
-            if mes_card == mes_busca:
-                print(f"✓ Fatura encontrada para {mes_texto} {ano_texto}")
-                fatura_encontrada = True
-                
-                # Buscar o card completo que contém todas as informações
-                # Navegar para o elemento pai que contém todo o card da fatura
-                card_completo = card_date.locator('xpath=ancestor::*[contains(@class, "card-billing") or contains(@class, "card")]').first
-                
-                # Verificar situação de pagamento baseada na classe CSS do card-billing__top
-                situacao_element = card_completo.locator('.card-billing__top')
-                situacao_class = situacao_element.get_attribute('class')
-                
-                # Determinar situação de pagamento
-                if 'card-billing__top--green' in situacao_class:
-                    situacao_pagamento = "paga"
-                elif 'card-billing__top--orange' in situacao_class:
-                    situacao_pagamento = "a_vencer"
-                elif 'card-billing__top--red' in situacao_class:
-                    situacao_pagamento = "vencida"
-                else:
-                    situacao_pagamento = "desconhecida"
-                
-                print(f"Situação de pagamento detectada: {situacao_pagamento}")
-                
-                # Extrair valor da fatura (seletor flexível para diferentes tamanhos)
-                valor_element = card_completo.locator('.card-billing__price div[class*="min-w-"]').first
-                valor_texto = valor_element.text_content().strip()
-                valor = valor_texto.replace('R$', '').replace(' ', '').replace(',', '.')
-                
-                # Extrair data de vencimento
-                vencimento_element = card_completo.locator('.font-bold').last
-                vencimento_texto = vencimento_element.text_content().strip()
-                
-                # Converter data de vencimento para formato AAAA-MM-DD
-                dia, mes, ano = vencimento_texto.split('/')
-                data_vencimento = f"{ano}-{mes}-{dia}"
-                
-                print(f"Valor: R$ {valor}")
-                print(f"Vencimento: {vencimento_texto} -> {data_vencimento}")
-                
-                # Fazer download da fatura com retry
-                download_button = card_completo.locator('button[data-pix="false"]')
-                arquivo_base64 = fazer_download_com_retry(page, download_button, nova_uc, mes_referencia, primeira_fatura)
-                
-                if arquivo_base64 is None:
-                    print("❌ Falha no download da fatura após todas as tentativas")
-                    return False, "erro", {}
-                
-                dados_fatura = {
-                    "valor": valor,
-                    "data_vencimento": data_vencimento,
-                    "data_referencia": mes_referencia,
-                    "arquivo_fatura": arquivo_base64,
-                    "nome_arquivo_fatura": f"fatura_{nova_uc}_{mes_referencia}.pdf",
-                    "situacao_pagamento": situacao_pagamento
-                }
-                
-                break
+            if conteudo_pdf is None:
+                print("❌ Falha no download da fatura após todas as tentativas")
+                return False, "erro", {}
+            
+            dados_fatura = {
+                "valor": valor,
+                "data_vencimento": data_vencimento,
+                "data_referencia": mes_referencia,
+                "arquivo_fatura": conteudo_pdf,
+                "nome_arquivo_fatura": f"fatura_{nova_uc}_{mes_referencia}.pdf",
+                "situacao_pagamento": situacao_pagamento
+            }
         
         if not fatura_encontrada:
             print(f"ℹ️ Fatura não localizada para o mês {mes_busca} - situação normal")
@@ -474,7 +684,6 @@ def executar_fatura_pendente(nova_uc, mes_referencia, page, fatura_id, primeira_
             "data_vencimento": dados_fatura["data_vencimento"],
             "data_referencia": dados_fatura["data_referencia"],
             "valor": dados_fatura["valor"],
-            "arquivo_fatura": dados_fatura["arquivo_fatura"],
             "nome_arquivo_fatura": dados_fatura["nome_arquivo_fatura"],
             "data_encontrada": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "situacao_pagamento": dados_fatura["situacao_pagamento"],
@@ -483,23 +692,25 @@ def executar_fatura_pendente(nova_uc, mes_referencia, page, fatura_id, primeira_
             "tipo_gd": None
         }
         
-        print(f"Enviando dados para API: {url}")
-        response = requests.post(url, headers=headers, json=body)
+        # O PDF vai à parte: o corpo é gerado em blocos no envio, sem cópia em base64
+        requisicao = RequisicaoGeus(
+            url, headers, body, "Fatura enviada com sucesso para a API",
+            pdf=dados_fatura["arquivo_fatura"],
+            endpoint="GEUS criar fatura", timeout_leitura=TIMEOUT_ENVIO_FATURA
+        )
+        requisicao, tipo_operacao = dispensar_pdf_ja_enviado(
+            requisicao, "criada", dados_fatura, fatura_id, headers, hash_pdf_enviado
+        )
         
-        if response.status_code == 200:
-            print("✅ Fatura enviada com sucesso para a API")
-            return True, "criada", dados_fatura
-        else:
-            print(f"❌ Erro ao enviar fatura para API: {response.status_code}")
-            print(f"Resposta: {response.text}")
-            return False, "erro", dados_fatura
+        print(f"Enviando dados para API: {requisicao.url}")
+        return enviar_ou_adiar(requisicao, tipo_operacao, dados_fatura, envios_adiados)
             
     except Exception as e:
         print(f"❌ Erro durante processamento da fatura pendente: {str(e)}")
         return False, "erro", {}
 
 
-def executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura_existente=None, primeira_fatura=False):
+def executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura_existente=None, primeira_fatura=False, envios_adiados=None, hash_pdf_enviado=None, indice_cards=None):
     """
     Executa o processamento de fatura vencida
     
@@ -508,8 +719,15 @@ def executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura_exi
         mes_referencia (str): Mês de referência no formato "MM/AAAA"
         page: Instância da página do Playwright
         fatura_id (int): ID da fatura do JSON
-        fatura_existente (dict): Dados da fatura existente para comparação (opcional)
+        fatura_existente (FaturaTask): Dados da fatura existente para comparação (opcional)
         primeira_fatura (bool): Se é a primeira fatura da geradora
+        envios_adiados (list): Se informado, o envio à API fica para a fila de envio
+                               (a RequisicaoGeus é acrescentada à lista)
+        hash_pdf_enviado (str): Hash do último PDF confirmado pela API para esta fatura
+        indice_cards (IndiceCards): Cards da página da UC já lidos (padrão: lê a página agora)
+    
+    Returns:
+        tuple: (sucesso, tipo_operacao, dados_fatura)
     """
     try:
         print(f"Iniciando processamento de fatura vencida para UC: {nova_uc}, Mês: {mes_referencia}")
@@ -518,95 +736,47 @@ def executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura_exi
         mes_busca = mes_referencia
         print(f"Buscando fatura para o mês: {mes_busca}")
         
-        # 2. Listar todos os cards da página usando o seletor preciso "card-billing__date"
-        cards_date = page.locator('.card-billing__date')
-        cards_count = cards_date.count()
-        print(f"Encontrados {cards_count} cards de fatura na página")
+        # 2. Cards da página lidos em uma única chamada (índice compartilhado pelas faturas da UC)
+        if indice_cards is None:
+            indice_cards = IndiceCards(page, acompanhar_navegacao=False)
+        cards = indice_cards.cards()
+        print(f"Encontrados {len(cards)} cards de fatura na página: {', '.join(c.mes_referencia for c in cards)}")
         
-        fatura_encontrada = False
+        # 3. Verificar se existe o card referente ao mês buscado
+        card = indice_cards.buscar(mes_busca)
+        fatura_encontrada = card is not None
         dados_fatura = {}
         
-        # 3. Verificar se existe o card referente ao mês buscado
-        for i in range(cards_count):
-            card_date = cards_date.nth(i)
+        if fatura_encontrada:
+            print(f"✓ Fatura encontrada para {card.mes} {card.ano} (card {card.indice + 1})")
             
-            # Extrair mês e ano do card
-            mes_element = card_date.locator('p').first
-            ano_element = card_date.locator('p').last
+            # Situação de pagamento pela classe CSS do card-billing__top
+            situacao_pagamento = card.situacao_pagamento
+            print(f"Situação de pagamento detectada: {situacao_pagamento}")
             
-            mes_texto = mes_element.text_content().strip()
-            ano_texto = ano_element.text_content().strip()
+            # Valor (sem R$) e vencimento no formato AAAA-MM-DD
+            valor = card.valor
             
-            # Converter mês para número
-            meses = {
-                'Janeiro': '01', 'Fevereiro': '02', 'Março': '03', 'Abril': '04',
-                'Maio': '05', 'Junho': '06', 'Julho': '07', 'Agosto': '08',
-                'Setembro': '09', 'Outubro': '10', 'Novembro': '11', 'Dezembro': '12'
-            }
+            if valor == "0":
+                valor = "0.00"
             
-            mes_numero = meses.get(mes_texto, '00')
-            mes_card = f"{mes_numero}/{ano_texto}"
+            data_vencimento = card.data_vencimento
             
-            print(f"Card {i+1}: {mes_texto} {ano_texto} ({mes_card})")
+            print(f"Valor: R$ {valor}")
+            print(f"Vencimento: {card.vencimento_texto} -> {data_vencimento}")
             
-            # Verificar se é o mês que estamos buscando
-            if mes_card == mes_busca:
-                print(f"✓ Fatura encontrada para {mes_texto} {ano_texto}")
-                fatura_encontrada = True
-                
-                # Buscar o card completo que contém todas as informações
-                # Navegar para o elemento pai que contém todo o card da fatura
-                card_completo = card_date.locator('xpath=ancestor::*[contains(@class, "card-billing") or contains(@class, "card")]').first
-                
-                # Verificar situação de pagamento baseada na classe CSS do card-billing__top
-                situacao_element = card_completo.locator('.card-billing__top')
-                situacao_class = situacao_element.get_attribute('class')
-                
-                # Determinar situação de pagamento
-                if 'card-billing__top--green' in situacao_class:
-                    situacao_pagamento = "paga"
-                elif 'card-billing__top--orange' in situacao_class:
-                    situacao_pagamento = "a_vencer"
-                elif 'card-billing__top--red' in situacao_class:
-                    situacao_pagamento = "vencida"
-                else:
-                    situacao_pagamento = "desconhecida"
-                
-                print(f"Situação de pagamento detectada: {situacao_pagamento}")
-                
-                # Extrair valor da fatura (seletor flexível para diferentes tamanhos)
-                valor_element = card_completo.locator('.card-billing__price div[class*="min-w-"]').first
-                valor_texto = valor_element.text_content().strip()
-                valor = valor_texto.replace('R$', '').replace(' ', '').replace(',', '.')
-
-                if valor == "0":
-                    valor = "0.00"
-                
-                # Extrair data de vencimento
-                vencimento_element = card_completo.locator('.font-bold').last
-                vencimento_texto = vencimento_element.text_content().strip()
-                
-                # Converter data de vencimento para formato AAAA-MM-DD
-                dia, mes, ano = vencimento_texto.split('/')
-                data_vencimento = f"{ano}-{mes}-{dia}"
-                
-                print(f"Valor: R$ {valor}")
-                print(f"Vencimento: {vencimento_texto} -> {data_vencimento}")
-                
-                # Armazenar referência do botão de download para uso posterior
-                download_button = card_completo.locator('button[data-pix="false"]')
-                
-                # Inicializar dados básicos da fatura (sem arquivo ainda)
-                dados_fatura = {
-                    "valor": valor,
-                    "data_vencimento": data_vencimento,
-                    "data_referencia": mes_referencia,
-                    "arquivo_fatura": None,
-                    "nome_arquivo_fatura": f"fatura_{nova_uc}_{mes_referencia}.pdf",
-                    "situacao_pagamento": situacao_pagamento
-                }
-                
-                break
+            # Referência do botão de download para uso posterior (localizado só no clique)
+            download_button = card.botao_download(page)
+            
+            # Inicializar dados básicos da fatura (sem arquivo ainda)
+            dados_fatura = {
+                "valor": valor,
+                "data_vencimento": data_vencimento,
+                "data_referencia": mes_referencia,
+                "arquivo_fatura": None,
+                "nome_arquivo_fatura": f"fatura_{nova_uc}_{mes_referencia}.pdf",
+                "situacao_pagamento": situacao_pagamento
+            }
         
         if not fatura_encontrada:
             print(f"ℹ️ Fatura não localizada para o mês {mes_busca} - situação normal")
@@ -647,14 +817,14 @@ def executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura_exi
         # 5. Fazer download apenas se necessário
         if precisa_download:
             print("📥 Iniciando download da fatura...")
-            arquivo_base64 = fazer_download_com_retry(page, download_button, nova_uc, mes_referencia, primeira_fatura)
+            conteudo_pdf = fazer_download_com_retry(page, download_button, nova_uc, mes_referencia, primeira_fatura)
             
-            if arquivo_base64 is None:
+            if conteudo_pdf is None:
                 print("❌ Falha no download da fatura após todas as tentativas")
                 return False, "erro", dados_fatura
             
             # Atualizar dados da fatura com o arquivo
-            dados_fatura["arquivo_fatura"] = arquivo_base64
+            dados_fatura["arquivo_fatura"] = conteudo_pdf
             print("✅ Download concluído com sucesso")
         else:
             print("⏭️ Download pulado - apenas situação de pagamento mudou")
@@ -667,17 +837,9 @@ def executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura_exi
         
         if apenas_situacao_mudou:
             # Cenário 1: Apenas situação de pagamento mudou - usar API de atualização
-            if debug_mode:
-                url = API_ATUALIZAR_FATURA_DEV
-            else:
-                url = API_ATUALIZAR_FATURA_PROD
+            requisicao = requisicao_atualizar_situacao(fatura_id, dados_fatura["situacao_pagamento"], headers)
             
-            body = {
-                "id": fatura_id,
-                "situacao_pagamento": dados_fatura["situacao_pagamento"]
-            }
-            
-            print(f"Enviando atualização de situação para API: {url}")
+            print(f"Enviando atualização de situação para API: {requisicao.url}")
             print(f"Atualizando apenas situação para: {dados_fatura['situacao_pagamento']}")
             
         else:
@@ -698,7 +860,6 @@ def executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura_exi
                 "data_vencimento": dados_fatura["data_vencimento"],
                 "data_referencia": dados_fatura["data_referencia"],
                 "valor": dados_fatura["valor"],
-                "arquivo_fatura": dados_fatura["arquivo_fatura"],
                 "nome_arquivo_fatura": dados_fatura["nome_arquivo_fatura"],
                 "data_encontrada": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "situacao_pagamento": dados_fatura["situacao_pagamento"],
@@ -708,26 +869,23 @@ def executar_fatura_vencida(nova_uc, mes_referencia, page, fatura_id, fatura_exi
             }
             
             print(f"Enviando dados completos para API: {url}")
+            requisicao = RequisicaoGeus(
+                url, headers, body, "Fatura enviada com sucesso para a API",
+                pdf=dados_fatura["arquivo_fatura"],
+                endpoint="GEUS criar fatura", timeout_leitura=TIMEOUT_ENVIO_FATURA
+            )
+            requisicao, tipo_operacao = dispensar_pdf_ja_enviado(
+                requisicao, tipo_operacao, dados_fatura, fatura_id, headers, hash_pdf_enviado
+            )
         
-        response = requests.post(url, headers=headers, json=body)
-        
-        if response.status_code == 200:
-            if apenas_situacao_mudou:
-                print("✅ Situação de pagamento atualizada com sucesso")
-            else:
-                print("✅ Fatura enviada com sucesso para a API")
-            return True, tipo_operacao, dados_fatura
-        else:
-            print(f"❌ Erro ao enviar para API: {response.status_code}")
-            print(f"Resposta: {response.text}")
-            return False, "erro", dados_fatura
+        return enviar_ou_adiar(requisicao, tipo_operacao, dados_fatura, envios_adiados)
             
     except Exception as e:
         print(f"❌ Erro durante processamento da fatura vencida: {str(e)}")
         return False, "erro", {}
 
 
-def executar_fatura_agendada(nova_uc, mes_referencia, page, fatura_id, fatura_existente=None, primeira_fatura=False):
+def executar_fatura_agendada(nova_uc, mes_referencia, page, fatura_id, fatura_existente=None, primeira_fatura=False, envios_adiados=None, indice_cards=None):
     """
     Executa o processamento de fatura agendada
     APENAS atualiza a situação de pagamento - SEM fazer download de boleto
@@ -737,8 +895,11 @@ def executar_fatura_agendada(nova_uc, mes_referencia, page, fatura_id, fatura_ex
         mes_referencia (str): Mês de referência no formato "MM/AAAA"
         page: Instância da página do Playwright
         fatura_id (int): ID da fatura do JSON
-        fatura_existente (dict): Dados da fatura existente para comparação (opcional)
+        fatura_existente (FaturaTask): Dados da fatura existente para comparação (opcional)
         primeira_fatura (bool): Se é a primeira fatura da geradora
+        envios_adiados (list): Se informado, a atualização fica para o lote ou a fila de envio
+                               (a RequisicaoGeus é acrescentada à lista)
+        indice_cards (IndiceCards): Cards da página da UC já lidos (padrão: lê a página agora)
     
     Returns:
         tuple: (sucesso, tipo_operacao, dados_fatura)
@@ -751,67 +912,28 @@ def executar_fatura_agendada(nova_uc, mes_referencia, page, fatura_id, fatura_ex
         mes_busca = mes_referencia
         print(f"Buscando fatura para o mês: {mes_busca}")
         
-        # 2. Listar todos os cards da página usando o seletor preciso "card-billing__date"
-        cards_date = page.locator('.card-billing__date')
-        cards_count = cards_date.count()
-        print(f"Encontrados {cards_count} cards de fatura na página")
+        # 2. Cards da página lidos em uma única chamada (índice compartilhado pelas faturas da UC)
+        if indice_cards is None:
+            indice_cards = IndiceCards(page, acompanhar_navegacao=False)
+        cards = indice_cards.cards()
+        print(f"Encontrados {len(cards)} cards de fatura na página: {', '.join(c.mes_referencia for c in cards)}")
         
-        fatura_encontrada = False
+        # 3. Verificar se existe o card referente ao mês buscado
+        card = indice_cards.buscar(mes_busca)
+        fatura_encontrada = card is not None
         situacao_pagamento = None
         dados_fatura = {}
         
-        # 3. Verificar se existe o card referente ao mês buscado
-        for i in range(cards_count):
-            card_date = cards_date.nth(i)
-            
-            # Extrair mês e ano do card
-            mes_element = card_date.locator('p').first
-            ano_element = card_date.locator('p').last
+        if fatura_encontrada:
+            print(f"✓ Fatura encontrada para {card.mes} {card.ano} (card {card.indice + 1})")
             
-            mes_texto = mes_element.text_content().strip()
-            ano_texto = ano_element.text_content().strip()
+            # Situação de pagamento pela classe CSS do card-billing__top
+            situacao_pagamento = card.situacao_pagamento
+            print(f"Situação de pagamento detectada: {situacao_pagamento}")
             
-            # Converter mês para número
-            meses = {
-                'Janeiro': '01', 'Fevereiro': '02', 'Março': '03', 'Abril': '04',
-                'Maio': '05', 'Junho': '06', 'Julho': '07', 'Agosto': '08',
-                'Setembro': '09', 'Outubro': '10', 'Novembro': '11', 'Dezembro': '12'
+            dados_fatura = {
+                "situacao_pagamento": situacao_pagamento
             }
-            
-            mes_numero = meses.get(mes_texto, '00')
-            mes_card = f"{mes_numero}/{ano_texto}"
-            
-            print(f"Card {i+1}: {mes_texto} {ano_texto} ({mes_card})")
-            
-            # Verificar se é o mês que estamos buscando
-            if mes_card == mes_busca:
-                print(f"✓ Fatura encontrada para {mes_texto} {ano_texto}")
-                fatura_encontrada = True
-                
-                # Buscar o card completo que contém todas as informações
-                card_completo = card_date.locator('xpath=ancestor::*[contains(@class, "card-billing") or contains(@class, "card")]').first
-                
-                # Verificar situação de pagamento baseada na classe CSS do card-billing__top
-                situacao_element = card_completo.locator('.card-billing__top')
-                situacao_class = situacao_element.get_attribute('class')
-                
-                # Determinar situação de pagamento
-                if 'card-billing__top--green' in situacao_class:
-                    situacao_pagamento = "paga"
-                elif 'card-billing__top--orange' in situacao_class:
-                    situacao_pagamento = "a_vencer"
-                elif 'card-billing__top--red' in situacao_class:
-                    situacao_pagamento = "vencida"
-                else:
-                    situacao_pagamento = "desconhecida"
-                
-                print(f"Situação de pagamento detectada: {situacao_pagamento}")
-                
-                dados_fatura = {
-                    "situacao_pagamento": situacao_pagamento
-                }
-                
-                break
         
         if not fatura_encontrada:
             print(f"ℹ️ Fatura não localizada para o mês {mes_busca}")
@@ -821,11 +943,6 @@ def executar_fatura_agendada(nova_uc, mes_referencia, page, fatura_id, fatura_ex
         # Se a fatura foi paga, atualizar para "paga"
         # Se ainda está a_vencer ou vencida, manter como "agendado"
         
-        if debug_mode:
-            url = API_ATUALIZAR_FATURA_DEV
-        else:
-            url = API_ATUALIZAR_FATURA_PROD
-        
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {GEUS_APIKEY}"
@@ -834,21 +951,10 @@ def executar_fatura_agendada(nova_uc, mes_referencia, page, fatura_id, fatura_ex
         if situacao_pagamento == "paga":
             print("💳 Fatura agendada foi PAGA - atualizando situação para 'paga'")
             
-            body = {
-                "id": fatura_id,
-                "situacao_pagamento": "paga"
-            }
-            
-            print(f"Enviando atualização de situação para 'paga' via API: {url}")
-            response = requests.post(url, headers=headers, json=body)
+            requisicao = requisicao_atualizar_situacao(fatura_id, "paga", headers)
             
-            if response.status_code == 200:
-                print("✅ Fatura atualizada para 'paga' com sucesso")
-                return True, "situacao_alterada", dados_fatura
-            else:
-                print(f"❌ Erro ao enviar para API: {response.status_code}")
-                print(f"Resposta: {response.text}")
-                return False, "erro", dados_fatura
+            print(f"Enviando atualização de situação para 'paga' via API: {requisicao.url}")
+            return enviar_ou_adiar(requisicao, "situacao_alterada", dados_fatura, envios_adiados)
         
         elif situacao_pagamento in ["a_vencer", "vencida"]:
             print(f"📅 Fatura ainda está como '{situacao_pagamento}' - mantendo como 'agendado'")
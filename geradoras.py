@@ -5,4 +5,16 @@ USINA_ENERGIAA_CNPJ = "29.698.168/0001-02"
 USINA_LUZDIVINA_CNPJ = "59.981.267/0001-50"
 USINA_G114_CNPJ = "52.028.408/0001-75"
 USINA_SLLG = "250.262.911-04"
-USINA_EVIC_CNPJ = "61.195.685/0001-63"
\ No newline at end of file
+USINA_EVIC_CNPJ = "61.195.685/0001-63"
+
+# Todas as geradoras cadastradas (ordem de processamento)
+GERADORAS_CNPJS = [
+    USINA_LUNA_CNPJ,
+    USINA_SULINA_CNPJ,
+    USINA_LB_CNPJ,
+    USINA_ENERGIAA_CNPJ,
+    USINA_LUZDIVINA_CNPJ,
+    USINA_G114_CNPJ,
+    USINA_SLLG,
+    USINA_EVIC_CNPJ
+]
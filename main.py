@@ -1,10 +1,37 @@
 from fastapi import FastAPI, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 import asyncio
+from datetime import date
+from typing import Optional
 from robo import processar_todas_geradoras, processar_geradora, processar_multiplas_geradoras, geradoras_cnpjs
+from database import DatabaseAssincrono
+from function.cliente_http import obter_metricas
+from function.download_fatura import obter_metricas_download
+from function.buscar_dados_api import invalidar_cache_busca
+from function.outbox import RetentorOutbox
 
 app = FastAPI(title="Energisa Busca API", description="Microserviço para processamento de faturas Energisa")
 
+# Consultas ao banco rodam em um pool de threads de leitura, fora do event loop
+db_async = DatabaseAssincrono()
+
+# Reenvio dos envios à API GEUS que falharam, independente das buscas
+retentor_outbox = None
+
+@app.on_event("startup")
+def iniciar_retentor_outbox():
+    """Inicia a thread que drena a outbox"""
+    global retentor_outbox
+    retentor_outbox = RetentorOutbox()
+
+@app.on_event("shutdown")
+def fechar_banco():
+    """Para o retentor da outbox e fecha as conexões de leitura ao encerrar a API"""
+    if retentor_outbox is not None:
+        retentor_outbox.parar()
+    db_async.fechar()
+
 @app.post('/start-search')
 async def iniciar_busca_todas_geradoras(background_tasks: BackgroundTasks):
     """Inicia o processamento de todas as geradoras em background"""
@@ -74,6 +101,30 @@ async def iniciar_busca_geradoras(cnpjs: str, background_tasks: BackgroundTasks)
         }
     )
 
+@app.post('/cache-busca/invalidar')
+def invalidar_busca():
+    """Força a próxima execução a consultar a API GEUS (ignora a busca em cache)"""
+    invalidar_cache_busca()
+    return JSONResponse(content={"message": "Cache da busca invalidado"})
+
+@app.get('/outbox')
+async def listar_outbox():
+    """Envios à API GEUS que falharam e aguardam nova tentativa"""
+    envios = await db_async.obter_envios_outbox()
+    return JSONResponse(
+        content={
+            "total": len(envios),
+            "envios": jsonable_encoder(envios)
+        }
+    )
+
+@app.post('/outbox/drenar')
+async def drenar_outbox_agora():
+    """Antecipa a próxima passada do retentor da outbox"""
+    if retentor_outbox is not None:
+        retentor_outbox.acordar()
+    return JSONResponse(content={"message": "Reenvio da outbox solicitado"})
+
 @app.get('/geradoras')
 async def listar_geradoras():
     """Lista todas as geradoras disponíveis"""
@@ -84,6 +135,57 @@ async def listar_geradoras():
         }
     )
 
+@app.get('/faturas/{fatura_id}/status')
+async def status_fatura(fatura_id: int):
+    """Retorna o status de processamento de uma fatura"""
+    status, deve_processar = await db_async.verificar_status_fatura(fatura_id)
+    return JSONResponse(
+        content={
+            "fatura_id": fatura_id,
+            "status": status,
+            "deve_processar": deve_processar
+        }
+    )
+
+@app.get('/estatisticas')
+async def estatisticas(cnpj: Optional[str] = None):
+    """Estatísticas de processamento gerais ou de uma geradora (?cnpj=...)"""
+    if cnpj:
+        stats = await db_async.obter_estatisticas_geradora(cnpj)
+    else:
+        stats = await db_async.obter_estatisticas_gerais()
+    return JSONResponse(content={"cnpj_geradora": cnpj, "estatisticas": stats})
+
+@app.get('/estatisticas/dia')
+async def estatisticas_dia(data: Optional[date] = None):
+    """Faturas processadas no dia (padrão: hoje) por geradora e status"""
+    data = data or date.today()
+    stats = await db_async.obter_estatisticas_dia(data)
+    return JSONResponse(content={"data": data.isoformat(), "geradoras": stats})
+
+@app.get('/execucoes')
+async def execucoes(data: Optional[date] = None):
+    """Execuções por UC registradas no dia (padrão: hoje)"""
+    data = data or date.today()
+    lista = await db_async.obter_execucoes_do_dia(data)
+    return JSONResponse(
+        content={
+            "data": data.isoformat(),
+            "total": len(lista),
+            "execucoes": jsonable_encoder(lista)
+        }
+    )
+
+@app.get('/metricas-http')
+async def metricas_http():
+    """Contadores de latência das chamadas HTTP à API GEUS, por endpoint"""
+    return JSONResponse(content=obter_metricas())
+
+@app.get('/metricas-download')
+async def metricas_download():
+    """Tempo do clique até o PDF baixado no portal, por UC"""
+    return JSONResponse(content=obter_metricas_download())
+
 @app.get('/')
 async def root():
     """Endpoint raiz com informações da API"""
@@ -95,7 +197,16 @@ async def root():
                 "POST /start-search": "Inicia processamento de todas as geradoras",
                 "POST /start-search/{cnpj}": "Inicia processamento de uma geradora específica",
                 "POST /start-search/{cnpj}AND{cnpj2}": "Inicia processamento de múltiplas geradoras (use AND como separador)",
-                "GET /geradoras": "Lista todas as geradoras disponíveis"
+                "POST /cache-busca/invalidar": "Força a próxima execução a consultar a API GEUS",
+                "GET /outbox": "Envios à API GEUS aguardando nova tentativa",
+                "POST /outbox/drenar": "Antecipa o reenvio dos envios da outbox",
+                "GET /geradoras": "Lista todas as geradoras disponíveis",
+                "GET /faturas/{id}/status": "Status de processamento de uma fatura",
+                "GET /estatisticas?cnpj={cnpj}": "Estatísticas gerais ou de uma geradora",
+                "GET /estatisticas/dia?data=AAAA-MM-DD": "Faturas processadas no dia por geradora",
+                "GET /execucoes?data=AAAA-MM-DD": "Execuções por UC do dia",
+                "GET /metricas-http": "Latência das chamadas à API GEUS por endpoint",
+                "GET /metricas-download": "Tempo dos downloads de faturas no portal por UC"
             },
             "exemplos": {
                 "uma_geradora": "/start-search/47.278.309/0001-01",
@@ -3,19 +3,20 @@
 Relatório da execução do buscar_dados_api.py
 """
 
-import json
 import os
 
+from function.snapshots import DIRETORIO_SNAPSHOTS, ler_arquivo_snapshot
+
 def gerar_relatorio():
     print("📊 RELATÓRIO DE EXECUÇÃO")
     print("=" * 60)
     
-    diretorio = "media/json"
+    diretorio = DIRETORIO_SNAPSHOTS
     if not os.path.exists(diretorio):
         print("❌ Diretório media/json não encontrado")
         return
     
-    arquivos = [f for f in os.listdir(diretorio) if f.endswith('.json')]
+    arquivos = [f for f in os.listdir(diretorio) if f.endswith(('.json', '.json.gz')) and not f.startswith('.tmp_')]
     
     if not arquivos:
         print("❌ Nenhum arquivo JSON encontrado")
@@ -31,8 +32,7 @@ def gerar_relatorio():
         caminho = os.path.join(diretorio, arquivo)
         
         try:
-            with open(caminho, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = ler_arquivo_snapshot(caminho)
             
             faturas_geradora = sum(len(faturas) for faturas in data['lista_ucs'].values())
             ucs_geradora = len(data['lista_ucs'])
@@ -46,7 +46,7 @@ def gerar_relatorio():
             total_faturas += faturas_geradora
             total_ucs += ucs_geradora
             
-            nome_geradora = arquivo.replace('.json', '')
+            nome_geradora = arquivo.split('.', 1)[0]
             situacoes_str = ', '.join(sorted(situacoes))
             
             print(f"{nome_geradora:<25} | {faturas_geradora:>8} | {ucs_geradora:>4} | {situacoes_str}")
@@ -63,8 +63,7 @@ def gerar_relatorio():
     arquivo_exemplo = arquivos[0]
     caminho_exemplo = os.path.join(diretorio, arquivo_exemplo)
     
-    with open(caminho_exemplo, 'r', encoding='utf-8') as f:
-        data_exemplo = json.load(f)
+    data_exemplo = ler_arquivo_snapshot(caminho_exemplo)
     
     print(f"Arquivo exemplo: {arquivo_exemplo}")
     print(f"Estrutura principal: ✓ geradora, ✓ lista_ucs")
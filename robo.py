@@ -13,25 +13,24 @@ from geradoras import (
     USINA_LUZDIVINA_CNPJ,
     USINA_G114_CNPJ,
     USINA_SLLG,
-    USINA_EVIC_CNPJ
+    USINA_EVIC_CNPJ,
+    GERADORAS_CNPJS
 )
 from function.tarefa import executar_fatura_pendente, executar_fatura_vencida, processar_faturas_do_json
 from function.buscar_dados_api import buscar_faturas
+from function.cliente_http import imprimir_metricas
+from function.download_fatura import imprimir_metricas_download
+from function.snapshots import carregar_snapshot
+from function.fila_envio import FilaEnvio
+from function.lote_situacao import LoteSituacao
+from function.outbox import RetentorOutbox
+from function.captura_faturas import CapturaFaturas
+from config import ENVIO_ASSINCRONO, SITUACAO_EM_LOTE, CAPTURA_FATURAS_XHR
 from database import DatabaseManager, inicializar_banco
-import json
 import os
 
-# Lista com todos os CNPJs das geradoras
-geradoras_cnpjs = [
-    USINA_LUNA_CNPJ,
-    USINA_SULINA_CNPJ,
-    USINA_LB_CNPJ,
-    USINA_ENERGIAA_CNPJ,
-    USINA_LUZDIVINA_CNPJ,
-    USINA_G114_CNPJ,
-    USINA_SLLG,
-    USINA_EVIC_CNPJ
-]
+# Lista com todos os CNPJs das geradoras (cadastrada só em geradoras.py)
+geradoras_cnpjs = GERADORAS_CNPJS
 
 class LogDuplo:
     """Classe para duplicar prints no console e em arquivo"""
@@ -274,25 +273,11 @@ def fazer_login_com_retry(p, geradora_cnpj):
             print("\n🔄 Reiniciando tentativa de login...\n")
 
 def carregar_json_geradora(geradora_cnpj):
-    """Carrega o JSON correspondente à geradora usando apenas os números do CNPJ"""
-    # Extrair apenas os números do CNPJ
-    cnpj_numerico = ''.join(filter(str.isdigit, geradora_cnpj))
-    
-    # Caminho do arquivo JSON
-    caminho_json = f"media/json/{cnpj_numerico}.json"
-    
-    if not os.path.exists(caminho_json):
-        print(f"❌ Arquivo JSON não encontrado: {caminho_json}")
-        return None
-    
-    try:
-        with open(caminho_json, 'r', encoding='utf-8') as file:
-            dados = json.load(file)
-            print(f"✅ JSON carregado: {caminho_json}")
-            return dados
-    except Exception as e:
-        print(f"❌ Erro ao carregar JSON {caminho_json}: {str(e)}")
-        return None
+    """Carrega o snapshot da geradora (em memória após a busca, ou do disco ao retomar)"""
+    dados = carregar_snapshot(geradora_cnpj)
+    if dados is not None:
+        print(f"✅ Snapshot carregado: geradora {geradora_cnpj}")
+    return dados
 
 def processar_geradora(geradora_cnpj, force=False):
     """Processa uma geradora específica usando seu CNPJ
@@ -314,11 +299,11 @@ def processar_geradora(geradora_cnpj, force=False):
         print(f"✅ Nenhuma fatura pendente para processar na geradora {geradora_cnpj}")
         return True
 
-    # 2. Extrair lista de UCs filtradas
-    lista_ucs = dados_geradora.get("lista_ucs", {})
+    # 2. Extrair lista de UCs filtradas (FaturaTask indexados por UC)
+    lista_ucs = dados_geradora.ucs()
     
-    total_ucs = len(lista_ucs)
-    total_faturas = sum(len(f) for f in lista_ucs.values())
+    total_ucs = dados_geradora.total_ucs
+    total_faturas = dados_geradora.total_faturas
     
     print(f"📋 UCs a processar: {total_ucs}")
     print(f"📊 Faturas a processar: {total_faturas}")
@@ -332,265 +317,281 @@ def processar_geradora(geradora_cnpj, force=False):
             print("❌ Falha no login inicial")
             return False
 
+        # Respostas JSON do portal escutadas desde o login (os cards vêm delas, com a página como reserva)
+        captura_faturas = CapturaFaturas(page) if CAPTURA_FATURAS_XHR else None
+
         # 4. Processar cada UC com sistema de retry e renovação de login a cada 30 UCs
         ucs_processadas = 0
         total_ucs = len(lista_ucs)
-        lista_ucs_items = list(lista_ucs.items())  # Converter para lista para controle de índice
-
-        i = 0  # Índice atual da UC
-        while i < len(lista_ucs_items):
-            nova_uc, faturas_uc = lista_ucs_items[i]
-            ucs_processadas = i + 1
-            print(f"\n🔄 Processando UC {ucs_processadas}/{total_ucs}: {nova_uc}")
-            print(f"📊 Faturas para processar: {len(faturas_uc)}")
-            
-            # Verificar se precisa renovar login a cada 50 UCs
-            if ucs_processadas > 1 and (ucs_processadas - 1) % 50 == 0:
-                print(f"\n🔄 50 UCs processadas! Renovando login...")
-                try:
-                    browser.close()
-                    print("✅ Navegador fechado")
-                except:
-                    pass
-                
-                time.sleep(3)
-                print("🔐 Fazendo novo login com retry automático...")
-                browser, context, page = fazer_login_com_retry(p, geradora_cnpj)
-                
-                print("✅ Login renovado com sucesso! Continuando processamento...")
-
-            max_tentativas_uc = 3  # Máximo de tentativas para cada UC
-            tentativa_uc = 0
-            uc_processada_com_sucesso = False
-
-            while tentativa_uc < max_tentativas_uc and not uc_processada_com_sucesso:
-                tentativa_uc += 1
-                if tentativa_uc > 1:
-                    print(f"🔄 Tentativa {tentativa_uc}/{max_tentativas_uc} para UC {nova_uc}")
-
-                try:
-                    # Verificar se há bloqueio "Access Denied" antes de processar
-                    # Esta função agora para a execução automaticamente se detectar bloqueio
-                    print("🔍 Verificando bloqueio de acesso...")
-                    verificar_access_denied(page)
-
-                    # Navegar para seleção de UC com retry robusto
-                    tentativas_navegacao = 0
-                    max_tentativas_navegacao = 3
-                    uc_selecionada = False
-
-                    while tentativas_navegacao < max_tentativas_navegacao and not uc_selecionada:
-                        try:
-                            tentativas_navegacao += 1
-                            print(f"   🔄 Tentativa {tentativas_navegacao} de seleção da UC...")
-
-                            # Verificar novamente se há bloqueio antes de navegar
-                            # Esta função agora para a execução automaticamente se detectar bloqueio
-                            verificar_access_denied(page)
-
-                            # Navegar para listagem
-                            page.goto("https://servicos.energisa.com.br/login/listagem-ucs", wait_until="load", timeout=30000)
-
-                            # Aguardar página carregar completamente
-                            page.wait_for_load_state("domcontentloaded")
-                            time.sleep(2)  # Aguardar scripts JS carregarem
-
-                            # Aguardar input de busca estar disponível
-                            input_busca = page.get_by_role("textbox", name="Busque pelo número da UC ou")
-                            input_busca.wait_for(state="visible", timeout=15000)
-                            input_busca.wait_for(state="attached", timeout=5000)
-
-                            # Garantir que o campo está pronto para interação
-                            time.sleep(1)
-
-                            # Clicar e preencher com a UC
-                            input_busca.click(timeout=10000)
-                            input_busca.fill("")  # Limpar primeiro
-                            time.sleep(0.5)
-
-                            # Preencher com a UC
-                            input_busca.fill(nova_uc)
-                            time.sleep(1)
-
-                            # Verificar se existe botão de "Inativos" e clicar se necessário
-                            try:
-                                botao_inativos = page.get_by_role("button", name=re.compile(r"Inativos", re.IGNORECASE))
-                                if botao_inativos.is_visible(timeout=2000):
-                                    print(f"   ℹ️ Encontrado botão de Inativos, clicando...")
-                                    botao_inativos.click()
-                                    time.sleep(1)
-                            except:
-                                # Se não encontrar o botão de inativos, continua normalmente
-                                pass
 
-                            # Clicar no botão do resultado (button dentro do container de resultados)
-                            page.locator("button").filter(has_text="Código do Cliente:").first.click(timeout=10000)
-                            time.sleep(1)
+        # Envios à API em segundo plano, compartilhados por todas as UCs da geradora
+        # (lote e fila são fechados no finally, mesmo se uma exceção interromper a geradora)
+        fila_envio = FilaEnvio() if ENVIO_ASSINCRONO else None
 
-                            uc_selecionada = True
-                            print(f"   ✅ UC selecionada com sucesso")
+        # Atualizações só de situação da geradora inteira, enviadas juntas ao final
+        lote_situacao = LoteSituacao(fila_envio=fila_envio) if SITUACAO_EM_LOTE else None
 
-                        except Exception as e:
-                            print(f"   ⚠️ Tentativa {tentativas_navegacao} falhou: {str(e)}")
+        try:
+            i = 0  # Índice atual da UC
+            while i < len(lista_ucs):
+                nova_uc = lista_ucs[i]
+                faturas_uc = dados_geradora.faturas_da_uc(nova_uc)
+                ucs_processadas = i + 1
+                print(f"\n🔄 Processando UC {ucs_processadas}/{total_ucs}: {nova_uc}")
+                print(f"📊 Faturas para processar: {len(faturas_uc)}")
+                
+                # Verificar se precisa renovar login a cada 50 UCs
+                if ucs_processadas > 1 and (ucs_processadas - 1) % 50 == 0:
+                    print(f"\n🔄 50 UCs processadas! Renovando login...")
+                    try:
+                        browser.close()
+                        print("✅ Navegador fechado")
+                    except:
+                        pass
+                    
+                    time.sleep(3)
+                    print("🔐 Fazendo novo login com retry automático...")
+                    browser, context, page = fazer_login_com_retry(p, geradora_cnpj)
+                    captura_faturas = CapturaFaturas(page) if CAPTURA_FATURAS_XHR else None
+                    
+                    print("✅ Login renovado com sucesso! Continuando processamento...")
 
-                            if tentativas_navegacao >= max_tentativas_navegacao:
-                                raise Exception(f"Falha ao selecionar UC {nova_uc} após {max_tentativas_navegacao} tentativas")
+                max_tentativas_uc = 3  # Máximo de tentativas para cada UC
+                tentativa_uc = 0
+                uc_processada_com_sucesso = False
 
-                            # Aguardar antes de tentar novamente (backoff progressivo)
-                            tempo_espera = tentativas_navegacao * 2
-                            print(f"   ⏳ Aguardando {tempo_espera}s antes de tentar novamente...")
-                            time.sleep(tempo_espera)
+                while tentativa_uc < max_tentativas_uc and not uc_processada_com_sucesso:
+                    tentativa_uc += 1
+                    if tentativa_uc > 1:
+                        print(f"🔄 Tentativa {tentativa_uc}/{max_tentativas_uc} para UC {nova_uc}")
 
-                    # Aguardar navegação com validação rigorosa
-                    navegacao_sucesso = False
-                    tentativas_validacao = 0
-                    max_tentativas_validacao = 3
+                    try:
+                        # Verificar se há bloqueio "Access Denied" antes de processar
+                        # Esta função agora para a execução automaticamente se detectar bloqueio
+                        print("🔍 Verificando bloqueio de acesso...")
+                        verificar_access_denied(page)
 
-                    while tentativas_validacao < max_tentativas_validacao and not navegacao_sucesso:
-                        tentativas_validacao += 1
+                        # Navegar para seleção de UC com retry robusto
+                        tentativas_navegacao = 0
+                        max_tentativas_navegacao = 3
+                        uc_selecionada = False
 
-                        try:
-                            # Aguardar mudança de URL
-                            page.wait_for_url("**/login/login**", timeout=15000)
-                            navegacao_sucesso = True
-                            print(f"   ✅ Navegação bem-sucedida para UC {nova_uc}")
+                        while tentativas_navegacao < max_tentativas_navegacao and not uc_selecionada:
+                            try:
+                                tentativas_navegacao += 1
+                                print(f"   🔄 Tentativa {tentativas_navegacao} de seleção da UC...")
+
+                                # Verificar novamente se há bloqueio antes de navegar
+                                # Esta função agora para a execução automaticamente se detectar bloqueio
+                                verificar_access_denied(page)
+
+                                # Navegar para listagem
+                                page.goto("https://servicos.energisa.com.br/login/listagem-ucs", wait_until="load", timeout=30000)
+
+                                # Aguardar página carregar completamente
+                                page.wait_for_load_state("domcontentloaded")
+                                time.sleep(2)  # Aguardar scripts JS carregarem
+
+                                # Aguardar input de busca estar disponível
+                                input_busca = page.get_by_role("textbox", name="Busque pelo número da UC ou")
+                                input_busca.wait_for(state="visible", timeout=15000)
+                                input_busca.wait_for(state="attached", timeout=5000)
+
+                                # Garantir que o campo está pronto para interação
+                                time.sleep(1)
+
+                                # Clicar e preencher com a UC
+                                input_busca.click(timeout=10000)
+                                input_busca.fill("")  # Limpar primeiro
+                                time.sleep(0.5)
+
+                                # Preencher com a UC
+                                input_busca.fill(nova_uc)
+                                time.sleep(1)
+
+                                # Verificar se existe botão de "Inativos" e clicar se necessário
+                                try:
+                                    botao_inativos = page.get_by_role("button", name=re.compile(r"Inativos", re.IGNORECASE))
+                                    if botao_inativos.is_visible(timeout=2000):
+                                        print(f"   ℹ️ Encontrado botão de Inativos, clicando...")
+                                        botao_inativos.click()
+                                        time.sleep(1)
+                                except:
+                                    # Se não encontrar o botão de inativos, continua normalmente
+                                    pass
+
+                                # Clicar no botão do resultado (button dentro do container de resultados)
+                                page.locator("button").filter(has_text="Código do Cliente:").first.click(timeout=10000)
+                                time.sleep(1)
+
+                                uc_selecionada = True
+                                print(f"   ✅ UC selecionada com sucesso")
+
+                            except Exception as e:
+                                print(f"   ⚠️ Tentativa {tentativas_navegacao} falhou: {str(e)}")
+
+                                if tentativas_navegacao >= max_tentativas_navegacao:
+                                    raise Exception(f"Falha ao selecionar UC {nova_uc} após {max_tentativas_navegacao} tentativas")
+
+                                # Aguardar antes de tentar novamente (backoff progressivo)
+                                tempo_espera = tentativas_navegacao * 2
+                                print(f"   ⏳ Aguardando {tempo_espera}s antes de tentar novamente...")
+                                time.sleep(tempo_espera)
+
+                        # Aguardar navegação com validação rigorosa
+                        navegacao_sucesso = False
+                        tentativas_validacao = 0
+                        max_tentativas_validacao = 3
+
+                        while tentativas_validacao < max_tentativas_validacao and not navegacao_sucesso:
+                            tentativas_validacao += 1
 
-                        except:
-                            # Verificar URL atual
-                            current_url = page.url
-                            print(f"   🔍 URL atual: {current_url}")
-                            
-                            # Verificar se é Access Denied usando a função atualizada
-                            if verificar_access_denied(page):
-                                # Se detectou Access Denied (incluindo URL /logout), forçar reinício da sessão
-                                raise Exception(f"Access Denied detectado - URL: {current_url}")
-                            
-                            # Se ainda está na listagem, a troca falhou
-                            if "listagem-ucs" in current_url:
-                                print(f"   ⚠️ Ainda na página de listagem (tentativa {tentativas_validacao})")
-                                
-                                if tentativas_validacao >= max_tentativas_validacao:
-                                    raise Exception(f"Falha ao sair da listagem após {max_tentativas_validacao} tentativas")
-                                
-                                # Aguardar um pouco mais
-                                time.sleep(3)
-                                
-                            # Se saiu da listagem mas não chegou no /login/login
-                            elif "/login" in current_url or "/home" in current_url or "/faturas" in current_url:
+                            try:
+                                # Aguardar mudança de URL
+                                page.wait_for_url("**/login/login**", timeout=15000)
                                 navegacao_sucesso = True
-                                print(f"   ✅ Navegação OK - URL válida: {current_url}")
+                                print(f"   ✅ Navegação bem-sucedida para UC {nova_uc}")
+
+                            except:
+                                # Verificar URL atual
+                                current_url = page.url
+                                print(f"   🔍 URL atual: {current_url}")
                                 
-                            else:
-                                # URL inesperada
-                                if tentativas_validacao >= max_tentativas_validacao:
-                                    raise Exception(f"URL inesperada após seleção: {current_url}")
+                                # Verificar se é Access Denied usando a função atualizada
+                                if verificar_access_denied(page):
+                                    # Se detectou Access Denied (incluindo URL /logout), forçar reinício da sessão
+                                    raise Exception(f"Access Denied detectado - URL: {current_url}")
                                 
-                                print(f"   ⚠️ URL inesperada, aguardando...")
-                                time.sleep(3)
-
-                    if not navegacao_sucesso:
-                        raise Exception(f"Navegação falhou para UC {nova_uc}")
-
-                    # Ir para página de faturas com retry
-                    tentativas_faturas = 0
-                    max_tentativas_faturas = 3
-                    faturas_carregadas = False
-
-                    while tentativas_faturas < max_tentativas_faturas and not faturas_carregadas:
-                        try:
-                            tentativas_faturas += 1
-                            print(f"   📄 Carregando página de faturas (tentativa {tentativas_faturas})...")
+                                # Se ainda está na listagem, a troca falhou
+                                if "listagem-ucs" in current_url:
+                                    print(f"   ⚠️ Ainda na página de listagem (tentativa {tentativas_validacao})")
+                                    
+                                    if tentativas_validacao >= max_tentativas_validacao:
+                                        raise Exception(f"Falha ao sair da listagem após {max_tentativas_validacao} tentativas")
+                                    
+                                    # Aguardar um pouco mais
+                                    time.sleep(3)
+                                    
+                                # Se saiu da listagem mas não chegou no /login/login
+                                elif "/login" in current_url or "/home" in current_url or "/faturas" in current_url:
+                                    navegacao_sucesso = True
+                                    print(f"   ✅ Navegação OK - URL válida: {current_url}")
+                                    
+                                else:
+                                    # URL inesperada
+                                    if tentativas_validacao >= max_tentativas_validacao:
+                                        raise Exception(f"URL inesperada após seleção: {current_url}")
+                                    
+                                    print(f"   ⚠️ URL inesperada, aguardando...")
+                                    time.sleep(3)
+
+                        if not navegacao_sucesso:
+                            raise Exception(f"Navegação falhou para UC {nova_uc}")
+
+                        # Ir para página de faturas com retry
+                        tentativas_faturas = 0
+                        max_tentativas_faturas = 3
+                        faturas_carregadas = False
+
+                        while tentativas_faturas < max_tentativas_faturas and not faturas_carregadas:
+                            try:
+                                tentativas_faturas += 1
+                                print(f"   📄 Carregando página de faturas (tentativa {tentativas_faturas})...")
 
-                            page.goto("https://servicos.energisa.com.br/faturas", wait_until="load", timeout=30000)
-                            page.wait_for_load_state("domcontentloaded")
+                                page.goto("https://servicos.energisa.com.br/faturas", wait_until="load", timeout=30000)
+                                page.wait_for_load_state("domcontentloaded")
 
-                            # Aguardar conteúdo carregar
-                            time.sleep(3)
+                                # Aguardar conteúdo carregar
+                                time.sleep(3)
 
-                            faturas_carregadas = True
-                            print(f"   ✅ Página de faturas carregada")
+                                faturas_carregadas = True
+                                print(f"   ✅ Página de faturas carregada")
 
-                        except Exception as e:
-                            print(f"   ⚠️ Tentativa {tentativas_faturas} falhou ao carregar faturas: {str(e)}")
+                            except Exception as e:
+                                print(f"   ⚠️ Tentativa {tentativas_faturas} falhou ao carregar faturas: {str(e)}")
 
-                            if tentativas_faturas >= max_tentativas_faturas:
-                                raise Exception(f"Falha ao carregar página de faturas após {max_tentativas_faturas} tentativas")
+                                if tentativas_faturas >= max_tentativas_faturas:
+                                    raise Exception(f"Falha ao carregar página de faturas após {max_tentativas_faturas} tentativas")
 
-                            time.sleep(2)
+                                time.sleep(2)
 
-                    # Verifica se é UC sem faturas
-                    if page.locator('text=Bem-vindo à esta nova conta com a Energisa.').count() > 0:
-                        print("UC sem faturas geradas no momento.")
-                        
-                        # Registrar no banco que a UC foi verificada mas não tem faturas
-                        from database import DatabaseManager
-                        from datetime import datetime
-                        db = DatabaseManager()
-                        
-                        # Registrar execução da UC sem faturas
-                        db.registrar_execucao_uc(
-                            cnpj_geradora=geradora_cnpj,
-                            nova_uc=nova_uc,
-                            total_faturas=len(faturas_uc),
-                            faturas_sucesso=0,
-                            faturas_erro=0,
-                            faturas_puladas=len(faturas_uc),
-                            data_hora_inicio=datetime.now()
-                        )
-                        
-                        # Marcar todas as faturas desta UC como sucesso (não há nada para processar)
-                        for fatura in faturas_uc:
-                            fatura_id = fatura.get("id")
-                            db.atualizar_status_fatura(
-                                fatura_id=fatura_id,
-                                status='sucesso',
-                                mensagem_erro='UC sem faturas no portal',
-                                tipo_operacao='nao_encontrada',
-                                log_execucao=f"UC {nova_uc} sem faturas geradas no portal Energisa"
+                        # Verifica se é UC sem faturas
+                        if page.locator('text=Bem-vindo à esta nova conta com a Energisa.').count() > 0:
+                            print("UC sem faturas geradas no momento.")
+                            
+                            # Registrar no banco que a UC foi verificada mas não tem faturas
+                            from database import DatabaseManager
+                            from datetime import datetime
+                            db = DatabaseManager()
+                            
+                            # Registrar execução da UC sem faturas
+                            db.registrar_execucao_uc(
+                                cnpj_geradora=geradora_cnpj,
+                                nova_uc=nova_uc,
+                                total_faturas=len(faturas_uc),
+                                faturas_sucesso=0,
+                                faturas_erro=0,
+                                faturas_puladas=len(faturas_uc),
+                                data_hora_inicio=datetime.now()
                             )
-                            print(f"   ✅ Fatura ID {fatura_id} marcada como sucesso (UC sem faturas)")
-                        
-                        uc_processada_com_sucesso = True  # Marcar como sucesso para prosseguir
-                        break
+                            
+                            # Marcar todas as faturas desta UC como sucesso (não há nada para processar)
+                            for fatura in faturas_uc:
+                                fatura_id = fatura.id
+                                db.atualizar_status_fatura(
+                                    fatura_id=fatura_id,
+                                    status='sucesso',
+                                    mensagem_erro='UC sem faturas no portal',
+                                    tipo_operacao='nao_encontrada',
+                                    log_execucao=f"UC {nova_uc} sem faturas geradas no portal Energisa"
+                                )
+                                print(f"   ✅ Fatura ID {fatura_id} marcada como sucesso (UC sem faturas)")
+                            
+                            uc_processada_com_sucesso = True  # Marcar como sucesso para prosseguir
+                            break
 
-                    page.locator("div").filter(has_text=re.compile(r"^Mostrar mais faturas$")).click()
+                        page.locator("div").filter(has_text=re.compile(r"^Mostrar mais faturas$")).click()
 
-                    # Processar faturas desta UC usando a função do tarefa.py
-                    print(f"🎯 Iniciando processamento das faturas da UC {nova_uc}")
+                        # Processar faturas desta UC usando a função do tarefa.py
+                        print(f"🎯 Iniciando processamento das faturas da UC {nova_uc}")
 
-                    # Criar estrutura temporária para processar apenas esta UC
-                    dados_uc_temp = {
-                        "geradora": geradora_cnpj,
-                        "lista_ucs": {nova_uc: faturas_uc}
-                    }
+                        # Processar apenas as faturas da UC atual com parâmetro force
+                        resultados_uc = processar_faturas_do_json(dados_geradora, page, force=force, ucs=[nova_uc], fila_envio=fila_envio, lote_situacao=lote_situacao, captura_faturas=captura_faturas)
 
-                    # Processar faturas da UC atual com parâmetro force
-                    resultados_uc = processar_faturas_do_json(dados_uc_temp, page, force=force)
+                        # Log dos resultados
+                        enviando_uc = sum(1 for r in resultados_uc if r.get("enviando"))
+                        sucessos_uc = sum(1 for r in resultados_uc if r["sucesso"]) - enviando_uc
+                        print(f"✅ UC {nova_uc} processada: {sucessos_uc}/{len(resultados_uc)} faturas com sucesso, {enviando_uc} enviando à API")
 
-                    # Log dos resultados
-                    sucessos_uc = sum(1 for r in resultados_uc if r["sucesso"])
-                    print(f"✅ UC {nova_uc} processada: {sucessos_uc}/{len(resultados_uc)} faturas com sucesso")
+                        uc_processada_com_sucesso = True  # Marcar como sucesso
 
-                    uc_processada_com_sucesso = True  # Marcar como sucesso
+                    except SystemExit:
+                        # Access Denied detectado - propagar exceção para parar tudo
+                        print("🛑 Propagando interrupção por Access Denied...")
+                        raise
+                        
+                    except Exception as e:
+                        print(f"❌ Erro ao processar UC {nova_uc} (tentativa {tentativa_uc}): {str(e)}")
+                        
+                        # Se não conseguiu após todas as tentativas, pular para próxima UC
+                        if tentativa_uc >= max_tentativas_uc:
+                            print(f"❌ UC {nova_uc} falhou após {max_tentativas_uc} tentativas. Prosseguindo para próxima UC.")
+                            break
+                        
+                        # Aguardar antes da próxima tentativa
+                        time.sleep(3)
 
-                except SystemExit:
-                    # Access Denied detectado - propagar exceção para parar tudo
-                    print("🛑 Propagando interrupção por Access Denied...")
-                    raise
-                    
-                except Exception as e:
-                    print(f"❌ Erro ao processar UC {nova_uc} (tentativa {tentativa_uc}): {str(e)}")
-                    
-                    # Se não conseguiu após todas as tentativas, pular para próxima UC
-                    if tentativa_uc >= max_tentativas_uc:
-                        print(f"❌ UC {nova_uc} falhou após {max_tentativas_uc} tentativas. Prosseguindo para próxima UC.")
-                        break
-                    
-                    # Aguardar antes da próxima tentativa
-                    time.sleep(3)
+                # Avançar para próxima UC apenas se processou com sucesso ou esgotou tentativas
+                i += 1
+        finally:
+            # Enviar o lote de situações (antes de fechar a fila, que pode receber execuções de UC)
+            if lote_situacao is not None:
+                lote_situacao.fechar()
 
-            # Avançar para próxima UC apenas se processou com sucesso ou esgotou tentativas
-            i += 1
+            # Esperar os envios que ainda estão na fila
+            if fila_envio is not None:
+                print("⏳ Aguardando os envios pendentes à API GEUS...")
+                fila_envio.fechar()
 
         print(f"\n🎉 Processamento da geradora {geradora_cnpj} concluído!")
         print(f"📈 Total de UCs processadas: {total_ucs}/{total_ucs}")
@@ -737,10 +738,15 @@ if __name__ == "__main__":
     # Iniciar sistema de logging
     log_duplo = iniciar_log()
     
+    # Reenvia em segundo plano os envios à API que falharam (outbox)
+    retentor_outbox = RetentorOutbox()
+    
     try:
         # Processar todas as geradoras em loop
         print("🚀 Iniciando processamento de todas as geradoras...")
         processar_todas_geradoras(force=force_mode)
+        imprimir_metricas()
+        imprimir_metricas_download()
         
         # # Para processar geradoras específicas:
         # processar_usinas = [
@@ -759,6 +765,8 @@ if __name__ == "__main__":
         print(f"🕐 Fim: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
     
     finally:
+        retentor_outbox.parar()
+        
         # Fechar arquivo de log
         log_duplo.close()
         sys.stdout = log_duplo.terminal
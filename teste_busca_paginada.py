@@ -0,0 +1,216 @@
+"""
+Servidor local que simula o feed de faturas da API GEUS, para testar a busca paginada
+
+Compara a resposta única com o download paginado/paralelo (function/busca_paginada.py):
+- confere que as faturas organizadas por geradora são as mesmas (hash de cada snapshot)
+- mede o tempo de cada modo
+
+O servidor atende:
+- sem parâmetros: todas as faturas em uma resposta
+- ?page=N&page_size=M: uma página (cabeçalho X-Total-Count, a menos que --sem-total;
+  com --fim-404, páginas além da última respondem 404)
+- ?cursor=N&page_size=M: página no formato {"results": [...], "next": url}
+- ?cnpj_geradora=CNPJ: faturas de uma geradora
+
+Uso:
+    python teste_busca_paginada.py --faturas 20000 --tamanho-pagina 1000 --paralelas 4
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from geradoras import GERADORAS_CNPJS
+from function.buscar_dados_api import organizar_faturas_por_geradora, calcular_hash_snapshot, SITUACOES_PROCESSADAS
+from function.busca_paginada import iterar_faturas_paginadas
+from function import cliente_http
+
+
+def gerar_faturas(quantidade, semente=42):
+    """Gera faturas sintéticas no formato do feed GEUS"""
+    aleatorio = random.Random(semente)
+    situacoes = SITUACOES_PROCESSADAS + ["pago", "cancelado"]
+    faturas = []
+    for i in range(quantidade):
+        mes = aleatorio.randint(1, 12)
+        faturas.append({
+            "id": 100000 + i,
+            "nova_uc": f"10/{3000000 + aleatorio.randint(0, quantidade // 4)}-{aleatorio.randint(0, 9)}",
+            "cnpj_geradora": aleatorio.choice(GERADORAS_CNPJS),
+            "data_vencimento": f"2026-{mes:02d}-{aleatorio.randint(1, 28):02d}",
+            "data_referencia": f"{mes:02d}/2026",
+            "valor": f"{aleatorio.randint(1000, 999999) / 100:.2f}",
+            "situacao_pagamento": aleatorio.choice(situacoes)
+        })
+    return faturas
+
+
+class ServidorGeusLocal:
+    """Servidor HTTP em thread própria simulando o endpoint de faturas"""
+
+    def __init__(self, faturas, latencia=0.05, segundos_por_mil=0.1, com_total=True, porta=0, fim_404=False):
+        """
+        Args:
+            faturas (list): Faturas servidas
+            latencia (float): Tempo fixo de cada resposta, em segundos
+            segundos_por_mil (float): Tempo de geração a cada 1000 faturas da resposta
+            com_total (bool): Envia X-Total-Count nas páginas
+            porta (int): Porta local (0 = escolhida pelo sistema)
+            fim_404 (bool): Páginas além da última respondem 404 em vez de lista vazia
+        """
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                partes = urlsplit(self.path)
+                params = {chave: valores[0] for chave, valores in parse_qs(partes.query).items()}
+                corpo, cabecalhos = servidor.responder(params)
+                if corpo is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                dados = json.dumps(corpo).encode("utf-8")
+
+                quantidade = len(corpo) if isinstance(corpo, list) else len(corpo["results"])
+                time.sleep(servidor.latencia + servidor.segundos_por_mil * quantidade / 1000)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                for nome, valor in cabecalhos.items():
+                    self.send_header(nome, valor)
+                self.end_headers()
+                self.wfile.write(dados)
+
+        self.faturas = faturas
+        self.latencia = latencia
+        self.segundos_por_mil = segundos_por_mil
+        self.com_total = com_total
+        self.fim_404 = fim_404
+        self.requisicoes = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", porta), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/faturas"
+
+    def responder(self, params):
+        """Monta corpo e cabeçalhos para os parâmetros da requisição"""
+        with self._lock:
+            self.requisicoes += 1
+
+        if "cnpj_geradora" in params:
+            return [f for f in self.faturas if f["cnpj_geradora"] == params["cnpj_geradora"]], {}
+
+        tamanho = int(params.get("page_size", len(self.faturas) or 1))
+
+        if "cursor" in params:
+            inicio = int(params["cursor"])
+            proximo = inicio + tamanho
+            return {
+                "results": self.faturas[inicio:proximo],
+                "next": f"{self.url}?cursor={proximo}&page_size={tamanho}" if proximo < len(self.faturas) else None
+            }, {}
+
+        if "page" in params:
+            inicio = (int(params["page"]) - 1) * tamanho
+            if self.fim_404 and inicio >= len(self.faturas) and inicio > 0:
+                return None, {}
+            cabecalhos = {"X-Total-Count": str(len(self.faturas))} if self.com_total else {}
+            return self.faturas[inicio:inicio + tamanho], cabecalhos
+
+        return self.faturas, {}
+
+    def iniciar(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def hashes_por_geradora(faturas):
+    """Organiza as faturas e retorna {cnpj_geradora: hash do snapshot}"""
+    return {
+        cnpj: calcular_hash_snapshot(snapshot.iterar_faturas())
+        for cnpj, snapshot in organizar_faturas_por_geradora(faturas).items()
+    }
+
+
+def medir(descricao, funcao):
+    """Executa a função e imprime o tempo gasto"""
+    inicio = time.perf_counter()
+    resultado = funcao()
+    segundos = time.perf_counter() - inicio
+    print(f"   {descricao:<40} {segundos:6.2f}s")
+    return resultado, segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Testa a busca paginada contra um servidor GEUS local")
+    parser.add_argument("--faturas", type=int, default=20000)
+    parser.add_argument("--tamanho-pagina", type=int, default=1000)
+    parser.add_argument("--paralelas", type=int, default=4)
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latência fixa por resposta (s)")
+    parser.add_argument("--segundos-por-mil", type=float, default=0.1, help="Custo do servidor por 1000 faturas (s)")
+    parser.add_argument("--sem-total", action="store_true", help="Páginas sem X-Total-Count")
+    parser.add_argument("--fim-404", action="store_true", help="Páginas além da última respondem 404")
+    args = parser.parse_args()
+
+    faturas = gerar_faturas(args.faturas)
+    servidor = ServidorGeusLocal(
+        faturas, args.latencia, args.segundos_por_mil, com_total=not args.sem_total, fim_404=args.fim_404
+    ).iniciar()
+    auth = ("teste", "teste")
+    headers = {"Accept": "application/json"}
+
+    print(f"🧪 Servidor GEUS local em {servidor.url} com {len(faturas)} faturas")
+
+    try:
+        def resposta_unica():
+            response = cliente_http.get(servidor.url, headers=headers, auth=auth)
+            try:
+                return hashes_por_geradora(response.json())
+            finally:
+                response.close()
+
+        def paginado(modo, paralelas, url=None):
+            return lambda: hashes_por_geradora(iterar_faturas_paginadas(
+                url or servidor.url, auth, headers, modo=modo,
+                tamanho_pagina=args.tamanho_pagina, paralelas=paralelas
+            ))
+
+        print("\n⏱️ Tempos:")
+        referencia, tempo_unico = medir("resposta única", resposta_unica)
+        modos = [
+            ("páginas, 1 por vez", paginado("pagina", 1)),
+            (f"páginas, {args.paralelas} em paralelo", paginado("pagina", args.paralelas)),
+            (f"por geradora, {args.paralelas} em paralelo", paginado("geradora", args.paralelas)),
+            ("cursor (sequencial)", paginado("pagina", 1, f"{servidor.url}?cursor=0")),
+        ]
+
+        resultados = []
+        for descricao, funcao in modos:
+            hashes, segundos = medir(descricao, funcao)
+            resultados.append((descricao, hashes == referencia, segundos))
+
+        print("\n🔍 Conferência com a resposta única:")
+        for descricao, iguais, segundos in resultados:
+            print(f"   {'✅' if iguais else '❌'} {descricao:<40} speedup {tempo_unico / segundos:4.1f}x")
+        print(f"\n📡 Requisições atendidas pelo servidor: {servidor.requisicoes}")
+
+    finally:
+        servidor.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Teste offline da leitura dos cards a partir das respostas JSON do portal
+
+Relê as respostas gravadas com CAPTURA_FATURAS_GRAVAR (function/captura_faturas.py),
+sem abrir o navegador, e mostra os cards que o robô usaria de cada uma:
+- mês de referência, valor, vencimento e situação de pagamento (como o CardFatura do DOM)
+- quantos registros do payload ficaram de fora (campos não reconhecidos)
+- se a fixture tiver a chave "esperado", confere o resultado e termina com código 1 se divergir
+
+Uso:
+    python teste_captura_faturas.py
+    python teste_captura_faturas.py --diretorio media/capturas_portal
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+from function.captura_faturas import extrair_cards_payload
+
+DIRETORIO_FIXTURES = "references/capturas_portal"
+
+
+def resumo_card(card):
+    """Campos do card como o robô os usa"""
+    return {
+        "mes_referencia": card.mes_referencia,
+        "valor": card.valor,
+        "data_vencimento": card.data_vencimento,
+        "situacao_pagamento": card.situacao_pagamento
+    }
+
+
+def conferir_fixture(caminho):
+    """
+    Lê uma fixture, mostra os cards e confere com o esperado (se houver)
+
+    Returns:
+        bool: False se o resultado divergir do esperado
+    """
+    with open(caminho, encoding="utf-8") as arquivo:
+        fixture = json.load(arquivo)
+
+    cards, ignorados = extrair_cards_payload(fixture["payload"])
+    obtidos = [resumo_card(card) for card in cards]
+
+    print(f"\n📄 {os.path.basename(caminho)} ({fixture.get('url', 'sem URL')})")
+    for card in obtidos:
+        print(
+            f"   {card['mes_referencia']}  R$ {card['valor']:>10}  vence {card['data_vencimento']}  "
+            f"{card['situacao_pagamento']}"
+        )
+    print(f"   {len(cards)} cards, {ignorados} registros ignorados")
+
+    esperado = fixture.get("esperado")
+    if esperado is None:
+        return True
+
+    divergencias = []
+    if obtidos != esperado.get("cards", []):
+        divergencias.append(f"cards: esperado {esperado.get('cards')}, obtido {obtidos}")
+    if ignorados != esperado.get("ignorados", 0):
+        divergencias.append(f"ignorados: esperado {esperado.get('ignorados', 0)}, obtido {ignorados}")
+
+    for divergencia in divergencias:
+        print(f"   ❌ {divergencia}")
+    if not divergencias:
+        print("   ✅ Confere com o esperado")
+    return not divergencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relê as respostas do portal gravadas como fixtures")
+    parser.add_argument("--diretorio", default=DIRETORIO_FIXTURES, help="Diretório com as fixtures (.json)")
+    args = parser.parse_args()
+
+    caminhos = sorted(glob.glob(os.path.join(args.diretorio, "*.json")))
+    if not caminhos:
+        print(f"⚠️ Nenhuma fixture em {args.diretorio}")
+        return 1
+
+    falhas = sum(1 for caminho in caminhos if not conferir_fixture(caminho))
+    print(f"\n{'✅' if not falhas else '❌'} {len(caminhos)} fixtures, {falhas} com divergência")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Teste offline da leitura incremental de arrays JSON (function/leitor_json.py)
+
+Corta cada documento em dois blocos em todas as posições possíveis (inclusive no
+meio de números, literais, strings e caracteres UTF-8 de vários bytes) e confere
+que iterar_itens_array_json devolve os mesmos itens que json.loads.
+Documentos inválidos precisam levantar ValueError em qualquer corte.
+Termina com código 1 se algum caso divergir.
+
+Uso:
+    python teste_leitor_json.py
+"""
+
+import json
+import sys
+
+from function.leitor_json import iterar_itens_array_json
+
+DOCUMENTOS_VALIDOS = [
+    '[]',
+    '[1,2.5]',
+    '[ -12.5e-3 , 7 , 0 ]',
+    '[true, false, null]',
+    '["São Paulo", "a,b]", "\\"aspas\\""]',
+    '[{"id": 1, "valor": "123,45"}, {"id": 2, "itens": [1, 2]}]',
+    '[{"nova_uc": "10/3622059-8", "valor": 12.5}, 3.25, "ç"]\n',
+]
+
+DOCUMENTOS_INVALIDOS = [
+    '[1,2x]',
+    '[1,2',
+    '{"id": 1}',
+]
+
+
+def cortes(documento):
+    """Documento em bytes cortado em dois blocos em cada posição"""
+    dados = documento.encode("utf-8")
+    for posicao in range(len(dados) + 1):
+        yield posicao, [dados[:posicao], dados[posicao:]]
+
+
+def conferir_valido(documento):
+    """
+    Returns:
+        bool: False se algum corte devolver itens diferentes de json.loads
+    """
+    esperado = json.loads(documento)
+    for posicao, blocos in cortes(documento):
+        try:
+            obtido = list(iterar_itens_array_json(blocos))
+        except ValueError as e:
+            print(f"   ❌ {documento!r} cortado em {posicao}: {str(e)}")
+            return False
+        if obtido != esperado:
+            print(f"   ❌ {documento!r} cortado em {posicao}: esperado {esperado}, obtido {obtido}")
+            return False
+    print(f"   ✅ {documento!r}")
+    return True
+
+
+def conferir_invalido(documento):
+    """
+    Returns:
+        bool: False se algum corte não levantar ValueError
+    """
+    for posicao, blocos in cortes(documento):
+        try:
+            obtido = list(iterar_itens_array_json(blocos))
+        except ValueError:
+            continue
+        print(f"   ❌ {documento!r} cortado em {posicao} foi aceito: {obtido}")
+        return False
+    print(f"   ✅ {documento!r} rejeitado")
+    return True
+
+
+def main():
+    print("\n📄 Documentos válidos (todos os cortes em dois blocos)")
+    falhas = sum(1 for documento in DOCUMENTOS_VALIDOS if not conferir_valido(documento))
+
+    print("\n📄 Documentos inválidos")
+    falhas += sum(1 for documento in DOCUMENTOS_INVALIDOS if not conferir_invalido(documento))
+
+    total = len(DOCUMENTOS_VALIDOS) + len(DOCUMENTOS_INVALIDOS)
+    print(f"\n{'✅' if not falhas else '❌'} {total} documentos, {falhas} com divergência")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
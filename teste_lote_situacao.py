@@ -0,0 +1,215 @@
+"""
+Servidor local que simula os endpoints de atualização de situação da API GEUS
+
+Compara o envio de uma atualização por vez (como antes) com o LoteSituacao
+(function/lote_situacao.py), em um banco temporário:
+- confere que o servidor recebeu a situação certa de cada fatura
+- confere que o status de cada fatura no banco corresponde ao resultado do servidor
+  (as recusadas ficam com 'erro' e vão para a outbox)
+- mede o tempo de cada modo
+
+O servidor atende:
+- POST /atualizar: {id, situacao_pagamento} (recusa os IDs de --recusar com 422)
+- POST /atualizar-lote: {"faturas": [...]} -> {"resultados": [{"id", "sucesso", "erro"}]}
+  (responde 404 com --sem-lote)
+
+Uso:
+    python teste_lote_situacao.py --faturas 200 --latencia 0.05 --paralelas 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from database import DatabaseManager, inicializar_banco
+from function.fila_envio import RequisicaoGeus
+from function.lote_situacao import LoteSituacao
+from function import outbox
+
+SITUACOES = ("paga", "a_vencer", "vencida")
+
+
+class ServidorSituacaoLocal:
+    """Servidor HTTP em thread própria simulando os endpoints de situação"""
+
+    def __init__(self, latencia=0.05, recusar=(), com_lote=True, porta=0):
+        """
+        Args:
+            latencia (float): Tempo de cada resposta, em segundos
+            recusar (iterable): IDs de faturas que o servidor recusa
+            com_lote (bool): Atende o endpoint em lote (senão 404)
+            porta (int): Porta local (0 = escolhida pelo sistema)
+        """
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                corpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(servidor.latencia)
+                status, resposta = servidor.responder(self.path, corpo)
+                dados = json.dumps(resposta).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+        self.latencia = latencia
+        self.recusar = set(recusar)
+        self.com_lote = com_lote
+        self.recebidas = {}
+        self.requisicoes = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", porta), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def _aplicar(self, item):
+        """Aplica uma atualização; retorna True se aceita"""
+        if item["id"] in self.recusar:
+            return False
+        self.recebidas[item["id"]] = item["situacao_pagamento"]
+        return True
+
+    def responder(self, caminho, corpo):
+        """Status e corpo da resposta para cada endpoint"""
+        with self._lock:
+            self.requisicoes += 1
+            if caminho == "/atualizar-lote":
+                if not self.com_lote:
+                    return 404, {"detail": "Not Found"}
+                return 200, {"resultados": [
+                    {"id": item["id"], "sucesso": ok, "erro": None if ok else "fatura bloqueada"}
+                    for item, ok in ((item, self._aplicar(item)) for item in corpo["faturas"])
+                ]}
+            if self._aplicar(corpo):
+                return 200, {}
+            return 422, {"detail": "fatura bloqueada"}
+
+    def iniciar(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def preparar_banco(caminho, quantidade):
+    """Banco temporário com as faturas a atualizar"""
+    inicializar_banco(caminho)
+    db = DatabaseManager(caminho)
+    for i in range(quantidade):
+        db.inserir_ou_atualizar_fatura({
+            "id": 500000 + i, "nova_uc": f"10/{i // 3}", "mes_referencia": "09/2026", "cnpj_geradora": "00.000.000/0001-00"
+        })
+    return db
+
+
+def requisicoes(servidor, quantidade):
+    """Uma atualização de situação por fatura"""
+    headers = {"Content-Type": "application/json"}
+    return [
+        RequisicaoGeus(
+            f"{servidor.url}/atualizar", headers,
+            {"id": 500000 + i, "situacao_pagamento": SITUACOES[i % len(SITUACOES)]},
+            "Situação de pagamento atualizada com sucesso",
+            endpoint="GEUS atualizar situação", idempotente=True
+        )
+        for i in range(quantidade)
+    ]
+
+
+def conferir(servidor, db, lista):
+    """Confere o que o servidor recebeu e o status gravado de cada fatura"""
+    erros = 0
+    for requisicao in lista:
+        fatura_id = requisicao.body["id"]
+        aceita = fatura_id not in servidor.recusar
+        status, _ = db.verificar_status_fatura(fatura_id)
+        if aceita and servidor.recebidas.get(fatura_id) != requisicao.body["situacao_pagamento"]:
+            erros += 1
+        if status != ("sucesso" if aceita else "erro"):
+            erros += 1
+    return erros
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Testa o envio em lote das situações contra um servidor local")
+    parser.add_argument("--faturas", type=int, default=200)
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latência de cada resposta (s)")
+    parser.add_argument("--paralelas", type=int, default=4)
+    parser.add_argument("--recusar", type=int, default=3, help="Quantidade de faturas recusadas pelo servidor")
+    parser.add_argument("--sem-lote", action="store_true", help="Servidor sem o endpoint em lote (404)")
+    args = parser.parse_args()
+
+    diretorio = tempfile.mkdtemp(prefix="teste_lote_")
+    outbox.DIRETORIO_OUTBOX = os.path.join(diretorio, "outbox")
+    recusar = {500000 + i for i in range(0, args.faturas, max(1, args.faturas // max(1, args.recusar)))}
+    servidor = ServidorSituacaoLocal(args.latencia, recusar, com_lote=not args.sem_lote).iniciar()
+
+    print(f"🧪 Servidor de situação local em {servidor.url} | {args.faturas} faturas, {len(recusar)} recusadas")
+
+    try:
+        def um_por_vez(db, lista):
+            for requisicao in lista:
+                sucesso = requisicao.enviar()
+                db.atualizar_status_fatura(
+                    requisicao.body["id"], "sucesso" if sucesso else "erro",
+                    situacao_pagamento=requisicao.body["situacao_pagamento"]
+                )
+
+        def em_lote(url_lote):
+            def executar(db, lista):
+                with LoteSituacao(db=db, url_lote=url_lote, tamanho=len(lista) + 1, paralelas=args.paralelas) as lote:
+                    for requisicao in lista:
+                        lote.adicionar(
+                            requisicao, requisicao.body["id"], "00.000.000/0001-00", "10/0",
+                            "situacao_alterada", {"situacao_pagamento": requisicao.body["situacao_pagamento"]}, ""
+                        )
+            return executar
+
+        modos = [
+            ("um POST por vez", um_por_vez),
+            (f"POSTs individuais, {args.paralelas} em paralelo", em_lote("")),
+            ("endpoint em lote", em_lote(f"{servidor.url}/atualizar-lote")),
+        ]
+
+        resultados = []
+        for numero, (descricao, funcao) in enumerate(modos):
+            db = preparar_banco(os.path.join(diretorio, f"modo_{numero}.db"), args.faturas)
+            lista = requisicoes(servidor, args.faturas)
+            servidor.recebidas.clear()
+            servidor.requisicoes = 0
+
+            inicio = time.perf_counter()
+            funcao(db, lista)
+            segundos = time.perf_counter() - inicio
+
+            resultados.append((descricao, segundos, servidor.requisicoes, conferir(servidor, db, lista)))
+
+        print(f"\n⏱️ Resultados ({datetime.now().strftime('%H:%M:%S')}):")
+        tempo_base = resultados[0][1]
+        for descricao, segundos, requisicoes_servidor, erros in resultados:
+            print(
+                f"   {'✅' if erros == 0 else '❌'} {descricao:<34} {segundos:6.2f}s  "
+                f"speedup {tempo_base / segundos:5.1f}x  {requisicoes_servidor:4d} requisições  {erros} divergências"
+            )
+
+    finally:
+        servidor.parar()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()